@@ -1,234 +1,347 @@
-# app.py
-import streamlit as st
-from dotenv import load_dotenv
-load_dotenv()
-
-import os
-import csv
-from datetime import datetime
-
-from docs_loader import save_documents, load_documents
-from utils.hashing import content_hash
-from vectorstore.indexer import upsert_chunks, document_exists
-from vectorstore.retriever import retrieve_chunks
-from vectorstore.embeddings import embed_texts
-from crew.rag_crew import summarize_chunks_task
-from evaluation.rouge_eval import evaluate_summary
-from reference_summaries import EVAL_QUESTIONS
-from vectorstore.bm25_store import BM25Store
-
-# ============================================================
-# ✅ SESSION STATE INITIALIZATION
-# ============================================================
-if "indexed_docs" not in st.session_state:
-    st.session_state.indexed_docs = load_documents()  # {doc_name: doc_id}
-
-if "all_chunks" not in st.session_state:
-    st.session_state.all_chunks = {}
-
-if "last_summary" not in st.session_state:
-    st.session_state.last_summary = ""
-
-if "last_query" not in st.session_state:
-    st.session_state.last_query = ""
-
-if "bm25" not in st.session_state:
-    st.session_state.bm25 = BM25Store()
-
-
-
-# ============================================================
-# PAGE CONFIG
-# ============================================================
-st.set_page_config(
-    page_title="📘 Doc Search, Summarization & Evaluation",
-    layout="wide"
-)
-st.title("📘 Doc Search, Summarization & Evaluation")
-tab1, tab2, tab3 = st.tabs(
-    ["📚 Indexing", "🔍 Search & Summarize", "📊 Evaluation"]
-)
-
-# ============================================================
-# TAB 1 — INDEXING
-# ============================================================
-with tab1:
-    st.header("📚 Index Book")
-
-    uploaded_files = st.file_uploader(
-        "Upload one or more documents",
-        type=["pdf", "txt", "csv", "docx"],
-        accept_multiple_files=True
-    )
-
-    if uploaded_files:
-        total_chunks = 0
-        total_indexed = 0
-        total_skipped = 0
-
-        for uploaded_file in uploaded_files:
-            st.write(f"📄 **{uploaded_file.name}** received")
-            file_bytes = uploaded_file.getvalue()
-            doc_id = content_hash(file_bytes)
-
-            # Skip if already indexed
-            if document_exists(doc_id):
-                st.write("📄 Document already indexed. Skipping.")
-                # Ensure already indexed doc is in session_state & CSV
-                st.session_state.indexed_docs.setdefault(uploaded_file.name, doc_id)
-                save_documents(uploaded_file.name, doc_id)
-                continue
-
-            st.session_state.indexed_docs[uploaded_file.name] = doc_id
-            save_documents(uploaded_file.name, doc_id)  # persist
-
-            # -------- Chunking --------
-            st.write("✂️ Chunking document...")
-            from utils.file_loader import load_file  # lazy import
-            chunks = load_file(uploaded_file, chunk_size=400, overlap=80)
-            total_chunks += len(chunks)
-            st.session_state.bm25.add_chunks(chunks)
-            st.success(f"✅ {len(chunks)} chunks created")
-
-            # -------- Batched Embedding --------
-            st.write("🧠 Generating embeddings (batched)...")
-            texts = [chunk["text"] for chunk in chunks]
-            vectors = embed_texts(texts, input_type="passage")
-
-            for chunk, vector in zip(chunks, vectors):
-                chunk["vector"] = vector
-                st.session_state.all_chunks[chunk["id"]] = chunk
-
-            # -------- Pinecone Upsert --------
-            st.write("📦 Indexing chunks...")
-            indexed, skipped = upsert_chunks(chunks, doc_id=doc_id, doc_name=uploaded_file.name)
-            total_indexed += indexed
-            total_skipped += skipped
-
-        st.divider()
-        st.success("🎉 Document ingestion completed")
-        st.write(f"📊 Total chunks processed: {total_chunks}")
-        st.write(f"🆕 Newly indexed: {total_indexed}")
-        st.write(f"⏭️ Skipped (duplicates): {total_skipped}")
-
-# ============================================================
-# TAB 2 — SEARCH & SUMMARIZE
-# ============================================================
-with tab2:
-    st.header("🔍 Search & Summarize")
-
-    # Load persistent document registry (doc_name → doc_id)
-    doc_map = load_documents()
-
-    doc_names = ["All Documents"] + list(doc_map.keys())
-    selected_doc = st.selectbox("Select document to search from", options=doc_names)
-
-    query = st.text_input("Enter your query", placeholder="e.g. Types of supervised learning")
-    st.session_state.last_query = query
-
-    summary_length = st.slider("📝 Summary length (words)", 10, 500, 200)
-
-    if st.button("🧠 Summarize"):
-        if not query.strip():
-            st.warning("Please enter a query.")
-        else:
-            with st.spinner("🔎 Retrieving & summarizing..."):
-
-                # Resolve doc_id safely
-                doc_id = None
-                if selected_doc != "All Documents":
-                    doc_id = doc_map.get(selected_doc)
-
-                retrieved_chunks = retrieve_chunks(query=query, doc_id=doc_id,
-                                                    top_k=5, bm25_store=st.session_state.bm25 )
-
-
-                if not retrieved_chunks:
-                    st.error("No relevant content found.")
-                else:
-                    result = summarize_chunks_task({
-                                 "query": query,
-                                 "retrieved_chunks": retrieved_chunks,
-                                 "summary_length": summary_length
-                                                    })
-
-
-                    st.session_state.last_summary = result["summary"]
-
-                    st.subheader("📄 Summary")
-                    st.write(st.session_state.last_summary)
-
-# ============================================================
-# TAB 3 — EVALUATION
-# ============================================================
-
-CSV_FILE = "human_evaluations.csv"
-
-def save_human_eval(row: dict):
-    file_exists = os.path.isfile(CSV_FILE)
-    with open(CSV_FILE, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=row.keys())
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(row)
-
-with tab3:
-    st.header("📊 Evaluation")
-
-    if not st.session_state.last_summary:
-        st.info("Generate a summary first to evaluate.")
-    else:
-        query = st.session_state.last_query
-        generated = st.session_state.last_summary
-        reference = EVAL_QUESTIONS.get(query)
-
-        # Automatic ROUGE evaluation
-        if st.checkbox("📐 Evaluate Summary using ROUGE"):
-            if not reference:
-                st.warning("No gold reference available for this question.")
-            else:
-                scores = evaluate_summary(generated, reference)
-                st.subheader("ROUGE Scores")
-                st.json(scores)
-
-        # Human Evaluation
-        st.subheader("🧑‍⚖️ Human Evaluation (Stored as CSV)")
-        if reference:
-            with st.expander("📘 Gold Reference Answer"):
-                st.write(reference)
-
-        st.markdown("### Rate the summary (1 = Poor, 5 = Excellent)")
-
-        # ======= Two columns layout =======
-        col1, col2 = st.columns(2)
-
-        with col1:
-            relevance = st.slider("🎯 Relevance", 1, 5, 3)
-            coverage = st.slider("📚 Coverage / Completeness", 1, 5, 3)
-            correctness = st.slider("✅ Correctness", 1, 5, 3)
-
-        with col2:
-            faithfulness = st.slider("🧠 Faithfulness (No Hallucinations)", 1, 5, 3)
-            coherence = st.slider("🧩 Coherence & Readability", 1, 5, 3)
-
-        notes = st.text_area(
-            "✍️ Evaluator Notes",
-            placeholder="Mention missing points, hallucinations, factual errors, strengths..."
-        )
-
-        if st.button("💾 Save Human Evaluation"):
-            row = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "question": query,
-                "generated_summary": generated,
-                "reference_summary": reference,
-                "relevance": relevance,
-                "coverage": coverage,
-                "correctness": correctness,
-                "faithfulness": faithfulness,
-                "coherence": coherence,
-                "notes": notes
-            }
-            save_human_eval(row)
-            st.success("Human evaluation saved to CSV.")
-
+# app.py
+import streamlit as st
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import csv
+from datetime import datetime
+
+from docs_loader import save_documents, load_documents, get_registry
+from ingest_queue import IngestQueue, start_workers
+from utils.hashing import content_hash
+from vectorstore.indexer import document_exists
+from vectorstore.retriever import retrieve_chunks, stage_percentiles, record_latency
+from crew.rag_crew import stream_summary_task, finalize_summary
+from evaluation.rouge_eval import evaluate_summary
+from reference_summaries import EVAL_QUESTIONS
+from utils.query_cache import query_cache, invalidate_documents
+from utils.clients import get_index
+from vectorstore.bm25_store import BM25Store, BM25_DIR
+from vectorstore.chunk_store import get_chunk_store
+from vectorstore.manifest import load_manifest
+
+
+@st.cache_resource
+def get_bm25_store():
+    # One persistent index per process, shared by every browser session
+    return BM25Store(path=BM25_DIR)
+
+
+@st.cache_resource
+def get_ingest_queue():
+    # Workers index uploads in the background and outlive reruns / closed tabs
+    start_workers()
+    return IngestQueue()
+
+
+def apply_finished_job(job: dict):
+    """
+    Brings this process up to date with a document a worker finished:
+    BM25 gets the manifest's new chunks, cached answers are dropped
+    """
+    bm25 = get_bm25_store()
+    manifest = load_manifest(job["doc_id"])
+    chunk_ids = manifest["chunks"] if manifest else []
+    known = bm25.document_ids(job["doc_id"])
+    if not known.issubset(chunk_ids):
+        # The job replaced a version whose chunks were deleted: rebuild the document
+        bm25.remove_document(job["doc_id"])
+        known = set()
+    new_ids = [i for i in chunk_ids if i not in known]
+    if new_ids:
+        texts = get_chunk_store().get_many(new_ids)
+        # Same ids as the vectors so fusion can match both branches
+        bm25.add_chunks(
+            [{"id": i, "text": texts[i]} for i in new_ids if i in texts],
+            doc_id=job["doc_id"],
+        )
+    invalidate_documents(job["doc_id"])
+    index = get_index()
+    if hasattr(index, "refresh"):
+        index.refresh()   # local backend: pick up the worker's writes
+
+# ============================================================
+# ✅ SESSION STATE INITIALIZATION
+# ============================================================
+if "indexed_docs" not in st.session_state:
+    st.session_state.indexed_docs = load_documents()  # {doc_name: doc_id}
+
+if "ingest_jobs" not in st.session_state:
+    st.session_state.ingest_jobs = {}   # {doc_name: job_id} of this session's uploads
+
+if "last_summary" not in st.session_state:
+    st.session_state.last_summary = ""
+
+if "last_query" not in st.session_state:
+    st.session_state.last_query = ""
+
+if "bm25" not in st.session_state:
+    st.session_state.bm25 = get_bm25_store()
+
+
+
+# ============================================================
+# PAGE CONFIG
+# ============================================================
+st.set_page_config(
+    page_title="📘 Doc Search, Summarization & Evaluation",
+    layout="wide"
+)
+st.title("📘 Doc Search, Summarization & Evaluation")
+tab1, tab2, tab3 = st.tabs(
+    ["📚 Indexing", "🔍 Search & Summarize", "📊 Evaluation"]
+)
+
+# ============================================================
+# TAB 1 — INDEXING
+# ============================================================
+with tab1:
+    st.header("📚 Index Book")
+
+    uploaded_files = st.file_uploader(
+        "Upload one or more documents",
+        type=["pdf", "txt", "csv", "docx"],
+        accept_multiple_files=True
+    )
+
+    if uploaded_files:
+        queue = get_ingest_queue()
+        registry = load_documents()
+        for uploaded_file in uploaded_files:
+            file_bytes = uploaded_file.getvalue()
+            file_hash = content_hash(file_bytes)
+            # An edited file keeps its doc_id: only its changed chunks are re-indexed
+            # (the worker checks it really is an edit: vectorstore.indexer.match_document)
+            doc_id = registry.get(uploaded_file.name, file_hash)
+            if doc_id != file_hash and get_registry().get(file_hash) is not None:
+                doc_id = file_hash   # this file is indexed as a document of its own
+
+            # Skip if this exact version is already indexed
+            if document_exists(doc_id, file_hash):
+                if uploaded_file.name not in st.session_state.ingest_jobs:
+                    st.write(f"📄 **{uploaded_file.name}**: already indexed. Skipping.")
+                # Ensure already indexed doc is in session_state & the registry
+                st.session_state.indexed_docs.setdefault(uploaded_file.name, doc_id)
+                save_documents(uploaded_file.name, doc_id)
+                continue
+
+            # -------- Background Ingestion --------
+            # Queued once per version (reruns resubmit the same uploads); the
+            # registry is written by the worker once every chunk is upserted
+            st.session_state.ingest_jobs[uploaded_file.name] = queue.enqueue(
+                doc_id, uploaded_file.name, file_hash, file_bytes
+            )
+
+    @st.fragment(run_every=1)
+    def ingestion_progress():
+        """
+        Polls the queue: reruns only this panel while jobs are in flight
+        """
+        queue = get_ingest_queue()
+        start_workers()   # restarts a worker that died
+        if queue.sync_finished(apply_finished_job):
+            st.session_state.indexed_docs = load_documents()
+
+        jobs = queue.jobs(st.session_state.ingest_jobs.values())
+        if not jobs:
+            return
+
+        for job in jobs:
+            name = job["doc_name"]
+            if job["status"] == "done":
+                st.write(
+                    f"✅ **{name}**: {job['indexed']} new chunks indexed, "
+                    f"{job['skipped']} unchanged, {job['removed']} removed"
+                    + (f", {job['reused']} near-duplicates reused stored embeddings" if job["reused"] else "")
+                )
+            elif job["status"] == "failed":
+                st.error(f"❌ **{name}**: failed after {job['attempts']} attempts ({job['error']})")
+                # Not requeued by reruns: only on request, resuming from its checkpoint
+                if st.button("🔁 Retry", key=f"retry_job_{job['job_id']}"):
+                    queue.retry(job["job_id"])
+                    st.rerun(scope="fragment")
+            elif job["status"] == "superseded":
+                st.write(f"⏭️ **{name}**: replaced by a newer upload")
+            else:
+                label = f"🔄 **{name}**: {job['stage']}"
+                if job["chunked"]:
+                    label += f" · {job['chunked']} chunks read, {job['upserted']} upserted"
+                if job["status"] == "queued" and job["error"]:
+                    label += f" · retrying after error ({job['error']})"
+                st.progress(min(job["loaded"], 1.0), text=label)
+
+        if any(job["status"] in ("queued", "running") for job in jobs):
+            st.caption("Indexing continues in the background if you leave or reload this page.")
+        elif not any(job["status"] == "failed" for job in jobs):
+            st.success("🎉 Document ingestion completed")
+
+    ingestion_progress()
+
+    with st.expander("🗂️ Indexed documents"):
+        docs = get_registry().stats()
+        if docs:
+            st.dataframe([
+                {
+                    "Document": d["doc_name"],
+                    "Chunks": d["chunks"],
+                    "Size (KB)": round(d["bytes"] / 1024, 1) if d["bytes"] else None,
+                    "Indexed at": datetime.fromtimestamp(d["indexed_at"]).strftime("%Y-%m-%d %H:%M"),
+                }
+                for d in docs
+            ], use_container_width=True)
+        else:
+            st.caption("No documents indexed yet.")
+
+# ============================================================
+# TAB 2 — SEARCH & SUMMARIZE
+# ============================================================
+with tab2:
+    st.header("🔍 Search & Summarize")
+
+    # Load persistent document registry (doc_name → doc_id)
+    doc_map = load_documents()
+
+    doc_names = ["All Documents"] + list(doc_map.keys())
+    selected_doc = st.selectbox("Select document to search from", options=doc_names)
+
+    query = st.text_input("Enter your query", placeholder="e.g. Types of supervised learning")
+    st.session_state.last_query = query
+
+    summary_length = st.slider("📝 Summary length (words)", 10, 500, 200)
+
+    if st.button("🧠 Summarize"):
+        if not query.strip():
+            st.warning("Please enter a query.")
+        else:
+            # Resolve doc_id safely
+            doc_id = None
+            if selected_doc != "All Documents":
+                doc_id = doc_map.get(selected_doc)
+
+            cached = query_cache.get(query, doc_id, summary_length)
+            timings = {}
+
+            if cached:
+                result, cache_level = cached
+                st.session_state.last_summary = result["summary"]
+                st.subheader("📄 Summary")
+                st.caption(f"⚡ Served from cache ({cache_level} match)")
+                st.write(st.session_state.last_summary)
+            else:
+                with st.spinner("🔎 Retrieving..."):
+                    retrieved_chunks = retrieve_chunks(query=query, doc_id=doc_id,
+                                                        top_k=5, bm25_store=st.session_state.bm25,
+                                                        timings=timings)
+
+                if not retrieved_chunks:
+                    st.error("No relevant content found.")
+                else:
+                    # -------- Streamed answer --------
+                    st.subheader("📄 Summary")
+                    answer_box = st.empty()
+                    streamed = answer_box.write_stream(stream_summary_task({
+                                     "query": query,
+                                     "retrieved_chunks": retrieved_chunks,
+                                     "summary_length": summary_length
+                                                        }, metrics=timings))
+
+                    if "llm_error" in timings:
+                        # Partial text: neither shown as the summary nor cached
+                        answer_box.error(f"Error generating response: {timings['llm_error']}")
+                        st.session_state.last_summary = ""
+                    else:
+                        # 🔒 Safety net applies to the complete answer
+                        summary = finalize_summary(streamed if isinstance(streamed, str) else "".join(streamed))
+                        if summary != streamed:
+                            answer_box.write(summary)
+
+                        query_cache.put(query, doc_id, summary_length, {"summary": summary})
+                        st.session_state.last_summary = summary
+
+                    for stage in ("llm_ttft", "llm_total"):
+                        if stage in timings:
+                            record_latency(stage, timings[stage])
+
+            with st.expander("⏱️ Retrieval & generation timings"):
+                st.write("This query (ms)")
+                st.json(dict(timings))
+                st.write("Recent queries (ms)")
+                st.json(stage_percentiles())
+                st.write("Answer cache")
+                st.json(query_cache.stats())
+
+# ============================================================
+# TAB 3 — EVALUATION
+# ============================================================
+
+CSV_FILE = "human_evaluations.csv"
+
+def save_human_eval(row: dict):
+    file_exists = os.path.isfile(CSV_FILE)
+    with open(CSV_FILE, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=row.keys())
+        if not file_exists:
+            writer.writeheader()
+        writer.writerow(row)
+
+with tab3:
+    st.header("📊 Evaluation")
+
+    if not st.session_state.last_summary:
+        st.info("Generate a summary first to evaluate.")
+    else:
+        query = st.session_state.last_query
+        generated = st.session_state.last_summary
+        reference = EVAL_QUESTIONS.get(query)
+
+        # Automatic ROUGE evaluation
+        if st.checkbox("📐 Evaluate Summary using ROUGE"):
+            if not reference:
+                st.warning("No gold reference available for this question.")
+            else:
+                scores = evaluate_summary(generated, reference)
+                st.subheader("ROUGE Scores")
+                st.json(scores)
+
+        # Human Evaluation
+        st.subheader("🧑‍⚖️ Human Evaluation (Stored as CSV)")
+        if reference:
+            with st.expander("📘 Gold Reference Answer"):
+                st.write(reference)
+
+        st.markdown("### Rate the summary (1 = Poor, 5 = Excellent)")
+
+        # ======= Two columns layout =======
+        col1, col2 = st.columns(2)
+
+        with col1:
+            relevance = st.slider("🎯 Relevance", 1, 5, 3)
+            coverage = st.slider("📚 Coverage / Completeness", 1, 5, 3)
+            correctness = st.slider("✅ Correctness", 1, 5, 3)
+
+        with col2:
+            faithfulness = st.slider("🧠 Faithfulness (No Hallucinations)", 1, 5, 3)
+            coherence = st.slider("🧩 Coherence & Readability", 1, 5, 3)
+
+        notes = st.text_area(
+            "✍️ Evaluator Notes",
+            placeholder="Mention missing points, hallucinations, factual errors, strengths..."
+        )
+
+        if st.button("💾 Save Human Evaluation"):
+            row = {
+                "timestamp": datetime.utcnow().isoformat(),
+                "question": query,
+                "generated_summary": generated,
+                "reference_summary": reference,
+                "relevance": relevance,
+                "coverage": coverage,
+                "correctness": correctness,
+                "faithfulness": faithfulness,
+                "coherence": coherence,
+                "notes": notes
+            }
+            save_human_eval(row)
+            st.success("Human evaluation saved to CSV.")
+
@@ -0,0 +1,108 @@
+# benchmarks/bench_bm25.py
+"""
+BM25Store.search latency vs. corpus size on a synthetic Zipf corpus
+
+    python -m benchmarks.bench_bm25 --sizes 10000,100000,1000000
+
+If rank-bm25 is installed, the previous full-scan implementation
+(get_scores + sort everything) is timed as a baseline up to --baseline-max.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from vectorstore.bm25_store import BM25Store
+
+VOCAB = 50_000
+
+
+def synthetic_corpus(n_chunks: int, words_per_chunk: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    # Zipf-ish term distribution, like natural text
+    ranks = np.arange(1, VOCAB + 1)
+    probs = 1.0 / ranks
+    probs /= probs.sum()
+
+    for start in range(0, n_chunks, 10_000):
+        size = min(10_000, n_chunks - start)
+        ids = rng.choice(VOCAB, size=(size, words_per_chunk), p=probs)
+        yield [
+            {"id": f"chunk_{start + i}", "text": " ".join(f"t{w}" for w in row)}
+            for i, row in enumerate(ids)
+        ]
+
+
+def synthetic_queries(n: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    # Mid-frequency terms: common enough to hit, rare enough to matter
+    return [
+        " ".join(f"t{w}" for w in rng.integers(10, 5_000, size=rng.integers(2, 6)))
+        for _ in range(n)
+    ]
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def time_queries(search, queries, top_k):
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        search(q, top_k)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--words", type=int, default=100, help="words per chunk")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--baseline-max", type=int, default=100_000)
+    args = parser.parse_args()
+
+    queries = synthetic_queries(args.queries)
+    print(f"{'chunks':>10} {'build s':>9} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}  impl")
+
+    for n in [int(x) for x in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = BM25Store(path=tmp)
+            start = time.perf_counter()
+            corpus = []
+            for batch in synthetic_corpus(n, args.words):
+                store.add_chunks(batch)
+                corpus.extend(batch)
+            store.save()
+            build = time.perf_counter() - start
+
+            samples = time_queries(store.search, queries, args.top_k)
+            print(f"{n:>10} {build:>9.1f} {percentile(samples, 50):>8.2f} "
+                  f"{percentile(samples, 95):>8.2f} {statistics.mean(samples):>8.2f}  postings+argpartition")
+
+            if n <= args.baseline_max:
+                try:
+                    from rank_bm25 import BM25Okapi
+                except ImportError:
+                    continue
+
+                tokenized = [c["text"].split() for c in corpus]
+                bm25 = BM25Okapi(tokenized)
+
+                def full_scan(q, top_k):
+                    scores = bm25.get_scores(q.split())
+                    ranked = sorted(zip(scores, corpus), key=lambda x: x[0], reverse=True)
+                    return [c for s, c in ranked[:top_k] if s > 0]
+
+                samples = time_queries(full_scan, queries[:20], args.top_k)
+                print(f"{n:>10} {'':>9} {percentile(samples, 50):>8.2f} "
+                      f"{percentile(samples, 95):>8.2f} {statistics.mean(samples):>8.2f}  full scan (rank-bm25)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/bench_embed_scheduler.py
+"""
+Fixed-sleep embedding loop vs. the rate-limited concurrent scheduler
+
+Both run against a fake inference server that enforces a request quota
+and injects random 429s.
+
+    python -m benchmarks.bench_embed_scheduler --texts 400 --rps 10
+"""
+import argparse
+import time
+
+from pinecone.exceptions import PineconeApiException
+
+from benchmarks.fakes import FakeInference, FakePinecone
+from utils import clients
+from vectorstore import embeddings
+from vectorstore.rate_limiter import RateLimiter
+
+
+def legacy_embed(pc, texts, sleep_seconds=1.2):
+    """
+    The original loop: serial batches, fixed sleep, flat 3s on 429
+    """
+    out = []
+    for i in range(0, len(texts), embeddings.BATCH_SIZE):
+        batch = texts[i:i + embeddings.BATCH_SIZE]
+        for attempt in range(3):
+            try:
+                response = pc.inference.embed(
+                    model=embeddings.MODEL_NAME, inputs=batch,
+                    parameters={"input_type": "passage"},
+                )
+                out.extend(d.values for d in response.data)
+                break
+            except PineconeApiException as e:
+                if e.status == 429 and attempt < 2:
+                    time.sleep(3)
+                else:
+                    raise
+        time.sleep(sleep_seconds)
+    return out
+
+
+def run(label, fn, server, n_texts):
+    start = time.perf_counter()
+    vectors = fn()
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == n_texts
+    print(
+        f"{label:<22} {elapsed:8.2f}s  {n_texts / elapsed:8.1f} texts/s  "
+        f"calls={server.embed_calls:<4} 429s={server.rate_limited}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=400)
+    parser.add_argument("--rps", type=float, default=10, help="server quota, requests/sec")
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    texts = [f"benchmark passage {i} " * 40 for i in range(args.texts)]
+
+    def server():
+        return FakeInference(latency=args.latency, requests_per_sec=args.rps,
+                             error_rate=args.error_rate, dim=64)
+
+    # ---- Legacy fixed-sleep loop ----
+    legacy_server = server()
+    run("fixed sleep (legacy)", lambda: legacy_embed(FakePinecone(legacy_server), texts),
+        legacy_server, len(texts))
+
+    # ---- Token-bucket scheduler ----
+    scheduled_server = server()
+    clients.set_factory("pinecone", lambda: FakePinecone(scheduled_server))
+    embeddings.USE_CACHE = False
+    embeddings.CONCURRENCY = args.concurrency
+    embeddings._limiter = RateLimiter(
+        requests_per_min=args.rps * 60, tokens_per_min=10_000_000, burst_seconds=1.0
+    )
+    run("token bucket", lambda: embeddings.embed_texts(texts), scheduled_server, len(texts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_extract.py
+"""
+Serial vs. process-pool PDF text extraction on a synthetic PDF
+
+    python -m benchmarks.bench_extract --pages 500 --workers 1,2,4
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from utils import extraction
+
+WORDS = (
+    "model data training vector search index query document chunk "
+    "embedding retrieval ranking summary learning network layer"
+).split()
+
+
+def synthetic_pdf(n_pages: int, lines_per_page: int = 45, seed: int = 0) -> bytes:
+    """
+    Minimal valid PDF: one Helvetica text stream per page
+    """
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,   # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in range(n_pages):
+        lines = [f"Page {page + 1}"] + [
+            " ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page)
+        ]
+        ops = ["BT", "/F1 10 Tf", "14 TL", "40 800 Td"]
+        ops += [f"({line}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), n_pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def serial_extract(data: bytes) -> list[str]:
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    try:
+        from pypdf import PdfReader
+        return [page.extract_text() or "" for page in PdfReader(path).pages]
+    finally:
+        os.remove(path)
+
+
+def pooled_extract(data: bytes, workers: int, pages_per_task: int) -> list[str]:
+    job = extraction.submit_file("bench.pdf", data, workers, pages_per_task)
+    return [block["text"] for block in job.blocks()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF extraction benchmark")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated pool sizes")
+    parser.add_argument("--pages-per-task", type=int, default=extraction.PAGES_PER_TASK)
+    args = parser.parse_args()
+
+    data = synthetic_pdf(args.pages)
+    print(f"Synthetic PDF: {args.pages} pages, {len(data) / 1e6:.1f} MB")
+
+    started = time.perf_counter()
+    expected = [text for text in serial_extract(data) if text]
+    serial = time.perf_counter() - started
+    print(f"{'serial':<14}{serial:>8.2f}s")
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        if workers <= 1:
+            continue
+        extraction.get_executor(workers)
+        pooled_extract(synthetic_pdf(4), workers, 1)   # warm up the pool (spawn)
+
+        started = time.perf_counter()
+        pages = pooled_extract(data, workers, args.pages_per_task)
+        elapsed = time.perf_counter() - started
+        status = "same order" if pages == expected else "MISMATCH"
+        print(f"{workers:>2} workers    {elapsed:>8.2f}s  speed-up {serial / elapsed:4.1f}x  ({status})")
+
+
+if __name__ == "__main__":
+    main()
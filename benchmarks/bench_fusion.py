@@ -0,0 +1,107 @@
+# benchmarks/bench_fusion.py
+"""
+Rerank payload vs. answer quality: legacy merge-all vs. fusion + pruning
+
+Synthetic setup: every query has a pool of candidates with graded
+relevance (0-3). The vector and BM25 branches rank that pool with
+independent noise; the reranker stand-in scores relevance with a little
+noise (a good cross-encoder). Reranker latency is modelled as a fixed
+cost plus a per-document cost.
+
+    python -m benchmarks.bench_fusion --margins 0.1,0.2,0.3
+"""
+import argparse
+import math
+import random
+import statistics
+
+from vectorstore.fusion import fuse, is_decisive
+
+POOL = 60
+VECTOR_K, BM25_K = 30, 20
+TOP_N = 5
+RERANK_BASE_MS, RERANK_PER_DOC_MS = 80.0, 4.0
+
+
+def make_query(rng):
+    rels = [rng.choices([0, 1, 2, 3], weights=[80, 10, 6, 4])[0] for _ in range(POOL)]
+    docs = [{"id": f"d{i}", "text": f"doc {i}", "rel": r} for i, r in enumerate(rels)]
+
+    def branch(noise, k):
+        scored = [(d["rel"] + rng.gauss(0, noise), d) for d in docs]
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [{"id": d["id"], "text": d["text"], "score": s} for s, d in scored[:k]]
+
+    return docs, branch(1.0, VECTOR_K), branch(1.4, BM25_K)
+
+
+def rerank(rng, rel_by_id, candidates):
+    scored = [(rel_by_id[c["id"]] + rng.gauss(0, 0.3), c) for c in candidates]
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [c for _, c in scored[:TOP_N]]
+
+
+def ndcg(ranked_ids, rel_by_id):
+    dcg = sum((2 ** rel_by_id[i] - 1) / math.log2(r + 2) for r, i in enumerate(ranked_ids))
+    ideal = sorted(rel_by_id.values(), reverse=True)[:TOP_N]
+    idcg = sum((2 ** rel - 1) / math.log2(r + 2) for r, rel in enumerate(ideal))
+    return dcg / idcg if idcg else 1.0
+
+
+def run(label, queries, select, seed):
+    rng = random.Random(seed)
+    quality, sent, latency, skipped = [], [], [], 0
+
+    for docs, vector, bm25 in queries:
+        rel_by_id = {d["id"]: d["rel"] for d in docs}
+        to_rerank, final = select(vector, bm25)
+        if to_rerank:
+            final = rerank(rng, rel_by_id, to_rerank)
+            latency.append(RERANK_BASE_MS + RERANK_PER_DOC_MS * len(to_rerank))
+        else:
+            skipped += 1
+            latency.append(0.0)
+        sent.append(len(to_rerank))
+        quality.append(ndcg([c["id"] for c in final], rel_by_id))
+
+    print(f"{label:<30} nDCG@{TOP_N}={statistics.mean(quality):.3f}  "
+          f"docs/rerank={statistics.mean(sent):5.1f}  skipped={skipped / len(queries):5.1%}  "
+          f"rerank ms={statistics.mean(latency):6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--max-rerank", type=int, default=20)
+    parser.add_argument("--margins", default="0.1,0.2,0.3")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = [make_query(rng) for _ in range(args.queries)]
+
+    def legacy(vector, bm25):
+        merged = {c["id"]: c for c in vector + bm25}
+        return list(merged.values()), None
+
+    run("legacy merge-all", queries, legacy, args.seed)
+
+    for method in ("rrf", "weighted"):
+        def capped(vector, bm25, method=method):
+            fused = fuse({"vector": vector, "bm25": bm25}, method=method)
+            return fused[:args.max_rerank], None
+
+        run(f"{method} cap={args.max_rerank}", queries, capped, args.seed)
+
+        for margin in [float(m) for m in args.margins.split(",")]:
+            def pruned(vector, bm25, method=method, margin=margin):
+                fused = fuse({"vector": vector, "bm25": bm25}, method=method)
+                if is_decisive(fused, TOP_N, margin):
+                    return [], fused[:TOP_N]
+                return fused[:args.max_rerank], None
+
+            run(f"{method} cap+skip margin={margin}", queries, pruned, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_session_memory.py
+"""
+Session memory: embeddings as per-chunk Python float lists vs. the shared
+process-wide EmbeddingMatrix
+
+"Before" is what app.py used to keep in st.session_state.all_chunks: one
+dict per chunk holding its text and its vector as list[float], once per
+browser session. "After" keeps the chunk dicts without vectors per
+session plus a single float32 / float16 matrix for the process.
+Allocations are measured with tracemalloc (NumPy buffers included).
+
+    python -m benchmarks.bench_session_memory --chunks 5000 --sessions 1,4
+"""
+import argparse
+import gc
+import tracemalloc
+
+import numpy as np
+
+from vectorstore.embedding_matrix import EmbeddingMatrix
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1024, help="llama-text-embed-v2 default")
+    parser.add_argument("--sessions", default="1,4")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.chunks, args.dim)).astype(np.float32)
+    ids = [f"doc_{i:016x}" for i in range(args.chunks)]
+    text = "lorem ipsum " * 150   # ~300 words, shared: only the dicts are counted
+
+    def chunk_dicts(with_vectors: bool):
+        return {
+            vector_id: dict({"id": vector_id, "text": text, "chunk_index": i},
+                            **({"vector": vectors[i].tolist()} if with_vectors else {}))
+            for i, vector_id in enumerate(ids)
+        }
+
+    def matrix(dtype):
+        m = EmbeddingMatrix(dtype=dtype, max_rows=len(ids))
+        m.add(ids, vectors)
+        return m
+
+    per_session_lists = measure(lambda: chunk_dicts(True))
+    per_session_slim = measure(lambda: chunk_dicts(False))
+    shared = {dtype: measure(lambda dtype=dtype: matrix(dtype)) for dtype in ("float32", "float16")}
+
+    mb = 2 ** 20
+    print(f"{args.chunks} chunks x {args.dim} dims")
+    print(f"{'sessions':>8} {'before MB':>10} {'after f32 MB':>13} {'after f16 MB':>13} {'saved':>7}")
+    for n in [int(x) for x in args.sessions.split(",")]:
+        before = n * per_session_lists
+        after32 = n * per_session_slim + shared["float32"]
+        after16 = n * per_session_slim + shared["float16"]
+        print(f"{n:>8} {before / mb:>10.1f} {after32 / mb:>13.1f} {after16 / mb:>13.1f} "
+              f"{1 - after32 / before:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_startup.py
+"""
+Cold import time of the app modules (python -X importtime)
+
+Each module is imported in a fresh interpreter, with no API keys, so
+the numbers include any client construction done at import.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --top 15
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "utils.clients",
+    "vectorstore.embeddings",
+    "vectorstore.indexer",
+    "vectorstore.retriever",
+    "crew.rag_crew",
+]
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_profile(module: str, root: str):
+    """
+    Returns (ok, cumulative µs of `module`, [(cumulative µs, name), ...], error)
+    """
+    env = {k: v for k, v in os.environ.items()
+           if k not in ("PINECONE_API_KEY", "PINECONE_INDEX", "OPENAI_API_KEY")}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root, env=env, capture_output=True, text=True,
+    )
+
+    imports = []
+    total = None
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        if len(indent) <= 1:   # top-level imports only
+            imports.append((cumulative, name))
+        if name == module:
+            total = cumulative
+
+    error = ""
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1]
+    return proc.returncode == 0, total, imports, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time startup benchmark")
+    parser.add_argument("--modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per module (median)")
+    parser.add_argument("--top", type=int, default=10, help="heaviest imports to list")
+    parser.add_argument("--root", default=os.getcwd(), help="checkout to measure")
+    args = parser.parse_args()
+
+    heaviest = {}
+    print(f"{'module':<26}{'median ms':>12}  status")
+    for module in args.modules:
+        totals = []
+        ok, error = True, ""
+        for _ in range(args.repeat):
+            ok, total, imports, error = import_profile(module, args.root)
+            if total is not None:
+                totals.append(total / 1000)
+            for cumulative, name in imports:
+                heaviest[name] = max(heaviest.get(name, 0), cumulative)
+        median = f"{statistics.median(totals):.1f}" if totals else "-"
+        print(f"{module:<26}{median:>12}  {'ok' if ok else 'FAILED: ' + error}")
+
+    print("\nHeaviest top-level imports (cumulative ms):")
+    for name, cumulative in sorted(heaviest.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {cumulative / 1000:>9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_vector_index.py
+"""
+LocalVectorIndex: recall@k vs. query latency against exact float32 search
+
+Synthetic clustered unit vectors (a Gaussian mixture, closer to real
+embeddings than uniform noise); queries are perturbed corpus points.
+Ground truth is an exact float32 matmul. Every configuration is built
+in memory and compacted once, as after a full ingestion. Raise --spread
+(or --clusters) to make neighbourhoods less separable and IVF harder.
+
+    python -m benchmarks.bench_vector_index --sizes 10000,100000 --nprobe 4,8,16,32
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from vectorstore.vector_index import LocalVectorIndex
+
+BATCH = 1000
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, spread: float, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, size=n)] + spread * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def build(vectors, dtype: str, ivf_min_vectors: int):
+    index = LocalVectorIndex(path=None, dtype=dtype, ivf_min_vectors=ivf_min_vectors)
+    start = time.perf_counter()
+    for i in range(0, len(vectors), BATCH):
+        index.upsert(vectors=[
+            {"id": str(j), "values": vectors[j], "metadata": {"doc_id": f"doc{j % 50}"}}
+            for j in range(i, min(i + BATCH, len(vectors)))
+        ])
+    index.save()
+    return index, time.perf_counter() - start
+
+
+def run(index, queries, truth, top_k: int):
+    samples, hits = [], 0
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        res = index.query(q, top_k=top_k)
+        samples.append((time.perf_counter() - start) * 1000)
+        hits += len(expected & {int(m.id) for m in res.matches})
+    return samples, hits / (len(queries) * top_k)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--dim", type=int, default=1024, help="llama-text-embed-v2 default")
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=1.0, help="within-cluster noise (higher = harder)")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", default="4,8,16,32")
+    args = parser.parse_args()
+
+    print(f"{'vectors':>9} {'config':<18} {'MB':>7} {'build s':>8} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'mean ms':>8} {'recall@' + str(args.top_k):>10}")
+
+    for n in [int(x) for x in args.sizes.split(",")]:
+        vectors = synthetic_vectors(n, args.dim, args.clusters, args.spread)
+        rng = np.random.default_rng(1)
+        queries = vectors[rng.integers(0, n, size=args.queries)]
+        queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+
+        # ---- Ground truth: exact float32 ----
+        truth = []
+        for q in queries:
+            scores = vectors @ (q / np.linalg.norm(q))
+            truth.append(set(np.argpartition(-scores, args.top_k - 1)[:args.top_k].tolist()))
+
+        configs = [(f"exact {dtype}", dtype, None) for dtype in ("float32", "float16", "int8")]
+        configs += [(f"ivf int8 nprobe={p}", "int8", int(p)) for p in args.nprobe.split(",")]
+
+        built = {}
+        for label, dtype, nprobe in configs:
+            ivf = nprobe is not None
+            key = (dtype, ivf)
+            if key not in built:
+                # IVF lists are built at compaction when the segment is big enough
+                built[key] = build(vectors, dtype, ivf_min_vectors=0 if ivf else n + 1)
+            index, build_s = built[key]
+            if ivf:
+                index.nprobe = nprobe
+
+            samples, recall = run(index, queries, truth, args.top_k)
+            mb = index.stats()["vector_bytes"] / 2 ** 20
+            print(f"{n:>9} {label:<18} {mb:>7.1f} {build_s:>8.1f} {percentile(samples, 50):>8.2f} "
+                  f"{percentile(samples, 95):>8.2f} {statistics.mean(samples):>8.2f} {recall:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# benchmarks/fakes.py
+"""
+In-process stand-ins for Pinecone (index + inference) and the chat model,
+used by the benchmarks. Every fake takes an injected `latency` (seconds).
+"""
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import numpy as np
+from pinecone.exceptions import PineconeApiException
+
+DIM = 1024
+
+
+def fake_vector(text: str, dim: int = DIM) -> list[float]:
+    """
+    Deterministic pseudo-embedding derived from the text hash
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32).tolist()
+
+
+class _RateLimitedResponse:
+    """
+    Minimal HTTP response object accepted by PineconeApiException
+    """
+
+    def __init__(self, retry_after: float):
+        self.status = 429
+        self.reason = "Too Many Requests"
+        self.data = b'{"error": "rate limit exceeded"}'
+        self._headers = {"Retry-After": f"{retry_after:.2f}"}
+
+    def getheaders(self):
+        return self._headers
+
+
+class FakeInference:
+    """
+    Fake `pc.inference` with a server-side quota
+
+    embed() and rerank() share the quota. Requests over `requests_per_sec`
+    within a sliding one-second window, plus a random `error_rate` share
+    of requests, fail with 429 and a Retry-After header. Every call sleeps
+    `latency` seconds.
+    """
+
+    def __init__(self, latency: float = 0.1, requests_per_sec: float = 10,
+                 error_rate: float = 0.0, dim: int = DIM, seed: int = 0,
+                 rerank_latency_per_doc: float = 0.0):
+        self.latency = latency
+        self.rerank_latency_per_doc = rerank_latency_per_doc
+        self.requests_per_sec = requests_per_sec
+        self.error_rate = error_rate
+        self.dim = dim
+        self.embed_calls = 0
+        self.embedded_texts = 0
+        self.rate_limited = 0
+        self._window = deque()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0] > 1.0:
+                self._window.popleft()
+
+            over_quota = len(self._window) >= self.requests_per_sec
+            if over_quota or self._rng.random() < self.error_rate:
+                self.rate_limited += 1
+                retry_after = (1.0 - (now - self._window[0])) if over_quota else 0.2
+                raise PineconeApiException(http_resp=_RateLimitedResponse(max(retry_after, 0.05)))
+
+            self._window.append(now)
+
+    def embed(self, model, inputs, parameters=None):
+        self._admit()
+        time.sleep(self.latency)
+        with self._lock:
+            self.embed_calls += 1
+            self.embedded_texts += len(inputs)
+        return SimpleNamespace(
+            data=[SimpleNamespace(values=fake_vector(t, self.dim)) for t in inputs]
+        )
+
+
+    def rerank(self, model, query, documents, top_n=None, return_documents=True, **kwargs):
+        """
+        Scores query-term overlap; latency grows with the payload
+        """
+        self._admit()
+        texts = [d["text"] if isinstance(d, dict) else d for d in documents]
+        time.sleep(self.latency + self.rerank_latency_per_doc * len(texts))
+
+        q_terms = set(re.findall(r"\w+", query.lower()))
+        scored = []
+        for i, text in enumerate(texts):
+            terms = set(re.findall(r"\w+", text.lower()))
+            score = len(q_terms & terms) / (len(q_terms) or 1)
+            scored.append((score, i))
+        scored.sort(reverse=True)
+
+        return SimpleNamespace(results=[
+            SimpleNamespace(
+                index=i,
+                score=score,
+                document={"text": texts[i]} if return_documents else None,
+            )
+            for score, i in scored[:top_n or len(texts)]
+        ])
+
+
+class FakeIndex:
+    """
+    Fake Pinecone Index: exact cosine search over an in-memory matrix
+    Supports upsert / query (with {"doc_id": ...} filter) / fetch / delete.
+    """
+
+    def __init__(self, latency: float = 0.0, dim: int = DIM):
+        self.latency = latency
+        self.dim = dim
+        self.vectors = {}       # id -> (np vector, metadata)
+        self._matrix = None
+        self._ids = []
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            for v in vectors:
+                values = np.asarray(v["values"], dtype=np.float32)
+                self.vectors[v["id"]] = (values / (np.linalg.norm(values) or 1.0), v.get("metadata") or {})
+            self._matrix = None
+        return SimpleNamespace(upserted_count=len(vectors))
+
+    def delete(self, ids=None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            for vid in ids or []:
+                self.vectors.pop(vid, None)
+            self._matrix = None
+
+    def list(self, prefix="", limit=100, **kwargs):
+        """
+        Pages of ids starting with `prefix`, like the serverless list()
+        """
+        with self._lock:
+            ids = sorted(vid for vid in self.vectors if vid.startswith(prefix))
+        for i in range(0, len(ids), limit):
+            time.sleep(self.latency)
+            yield ids[i:i + limit]
+
+    def fetch(self, ids, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            found = {
+                vid: SimpleNamespace(id=vid, values=self.vectors[vid][0].tolist(), metadata=self.vectors[vid][1])
+                for vid in ids if vid in self.vectors
+            }
+        return SimpleNamespace(vectors=found)
+
+    def query(self, vector, top_k=10, include_metadata=False, filter=None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            if self._matrix is None:
+                self._ids = list(self.vectors)
+                self._matrix = (
+                    np.stack([self.vectors[i][0] for i in self._ids])
+                    if self._ids else np.zeros((0, self.dim), np.float32)
+                )
+            ids, matrix = self._ids, self._matrix
+
+            if filter and "doc_id" in filter:
+                wanted = filter["doc_id"]
+                if isinstance(wanted, dict):   # {"$ne": doc_id}
+                    match = lambda value: value != wanted["$ne"]
+                else:
+                    match = lambda value: value == wanted
+                rows = [i for i, vid in enumerate(ids) if match(self.vectors[vid][1].get("doc_id"))]
+                ids = [ids[i] for i in rows]
+                matrix = matrix[rows]
+
+            if not ids:
+                return SimpleNamespace(matches=[])
+
+            q = np.asarray(vector, dtype=np.float32)
+            sims = matrix @ (q / (np.linalg.norm(q) or 1.0))
+            k = min(top_k, len(ids))
+            top = np.argpartition(-sims, k - 1)[:k]
+            top = top[np.argsort(-sims[top])]
+
+            return SimpleNamespace(matches=[
+                SimpleNamespace(
+                    id=ids[i],
+                    score=float(sims[i]),
+                    metadata=self.vectors[ids[i]][1] if include_metadata else None,
+                )
+                for i in top
+            ])
+
+
+class FakeChatModel:
+    """
+    Fake ChatOpenAI: invoke() / stream() echo the start of the context
+    """
+
+    def __init__(self, latency: float = 0.3, token_latency: float = 0.005, answer_tokens: int = 120):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.answer_tokens = answer_tokens
+
+    def _answer_words(self, prompt: str):
+        context = prompt.split("Context:", 1)[-1]
+        words = context.split()[:self.answer_tokens]
+        return words or ["No", "relevant", "information", "found", "in", "the", "provided", "documents."]
+
+    def invoke(self, prompt):
+        words = self._answer_words(prompt)
+        time.sleep(self.latency + self.token_latency * len(words))
+        return SimpleNamespace(content=" ".join(words))
+
+    def stream(self, prompt):
+        time.sleep(self.latency)
+        for word in self._answer_words(prompt):
+            time.sleep(self.token_latency)
+            yield SimpleNamespace(content=word + " ")
+
+
+class FakePinecone:
+    def __init__(self, inference=None, index=None):
+        self.inference = inference or FakeInference()
+        self.index = index or FakeIndex()
+
+    def Index(self, *args, **kwargs):
+        return self.index
+
+
+def install_fakes(pc: FakePinecone, llm: FakeChatModel):
+    """
+    Makes the app modules use the fakes through the client registry
+    (safe before or after importing vectorstore.* / crew.*)
+    """
+    from utils import clients
+
+    os.environ.setdefault("PINECONE_API_KEY", "fake")
+    os.environ.setdefault("PINECONE_INDEX", "fake")
+    clients.set_factory("pinecone", lambda: pc)
+    clients.set_factory("index", lambda: pc.Index())
+    clients.set_factory("llm", lambda: llm)
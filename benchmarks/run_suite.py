@@ -0,0 +1,163 @@
+# benchmarks/run_suite.py
+"""
+End-to-end performance suite against in-process fakes (no network)
+
+Measures load_file, embed_texts, upsert_chunks, BM25Store.search and
+retrieve_chunks at several corpus sizes and writes a JSON report, so two
+runs can be diffed for regressions.
+
+    python -m benchmarks.run_suite --sizes 1000,10000 --out benchmarks/results/run.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fakes import FakeChatModel, FakeIndex, FakeInference, FakePinecone, install_fakes
+
+WORDS = (
+    "model data learning training feature regression classification cluster "
+    "vector gradient loss accuracy precision recall tree forest ensemble kernel "
+    "network layer neuron bias variance overfitting validation sample label"
+).split()
+
+
+def percentiles(samples_ms: list[float]) -> dict:
+    ordered = sorted(samples_ms)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.mean(ordered),
+        "p50_ms": pick(50),
+        "p95_ms": pick(95),
+        "p99_ms": pick(99),
+    }
+
+
+def timed(fn, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def synthetic_text(n_words: int, seed: int = 0) -> str:
+    import random
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) + str(rng.randint(0, 500)) for _ in range(n_words))
+
+
+class Upload(io.BytesIO):
+    """
+    Mimics Streamlit's UploadedFile for load_file
+    """
+
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000", help="corpus sizes in chunks")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--index-latency", type=float, default=0.01)
+    parser.add_argument("--rerank-latency", type=float, default=0.03)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--out", default=os.path.join("benchmarks", "results", "latest.json"))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+
+    # ---- Fakes + isolated state (env read at import: set before importing app modules) ----
+    os.environ["EMBED_CACHE"] = "0"
+    os.environ["EMBED_REQUESTS_PER_MIN"] = "1000000"
+    os.environ["EMBED_TOKENS_PER_MIN"] = "1000000000"
+    inference = FakeInference(latency=args.embed_latency, requests_per_sec=1e9, dim=args.dim,
+                              rerank_latency_per_doc=args.rerank_latency / 20)
+    index = FakeIndex(latency=args.index_latency, dim=args.dim)
+    install_fakes(FakePinecone(inference, index), FakeChatModel(latency=args.llm_latency))
+
+    os.environ["DOC_REGISTRY_DB"] = os.path.join(workdir, "documents.sqlite")
+    os.environ["CHUNK_STORE_PATH"] = os.path.join(workdir, "chunks.sqlite")
+
+    from utils.file_loader import load_file
+    from vectorstore.bm25_store import BM25Store
+    from vectorstore.embeddings import embed_texts
+    from vectorstore.indexer import chunk_id, upsert_chunks
+    from vectorstore.retriever import retrieve_chunks
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": [],
+    }
+
+    def add(stage, size, samples, items=None):
+        row = {"stage": stage, "corpus_chunks": size, **percentiles(samples)}
+        if items:
+            row["items_per_sec"] = items / (sum(samples) / 1000)
+        report["results"].append(row)
+        print(f"{stage:<18} {size:>8}  p50={row['p50_ms']:9.2f}ms  p95={row['p95_ms']:9.2f}ms  "
+              f"p99={row['p99_ms']:9.2f}ms" + (f"  {row['items_per_sec']:9.0f}/s" if items else ""))
+
+    queries = [synthetic_text(4, seed=10_000 + i) for i in range(args.queries)]
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        index.delete(ids=list(index.vectors))   # each size gets a fresh index
+        # ---- load_file: one document of `size` chunks ----
+        # Comfortably more than `size` token-budgeted chunks; the corpus keeps `size`
+        data = synthetic_text(size * 250, seed=size).encode("utf-8")
+        samples = timed(lambda: load_file(Upload(f"doc_{size}.txt", data)), repeat=3)
+        chunks = load_file(Upload(f"doc_{size}.txt", data))
+        add("load_file", size, samples, items=len(chunks) * 3)
+        chunks = chunks[:size]
+
+        doc_id = f"bench{size}"
+        for chunk in chunks:
+            chunk["id"] = chunk_id(doc_id, chunk["text"])   # same ids as the vectors
+
+        # ---- embed_texts ----
+        texts = [c["text"] for c in chunks]
+        start = time.perf_counter()
+        vectors = embed_texts(texts, input_type="passage")
+        add("embed_texts", size, [(time.perf_counter() - start) * 1000], items=len(texts))
+
+        # ---- upsert_chunks (precomputed vectors) ----
+        start = time.perf_counter()
+        upsert_chunks(chunks, doc_id=doc_id, doc_name=f"doc_{size}.txt", vectors=vectors)
+        add("upsert_chunks", size, [(time.perf_counter() - start) * 1000], items=len(chunks))
+
+        # ---- BM25Store.search ----
+        bm25 = BM25Store(path=os.path.join(workdir, f"bm25_{size}"))
+        bm25.add_chunks(chunks, doc_id=doc_id)
+        samples = [timed(lambda q=q: bm25.search(q, top_k=20), 1)[0] for q in queries]
+        add("bm25_search", size, samples, items=len(queries))
+
+        # ---- retrieve_chunks (hybrid, end to end) ----
+        samples = [timed(lambda q=q: retrieve_chunks(q, top_k=5, bm25_store=bm25), 1)[0] for q in queries]
+        add("retrieve_chunks", size, samples, items=len(queries))
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# crew/context_builder.py
+
+import os
+import re
+
+from utils.tokens import count_tokens as _count_tokens, get_encoding
+
+# ---------------- Token Budget ----------------
+# Budget grows with the requested answer length, capped for cost/latency
+CONTEXT_BASE_TOKENS = int(os.getenv("CONTEXT_BASE_TOKENS", "1500"))
+CONTEXT_TOKENS_PER_SUMMARY_WORD = int(os.getenv("CONTEXT_TOKENS_PER_SUMMARY_WORD", "6"))
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "6000"))
+
+# Consecutive chunks repeat the previous chunk's tail, up to overlap_tokens
+# (utils.chunker.CHUNK_OVERLAP_TOKENS); shorter word matches are coincidence
+MIN_OVERLAP_WORDS = 8
+MAX_OVERLAP_WORDS = 200
+
+LLM_MODEL = "gpt-4.1-mini"
+LLM_ENCODING = "o200k_base"   # if tiktoken does not know LLM_MODEL
+
+
+def count_tokens(text: str) -> int:
+    return _count_tokens(text, LLM_ENCODING, LLM_MODEL)
+
+
+def context_budget(summary_length: int) -> int:
+    return min(
+        CONTEXT_MAX_TOKENS,
+        CONTEXT_BASE_TOKENS + CONTEXT_TOKENS_PER_SUMMARY_WORD * int(summary_length),
+    )
+
+
+def _overlap(a: list[str], b: list[str]) -> int:
+    """
+    Length of the longest suffix of `a` that is a prefix of `b`
+    """
+    limit = min(len(a), len(b), MAX_OVERLAP_WORDS)
+    if limit < MIN_OVERLAP_WORDS:
+        return 0
+    first = b[0]
+    for p in range(len(a) - limit, len(a) - MIN_OVERLAP_WORDS + 1):
+        if a[p] == first and a[p:] == b[:len(a) - p]:
+            return len(a) - p
+    return 0
+
+
+def _contains(a: list[str], b: list[str]) -> bool:
+    return len(b) <= len(a) and f" {' '.join(b)} " in f" {' '.join(a)} "
+
+
+def build_context(chunks: list[str], summary_length: int = 200, budget: int = None):
+    """
+    Packs chunks (already in rerank order) into a token-budgeted context
+
+    - drops chunks fully contained in one already packed
+    - trims spans shared with an already packed neighbour chunk
+      (ingestion overlap), keeping the text once
+    - adds chunks greedily while they fit the budget; the first chunk is
+      truncated rather than dropped if it alone exceeds it
+
+    Returns (context_text, stats)
+    """
+    budget = budget or context_budget(summary_length)
+    packed = []          # (words, text), in rerank order
+    used_tokens = 0
+    tokens_in = 0
+    overlap_removed = 0
+    dropped = 0
+
+    for text in chunks:
+        # Overlap is matched on words; the emitted text is the original slice,
+        # so line breaks, lists and table rows survive
+        spans = [m.span() for m in re.finditer(r"\S+", text)]
+        if not spans:
+            continue
+        all_words = [text[start:end] for start, end in spans]
+        original_tokens = count_tokens(text[spans[0][0]:spans[-1][1]])
+        tokens_in += original_tokens
+
+        if any(_contains(p, all_words) for p, _ in packed):
+            overlap_removed += original_tokens
+            continue
+
+        # ---- Trim overlap with packed neighbours ----
+        lo, hi = 0, len(all_words)   # kept word range
+        for p, _ in packed:
+            lo += _overlap(p, all_words[lo:hi])        # p ... then words
+            if lo < hi:
+                hi -= _overlap(all_words[lo:hi], p)    # words ... then p
+            if lo >= hi:
+                break
+        if lo >= hi:
+            overlap_removed += original_tokens
+            continue
+
+        words = all_words[lo:hi]
+        text = text[spans[lo][0]:spans[hi - 1][1]]
+        tokens = count_tokens(text)
+        overlap_removed += original_tokens - tokens
+
+        # ---- Greedy packing ----
+        if used_tokens + tokens > budget:
+            if packed:
+                dropped += 1
+                continue
+            text = _truncate(text, budget)
+            words = text.split()
+            tokens = count_tokens(text)
+
+        packed.append((words, text))
+        used_tokens += tokens
+
+    context_text = "\n\n".join(t for _, t in packed)
+    stats = {
+        "budget": budget,
+        "tokens_in": tokens_in,
+        "tokens_packed": used_tokens,
+        "tokens_saved": tokens_in - used_tokens,
+        "overlap_tokens_removed": overlap_removed,
+        "chunks_used": len(packed),
+        "chunks_dropped": dropped,
+    }
+    return context_text, stats
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    encoding = get_encoding(LLM_ENCODING, LLM_MODEL)
+    if encoding:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * 4]
@@ -1,12 +1,9 @@
 # crew/rag_crew.py
 
-from langchain_openai import ChatOpenAI
+import time
 
-# ---------------- LLM ----------------
-llm = ChatOpenAI(
-    model="gpt-4.1-mini",
-    temperature=0.0  # 🔒 reduce hallucination
-)
+from crew.context_builder import build_context
+from utils.clients import get_llm
 
 
 def detect_intent(query: str):
@@ -22,12 +19,16 @@ def detect_intent(query: str):
     return "Answer the question directly."
 
 
-def summarize_chunks_task(context):
+NO_INFO_ANSWER = "No relevant information found in the provided documents."
+
+
+def build_prompt(context, stats: dict = None):
     """
-    Strict RAG Answering:
-    - Uses ONLY retrieved document content
-    - No external knowledge
-    - No meta or disclaimer sentences
+    Strict RAG prompt from the retrieved chunks, or None if there is no
+    usable context (the caller must then answer NO_INFO_ANSWER)
+
+    The context is token-budgeted and de-overlapped (see
+    crew.context_builder); packing stats are written into `stats`.
     """
 
     chunks = context.get("retrieved_chunks", [])
@@ -36,9 +37,7 @@ def summarize_chunks_task(context):
 
     # 🚨 No retrieved chunks → hard refusal
     if not chunks:
-        return {
-            "summary": "No relevant information found in the provided documents."
-        }
+        return None
 
     # ---------------- Clean Context ----------------
     clean_context = []
@@ -52,15 +51,19 @@ def summarize_chunks_task(context):
             clean_context.append(text.strip())
 
     if not clean_context:
-        return {
-            "summary": "No relevant information found in the provided documents."
-        }
-
-    context_text = "\n\n".join(clean_context)
+        return None
+
+    context_text, packing = build_context(
+        clean_context,
+        summary_length=summary_length,
+        budget=context.get("context_budget"),
+    )
+    if stats is not None:
+        stats.update(packing)
     intent_instruction = detect_intent(query)
 
     # ---------------- PROMPT ----------------
-    prompt = f"""
+    return f"""
 You are a document-grounded AI assistant.
 
 CRITICAL RULES:
@@ -95,17 +98,74 @@ Answer Style Rules:
 Final Answer:
 """
 
+
+def finalize_summary(summary: str) -> str:
+    """
+    🔒 Final safety net, applied to the complete answer
+    """
+    summary = (summary or "").strip()
+    if not summary or "no relevant information" in summary.lower():
+        return NO_INFO_ANSWER
+    return summary
+
+
+def summarize_chunks_task(context):
+    """
+    Strict RAG Answering:
+    - Uses ONLY retrieved document content
+    - No external knowledge
+    - No meta or disclaimer sentences
+
+    If the LLM fails, "summary" is empty and "error" holds the error.
+    """
+
+    context_stats = {}
+    prompt = build_prompt(context, context_stats)
+    if prompt is None:
+        return {"summary": NO_INFO_ANSWER}
+
     try:
-        response = llm.invoke(prompt)
-        summary = response.content.strip()
+        response = get_llm().invoke(prompt)
+        summary = finalize_summary(response.content)
+
+    except Exception as e:
+        return {"summary": "", "error": str(e), "context_stats": context_stats}
+
+    return {"summary": summary, "context_stats": context_stats}
+
+
+def stream_summary_task(context, metrics: dict = None):
+    """
+    Streaming variant of summarize_chunks_task: yields answer text as the
+    LLM produces it. Apply finalize_summary to the joined text once the
+    stream ends.
+
+    Fills `metrics` with llm_ttft (time to first token) and llm_total, in ms,
+    and the context packing stats under "context". If the LLM fails, the
+    stream just ends and metrics["llm_error"] holds the error: the text
+    yielded so far is a partial answer, not a summary.
+    """
+    if metrics is None:
+        metrics = {}
 
-        # 🔒 Final safety net
-        if not summary or "no relevant information" in summary.lower():
-            return {
-                "summary": "No relevant information found in the provided documents."
-            }
+    metrics["context"] = {}
+    prompt = build_prompt(context, metrics["context"])
+    if prompt is None:
+        yield NO_INFO_ANSWER
+        return
+
+    started = time.perf_counter()
+    try:
+        for piece in get_llm().stream(prompt):
+            text = piece.content
+            if not text:
+                continue
+            if "llm_ttft" not in metrics:
+                metrics["llm_ttft"] = (time.perf_counter() - started) * 1000
+            yield text
 
     except Exception as e:
-        summary = f"Error generating response: {e}"
+        metrics["llm_error"] = str(e)
 
-    return {"summary": summary}
+    finally:
+        metrics["llm_total"] = (time.perf_counter() - started) * 1000
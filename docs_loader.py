@@ -1,32 +1,175 @@
-import csv
-import os
-
-DOC_REGISTRY_FILE = "indexed_documents.csv"
-
-def save_documents(doc_name: str, doc_id: str):
-    rows = []
-
-    # Load existing
-    if os.path.exists(DOC_REGISTRY_FILE):
-        with open(DOC_REGISTRY_FILE, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-        if any(r["doc_id"] == doc_id for r in rows):
-            return
-
-    # Append new
-    rows.append({"doc_name": doc_name, "doc_id": doc_id})
-
-    # Write back
-    with open(DOC_REGISTRY_FILE, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["doc_name", "doc_id"])
-        writer.writeheader()
-        writer.writerows(rows)
-
-def load_documents() -> dict:
-    if not os.path.exists(DOC_REGISTRY_FILE):
-        return {}
-    with open(DOC_REGISTRY_FILE, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        return {row["doc_name"]: row["doc_id"] for row in reader}
-
+import csv
+import os
+import sqlite3
+import threading
+import time
+
+# 🔑 Document registry: SQLite (WAL) with a process-level cache
+DOC_REGISTRY_DB = os.getenv("DOC_REGISTRY_DB", os.path.join(".cache", "documents.sqlite"))
+DOC_REGISTRY_FILE = "indexed_documents.csv"   # legacy registry, imported once
+
+
+class DocumentRegistry:
+    """
+    doc_id -> (doc_name, chunks, bytes, indexed_at)
+
+    - doc_id is the primary key and doc_name is indexed: O(1)-ish lookups
+    - writes are single upsert statements, batched with save_many; WAL lets
+      readers run while another session or process writes
+    - reads are served from an in-process cache, reloaded after a local
+      write or when SQLite's data_version shows another connection committed
+    - the first doc_name recorded for a doc_id is kept, like the CSV was
+    - unrelated documents may share a doc_name (see indexer.match_document)
+    """
+
+    def __init__(self, path: str = DOC_REGISTRY_DB, legacy_csv: str = DOC_REGISTRY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_id = None
+        self._by_name = None   # doc_name -> [doc_id], oldest first
+        self._names = None     # unique display name -> doc_id
+        self._version = None
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " doc_id TEXT PRIMARY KEY,"
+            " doc_name TEXT NOT NULL,"
+            " chunks INTEGER,"
+            " bytes INTEGER,"
+            " indexed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_doc_name ON documents(doc_name)"
+        )
+        self._conn.commit()
+
+        if legacy_csv and os.path.exists(legacy_csv):
+            self._import_csv(legacy_csv)
+
+    def _import_csv(self, csv_path: str):
+        with open(csv_path, "r", encoding="utf-8") as f:
+            rows = [
+                {"doc_name": r["doc_name"], "doc_id": r["doc_id"]}
+                for r in csv.DictReader(f)
+            ]
+        if rows:
+            # Existing rows are left untouched: importing twice is harmless
+            self.save_many(rows)
+
+    # ============================================================
+    # Writes
+    # ============================================================
+    def save_many(self, rows: list[dict]):
+        """
+        Rows: {"doc_id", "doc_name", "chunks"?, "bytes"?, "indexed_at"?}
+        Stats given for an existing doc_id replace the stored ones.
+        """
+        now = time.time()
+        params = [
+            (r["doc_id"], r["doc_name"], r.get("chunks"), r.get("bytes"), r.get("indexed_at") or now)
+            for r in rows
+        ]
+        with self._lock:
+            with self._conn:   # one transaction
+                self._conn.executemany(
+                    "INSERT INTO documents (doc_id, doc_name, chunks, bytes, indexed_at)"
+                    " VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT(doc_id) DO UPDATE SET"
+                    "  chunks = COALESCE(excluded.chunks, chunks),"
+                    "  bytes = COALESCE(excluded.bytes, bytes),"
+                    "  indexed_at = CASE WHEN excluded.chunks IS NULL"
+                    "   THEN indexed_at ELSE excluded.indexed_at END",
+                    params,
+                )
+            self._by_id = None   # invalidate the process cache
+
+    def save(self, doc_name: str, doc_id: str, **stats):
+        self.save_many([dict(stats, doc_name=doc_name, doc_id=doc_id)])
+
+    # ============================================================
+    # Reads (cached)
+    # ============================================================
+    def _cached(self):
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._by_id is None or version != self._version:
+                rows = self._conn.execute(
+                    "SELECT doc_id, doc_name, chunks, bytes, indexed_at"
+                    " FROM documents ORDER BY indexed_at, rowid"
+                ).fetchall()
+                self._by_id = {
+                    row[0]: dict(zip(("doc_id", "doc_name", "chunks", "bytes", "indexed_at"), row))
+                    for row in rows
+                }
+                self._by_name = {}
+                for doc in self._by_id.values():
+                    self._by_name.setdefault(doc["doc_name"], []).append(doc["doc_id"])
+                # The most recently indexed document keeps a shared name
+                self._names = {}
+                for doc_name, doc_ids in self._by_name.items():
+                    self._names[doc_name] = doc_ids[-1]
+                    for doc_id in doc_ids[:-1]:
+                        self._names[f"{doc_name} ({doc_id[:8]})"] = doc_id
+                self._version = version
+            return self._by_id, self._by_name
+
+    def get(self, doc_id: str):
+        by_id, _ = self._cached()
+        doc = by_id.get(doc_id)
+        return dict(doc) if doc else None
+
+    def find(self, doc_name: str):
+        """
+        doc_id most recently indexed under a name, or None
+        """
+        _, by_name = self._cached()
+        doc_ids = by_name.get(doc_name)
+        return doc_ids[-1] if doc_ids else None
+
+    def find_all(self, doc_name: str) -> list[str]:
+        """
+        Every doc_id registered under a name, oldest first
+        """
+        _, by_name = self._cached()
+        return list(by_name.get(doc_name, []))
+
+    def names(self) -> dict:
+        """
+        {display name: doc_id}; documents sharing a name other than the
+        latest are listed as "name (doc_id[:8])"
+        """
+        self._cached()
+        with self._lock:
+            return dict(self._names)
+
+    def stats(self) -> list[dict]:
+        by_id, _ = self._cached()
+        return [dict(doc) for doc in by_id.values()]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> DocumentRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DocumentRegistry()
+        return _registry
+
+
+def save_documents(doc_name: str, doc_id: str, chunks: int = None, n_bytes: int = None):
+    get_registry().save(doc_name, doc_id, chunks=chunks, bytes=n_bytes)
+
+
+def load_documents() -> dict:
+    """
+    {display name: doc_id}
+    """
+    return get_registry().names()
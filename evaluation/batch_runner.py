@@ -0,0 +1,162 @@
+# evaluation/batch_runner.py
+"""
+Headless batch QA + ROUGE evaluation
+
+    python -m evaluation.batch_runner                        # reference_summaries.EVAL_QUESTIONS
+    python -m evaluation.batch_runner --questions qs.jsonl --workers 8 --out results.csv
+
+JSONL lines: {"question": "...", "reference": "...", "doc_id": "..."}
+("reference" and "doc_id" are optional)
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import csv
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from crew.rag_crew import summarize_chunks_task
+from evaluation.rouge_eval import evaluate_summary
+from reference_summaries import EVAL_QUESTIONS
+from vectorstore.bm25_store import BM25Store, BM25_DIR
+from vectorstore.retriever import retrieve_chunks
+
+FIELDS = [
+    "question", "doc_id", "retrieval_ms", "llm_ms", "total_ms", "chunks",
+    "rouge1", "rouge2", "rougeL", "summary", "reference", "error",
+]
+
+
+def load_questions(path: str = None) -> list[dict]:
+    if not path:
+        return [{"question": q, "reference": ref} for q, ref in EVAL_QUESTIONS.items()]
+
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                questions.append(json.loads(line))
+    return questions
+
+
+def answer_question(item: dict, bm25_store, summary_length: int, top_k: int) -> dict:
+    row = {
+        "question": item["question"],
+        "doc_id": item.get("doc_id"),
+        "reference": item.get("reference") or EVAL_QUESTIONS.get(item["question"]),
+        "error": "",
+    }
+    started = time.perf_counter()
+    try:
+        chunks = retrieve_chunks(
+            query=item["question"],
+            doc_id=item.get("doc_id"),
+            top_k=top_k,
+            bm25_store=bm25_store,
+        )
+        retrieved = time.perf_counter()
+        result = summarize_chunks_task({
+            "query": item["question"],
+            "retrieved_chunks": chunks,
+            "summary_length": summary_length,
+        })
+        finished = time.perf_counter()
+
+        row.update({
+            "chunks": len(chunks),
+            "summary": result["summary"],
+            "retrieval_ms": round((retrieved - started) * 1000, 1),
+            "llm_ms": round((finished - retrieved) * 1000, 1),
+            "error": result.get("error", ""),
+        })
+    except Exception as e:
+        finished = time.perf_counter()
+        row.update({"chunks": 0, "summary": "", "error": str(e)})
+
+    row["total_ms"] = round((finished - started) * 1000, 1)
+    return row
+
+
+def score_rows(rows: list[dict], workers: int):
+    """
+    ROUGE in a process pool (CPU bound: tokenising + stemming)
+    Failed questions are not scored
+    """
+    scorable = [r for r in rows if r["reference"] and r["summary"] and not r["error"]]
+    if not scorable:
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        scores = pool.map(
+            evaluate_summary,
+            [r["summary"] for r in scorable],
+            [r["reference"] for r in scorable],
+        )
+        for row, score in zip(scorable, scores):
+            row.update({k: round(v, 4) for k, v in score.items()})
+
+
+def write_results(rows: list[dict], path: str):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_summary(rows: list[dict], wall_seconds: float):
+    if not rows:
+        print("No questions to evaluate.")
+        return
+    errors = sum(1 for r in rows if r["error"])
+    print(f"Questions: {len(rows)}  errors: {errors}  wall time: {wall_seconds:.1f}s")
+
+    # Failed questions have no meaningful latency
+    latencies = sorted(r["total_ms"] for r in rows if not r["error"])
+    if not latencies:
+        print("Every question failed: no latency or ROUGE figures.")
+        return
+    p95 = latencies[min(len(latencies) - 1, int(round(0.95 * (len(latencies) - 1))))]
+    print(f"Latency ms  p50: {statistics.median(latencies):.0f}  p95: {p95:.0f}")
+    for metric in ("rouge1", "rouge2", "rougeL"):
+        values = [r[metric] for r in rows if metric in r]
+        if values:
+            print(f"{metric}: {statistics.mean(values):.4f}  (n={len(values)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch QA + ROUGE evaluation")
+    parser.add_argument("--questions", help="JSONL file (default: EVAL_QUESTIONS)")
+    parser.add_argument("--doc-id", help="restrict every question to one document")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent questions")
+    parser.add_argument("--rouge-workers", type=int, default=2)
+    parser.add_argument("--summary-length", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--out", default="evaluation_results.csv")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    if args.doc_id:
+        for item in questions:
+            item.setdefault("doc_id", args.doc_id)
+
+    bm25_store = BM25Store(path=BM25_DIR)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        rows = list(pool.map(
+            lambda item: answer_question(item, bm25_store, args.summary_length, args.top_k),
+            questions,
+        ))
+    score_rows(rows, args.rouge_workers)
+    wall = time.perf_counter() - started
+
+    write_results(rows, args.out)
+    print_summary(rows, wall)
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,615 @@
+import atexit
+import io
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+
+# 🔑 Persistent ingestion queue (SQLite, WAL) served by background worker processes
+INGEST_DB = os.getenv("INGEST_QUEUE_DB", os.path.join(".cache", "ingest.sqlite"))
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", os.path.join(".cache", "uploads"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+LEASE_SECONDS = 60       # a running job without a heartbeat for this long is taken over
+HEARTBEAT_SECONDS = 10
+RETRY_DELAY = 30.0       # seconds before a failed attempt is retried (doubled each time)
+POLL_INTERVAL = 0.5      # idle worker wait between claims
+SHUTDOWN_GRACE = 5.0     # seconds a worker gets to finish its job when the app exits
+PROGRESS_INTERVAL = 0.5  # seconds between progress writes
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """
+    The job was superseded by a newer version of its document
+    """
+
+
+class LeaseLost(Exception):
+    """
+    The job's lease could not be renewed: another worker may take it over
+    """
+
+
+class Upload(io.BytesIO):
+    """
+    A spooled upload, read like Streamlit's UploadedFile
+    """
+
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+class IngestQueue:
+    """
+    One job per document version: load → chunk → embed → upsert
+
+    - jobs survive reruns, closed tabs and restarts: the upload is spooled
+      to disk and the job row is the source of truth
+    - status: queued → running → done | failed | superseded
+      stage:  queued → load → chunk → embed → upsert → finalize → done
+      (stages overlap: chunks stream into embed + upsert batch by batch)
+    - every upserted batch is checkpointed (job_chunks); an interrupted or
+      failed job resumes after its last upserted batch
+    - workers claim jobs with a lease kept alive by a heartbeat, so the job
+      of a dead worker is picked up again (a worker that cannot renew its
+      lease stops the job first); a document is worked on by one worker at
+      a time, different documents in parallel
+    - a newer upload of the same document supersedes unfinished and
+      failed jobs; its job inherits their checkpoints (unchanged chunks
+      are not redone)
+    - a failed job keeps its upload until retry() or a newer version
+    """
+
+    def __init__(self, path: str = INGEST_DB, spool_dir: str = INGEST_SPOOL_DIR):
+        self.path = path
+        self.spool_dir = spool_dir
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30,
+                                     isolation_level=None)   # explicit transactions
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " doc_id TEXT NOT NULL,"
+            " doc_name TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " path TEXT NOT NULL,"
+            " bytes INTEGER,"
+            " status TEXT NOT NULL DEFAULT 'queued',"
+            " stage TEXT NOT NULL DEFAULT 'queued',"
+            " loaded REAL NOT NULL DEFAULT 0,"       # fraction of the file read
+            " chunked INTEGER NOT NULL DEFAULT 0,"
+            " upserted INTEGER NOT NULL DEFAULT 0,"  # checkpointed chunks
+            " indexed INTEGER, skipped INTEGER, removed INTEGER, reused INTEGER,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " cancel INTEGER NOT NULL DEFAULT 0,"
+            " worker TEXT,"
+            " heartbeat REAL,"
+            " not_before REAL NOT NULL DEFAULT 0,"
+            " synced INTEGER NOT NULL DEFAULT 0,"    # finished job applied by the app
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_doc ON jobs(doc_id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_chunks ("
+            " job_id INTEGER NOT NULL,"
+            " chunk_id TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, chunk_id))"
+        )
+
+    def _write(self, sql: str, params=()):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+                return cur.rowcount
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # ============================================================
+    # Producer side (app)
+    # ============================================================
+    def enqueue(self, doc_id: str, doc_name: str, content_hash: str, data: bytes) -> int:
+        """
+        Queues a document version; idempotent while that version is queued,
+        running, done or failed (Streamlit reruns submit the same uploads
+        again; a failed version is only requeued by retry())
+        """
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, content_hash + os.path.splitext(doc_name)[1])
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # By name: a worker may move the job to another doc_id (match_document)
+                row = self._conn.execute(
+                    "SELECT job_id FROM jobs WHERE doc_name = ? AND content_hash = ?"
+                    " AND status IN ('queued', 'running', 'done', 'failed') ORDER BY job_id DESC LIMIT 1",
+                    (doc_name, content_hash),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute("COMMIT")
+                    return row["job_id"]
+
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+
+                # Older versions still in the queue: drop them / ask their worker to stop
+                replaced = [r["path"] for r in self._conn.execute(
+                    "SELECT path FROM jobs WHERE doc_id = ? AND status IN ('queued', 'failed')",
+                    (doc_id,),
+                ).fetchall()]
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'superseded', updated_at = ?"
+                    " WHERE doc_id = ? AND status IN ('queued', 'failed')",
+                    (now, doc_id),
+                )
+                self._conn.execute(
+                    "UPDATE jobs SET cancel = 1, updated_at = ? WHERE doc_id = ? AND status = 'running'",
+                    (now, doc_id),
+                )
+                cur = self._conn.execute(
+                    "INSERT INTO jobs (doc_id, doc_name, content_hash, path, bytes, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (doc_id, doc_name, content_hash, path, len(data), now, now),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        for old_path in replaced:
+            self._remove_spool({"path": old_path})
+        return cur.lastrowid
+
+    def retry(self, job_id: int) -> bool:
+        """
+        Requeues a failed job with a fresh attempt budget; it resumes from
+        its checkpoints. False if the job is not failed.
+        """
+        return self._write(
+            "UPDATE jobs SET status = 'queued', attempts = 0, error = NULL, not_before = 0,"
+            " updated_at = ? WHERE job_id = ? AND status = 'failed'",
+            (time.time(), job_id),
+        ) > 0
+
+    def get(self, job_id: int):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def jobs(self, job_ids) -> list[dict]:
+        job_ids = list(job_ids)
+        if not job_ids:
+            return []
+        placeholders = ",".join("?" * len(job_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE job_id IN ({placeholders}) ORDER BY job_id", job_ids
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def pending(self) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY job_id"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def sync_finished(self, apply):
+        """
+        Calls apply(job) once for every done job not applied yet (e.g.
+        refreshing the app's BM25 index). Jobs are marked applied under the
+        lock, so concurrent callers never apply the same job twice, and
+        applied outside it; if apply() raises, that job and the ones after
+        it are left for the next call.
+        Returns the jobs applied.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = [dict(row) for row in self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'done' AND synced = 0 ORDER BY job_id"
+                ).fetchall()]
+                self._conn.executemany(
+                    "UPDATE jobs SET synced = 1 WHERE job_id = ?", [(row["job_id"],) for row in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        for i, row in enumerate(rows):
+            try:
+                apply(row)
+            except Exception:
+                pending = [r["job_id"] for r in rows[i:]]
+                self._write(
+                    f"UPDATE jobs SET synced = 0 WHERE job_id IN ({','.join('?' * len(pending))})",
+                    pending,
+                )
+                raise
+        return rows
+
+    # ============================================================
+    # Worker side
+    # ============================================================
+    def claim(self, worker: str):
+        """
+        Leases the oldest runnable job (queued, or running with an expired
+        lease) whose document no other worker holds; None if there is none
+        """
+        now = time.time()
+        stale = now - LEASE_SECONDS
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Cancelled jobs whose worker died: nothing left to stop
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'superseded', updated_at = ?"
+                    " WHERE status = 'running' AND cancel = 1 AND heartbeat < ?",
+                    (now, stale),
+                )
+                row = self._conn.execute(
+                    "SELECT * FROM jobs j"
+                    " WHERE ((j.status = 'queued' AND j.not_before <= ?)"
+                    "        OR (j.status = 'running' AND j.heartbeat < ?))"
+                    " AND NOT EXISTS (SELECT 1 FROM jobs o WHERE o.doc_id = j.doc_id"
+                    "   AND o.job_id != j.job_id AND o.status = 'running' AND o.heartbeat >= ?)"
+                    " ORDER BY j.job_id LIMIT 1",
+                    (now, stale, stale),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, heartbeat = ?,"
+                        " attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                        (worker, now, now, row["job_id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["job_id"]) if row is not None else None
+
+    def checkpoint_ids(self, job: dict) -> list[str]:
+        """
+        Chunk ids upserted by this job or by unfinished jobs of the same
+        document it replaced
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT c.chunk_id FROM job_chunks c JOIN jobs j ON j.job_id = c.job_id"
+                " WHERE j.doc_id = ? AND (j.job_id = ? OR j.status IN ('failed', 'superseded'))",
+                (job["doc_id"], job["job_id"]),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def add_checkpoint(self, job_id: int, chunk_ids: list[str]):
+        """
+        Records an upserted batch; raises JobCancelled once superseded
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO job_chunks (job_id, chunk_id) VALUES (?, ?)",
+                    [(job_id, chunk_id) for chunk_id in chunk_ids],
+                )
+                self._conn.execute(
+                    "UPDATE jobs SET upserted = (SELECT COUNT(*) FROM job_chunks WHERE job_id = ?),"
+                    " stage = CASE WHEN stage IN ('load', 'chunk', 'embed') THEN 'upsert' ELSE stage END,"
+                    " heartbeat = ?, updated_at = ? WHERE job_id = ?",
+                    (job_id, now, now, job_id),
+                )
+                cancel = self._conn.execute(
+                    "SELECT cancel FROM jobs WHERE job_id = ?", (job_id,)
+                ).fetchone()[0]
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if cancel:
+            raise JobCancelled(job_id)
+
+    def update(self, job_id: int, **fields):
+        """
+        Progress fields (stage, loaded, chunked); also renews the lease
+        """
+        now = time.time()
+        fields.update(heartbeat=now, updated_at=now)
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        self._write(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def finish(self, job: dict, indexed: int, skipped: int, removed: int, reused: int):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'done', stage = 'done', loaded = 1, indexed = ?,"
+                    " skipped = ?, removed = ?, reused = ?, error = NULL, updated_at = ?"
+                    " WHERE job_id = ?",
+                    (indexed, skipped, removed, reused, now, job["job_id"]),
+                )
+                # The document's manifest now covers every checkpoint
+                self._conn.execute(
+                    "DELETE FROM job_chunks WHERE job_id IN (SELECT job_id FROM jobs"
+                    " WHERE doc_id = ? AND status IN ('done', 'failed', 'superseded'))",
+                    (job["doc_id"],),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._remove_spool(job)
+
+    def fail(self, job: dict, error: str):
+        """
+        Requeues with a growing delay (resuming from the checkpoint), or
+        marks the job failed after MAX_ATTEMPTS
+        """
+        now = time.time()
+        if job["attempts"] < MAX_ATTEMPTS:
+            self._write(
+                "UPDATE jobs SET status = 'queued', error = ?, not_before = ?, updated_at = ?"
+                " WHERE job_id = ?",
+                (error, now + RETRY_DELAY * 2 ** (job["attempts"] - 1), now, job["job_id"]),
+            )
+        else:
+            # The upload is kept for retry()
+            self._write(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE job_id = ?",
+                (error, now, job["job_id"]),
+            )
+
+    def cancelled(self, job: dict):
+        self._write(
+            "UPDATE jobs SET status = 'superseded', updated_at = ? WHERE job_id = ?",
+            (time.time(), job["job_id"]),
+        )
+        self._remove_spool(job)
+
+    def _remove_spool(self, job: dict):
+        # Another job may still need the same file (same version)
+        with self._lock:
+            in_use = self._conn.execute(
+                "SELECT 1 FROM jobs WHERE path = ? AND status IN ('queued', 'running', 'failed') LIMIT 1",
+                (job["path"],),
+            ).fetchone()
+        if not in_use:
+            try:
+                os.remove(job["path"])
+            except OSError:
+                pass
+
+
+# ============================================================
+# Running jobs
+# ============================================================
+def run_job(queue: IngestQueue, job: dict, extract_workers: int = None):
+    """
+    Streams one document through index_chunk_stream, checkpointing every
+    upserted batch; the registry and manifest are written only once the
+    whole document is indexed
+
+    PDF page ranges / DOCX files are extracted by the utils.extraction
+    process pool (`extract_workers`, default EXTRACT_WORKERS; <= 1 keeps
+    extraction in-process) while earlier pages are chunked and embedded
+    """
+    from docs_loader import get_registry   # lazy: heavy imports
+    from utils.extraction import EXTRACT_WORKERS, submit_file
+    from utils.file_loader import iter_file_chunks
+    from vectorstore.indexer import index_chunk_stream, match_document
+
+    job_id = job["job_id"]
+    stop = threading.Event()
+    lease_lost = threading.Event()
+
+    def heartbeat():
+        # Keeps the lease while a batch waits on the rate limiter. A failed
+        # renewal is retried next tick; once the lease is about to expire
+        # the job is stopped, before a second worker can claim it
+        renewed = time.monotonic()
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                queue.update(job_id)
+                renewed = time.monotonic()
+            except Exception:
+                logger.exception("Ingest job %s: heartbeat failed", job_id)
+                if time.monotonic() - renewed >= LEASE_SECONDS - HEARTBEAT_SECONDS:
+                    lease_lost.set()
+                    return
+
+    def check_lease():
+        if lease_lost.is_set():
+            raise LeaseLost(job_id)
+
+    threading.Thread(target=heartbeat, daemon=True, name=f"ingest-heartbeat-{job_id}").start()
+    progress = {"stage": "load", "loaded": 0.0, "chunked": 0, "written": 0.0}
+
+    def write_progress(stage: str = None):
+        now = time.monotonic()
+        if stage is None and now - progress["written"] < PROGRESS_INTERVAL:
+            return
+        progress["written"] = now
+        if stage is not None:
+            progress["stage"] = stage
+            fields = {"stage": stage}
+        else:
+            fields = {}
+        queue.update(job_id, loaded=progress["loaded"], chunked=progress["chunked"], **fields)
+
+    def on_load(fraction):
+        progress["loaded"] = fraction
+        write_progress("chunk" if progress["stage"] == "load" else None)
+
+    def on_batch(batch):
+        # The batch goes to embedding right after this callback
+        check_lease()
+        progress["chunked"] += len(batch)
+        write_progress("embed" if progress["stage"] in ("load", "chunk") else None)
+
+    def on_upserted(chunks):
+        check_lease()
+        queue.add_checkpoint(job_id, [chunk["id"] for chunk in chunks])
+
+    def chunks():
+        yield from source
+        write_progress("finalize")
+
+    extract_workers = EXTRACT_WORKERS if extract_workers is None else extract_workers
+    extraction = None
+    try:
+        with open(job["path"], "rb") as f:
+            upload = Upload(job["doc_name"], f.read())
+        queue.update(job_id, stage="load")
+        if extract_workers > 1:
+            extraction = submit_file(upload.name, upload.getvalue(), extract_workers)
+        source = iter_file_chunks(
+            upload, on_progress=on_load,
+            blocks=extraction.blocks(on_progress=on_load) if extraction else None,
+        )
+
+        # ---- Same name as an indexed document: an edit, or a new document? ----
+        candidates = [i for i in get_registry().find_all(job["doc_name"]) if i != job["content_hash"]]
+        if candidates:
+            # Needs every chunk before anything is embedded
+            source = list(source)
+            doc_id = match_document(candidates, source, job["content_hash"])
+            if doc_id != job["doc_id"]:
+                queue.update(job_id, doc_id=doc_id)
+                job = dict(job, doc_id=doc_id)
+
+        stats = {}
+        indexed, skipped, removed = index_chunk_stream(
+            chunks(),
+            doc_id=job["doc_id"],
+            doc_name=job["doc_name"],
+            content_hash=job["content_hash"],
+            on_batch=on_batch,
+            stats=stats,
+            n_bytes=job["bytes"],
+            upserted_ids=queue.checkpoint_ids(job),
+            on_upserted=on_upserted,
+        )
+        stop.set()
+        # Chunks upserted by an earlier attempt count as indexed by this job
+        queue.finish(job, indexed + stats.get("resumed", 0), skipped, removed,
+                     stats.get("reused_vectors", 0))
+    except JobCancelled:
+        stop.set()
+        queue.cancelled(job)
+    except LeaseLost:
+        stop.set()
+        # The row is left as is: the expired lease hands the job (and its
+        # checkpoints) to the next claim
+        logger.warning("Ingest job %s: lease lost, job left to be claimed again", job_id)
+    except Exception as e:
+        stop.set()
+        queue.fail(job, f"{type(e).__name__}: {e}")
+    finally:
+        if extraction:
+            extraction.close()   # cancels pending page ranges, removes the temp file
+
+
+def run_pending(queue: IngestQueue = None, worker: str = "inline") -> int:
+    """
+    Drains the queue in the calling process (scripts, no worker processes)
+    """
+    queue = queue or IngestQueue()
+    done = 0
+    while True:
+        job = queue.claim(worker)
+        if job is None:
+            return done
+        run_job(queue, job)
+        done += 1
+
+
+def _worker_main(db_path: str, spool_dir: str, workers: int, parent_pid: int, shutdown):
+    from utils.extraction import EXTRACT_WORKERS
+    from vectorstore.embeddings import share_rate_limit
+
+    share_rate_limit(workers)
+    # The workers' extraction pools share the CPU budget too
+    extract_workers = max(1, EXTRACT_WORKERS // workers)
+    queue = IngestQueue(db_path, spool_dir)
+    worker = f"pid-{os.getpid()}"
+    # Stops when the app exits (or dies: a crash leaves the lease to expire)
+    while os.getppid() == parent_pid and not shutdown.is_set():
+        job = queue.claim(worker)
+        if job is None:
+            shutdown.wait(POLL_INTERVAL)
+            continue
+        run_job(queue, job, extract_workers)
+
+
+_workers = []
+_workers_lock = threading.Lock()
+_shutdown = None
+
+
+def _stop_workers():
+    """
+    atexit: multiprocessing joins non-daemon children at exit, so ask the
+    workers to stop first; one still busy after SHUTDOWN_GRACE is
+    terminated and its job resumes from its checkpoint on the next start
+    """
+    if _shutdown is None:
+        return
+    _shutdown.set()
+    deadline = time.monotonic() + SHUTDOWN_GRACE
+    for process in _workers:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+
+def start_workers(workers: int = INGEST_WORKERS, db_path: str = INGEST_DB,
+                  spool_dir: str = INGEST_SPOOL_DIR) -> int:
+    """
+    Starts (or restarts dead) worker processes for this app process
+    "spawn": forking the multi-threaded Streamlit server is unsafe.
+    Not daemonic, so each worker can run its own extraction pool.
+    The local vector index has a single writer, so it gets one worker.
+    """
+    global _shutdown
+    from vectorstore.vector_index import VECTOR_BACKEND
+
+    if VECTOR_BACKEND == "local":
+        workers = min(workers, 1)
+    with _workers_lock:
+        _workers[:] = [p for p in _workers if p.is_alive()]
+        ctx = multiprocessing.get_context("spawn")
+        if _shutdown is None:
+            _shutdown = ctx.Event()
+            atexit.register(_stop_workers)
+        while len(_workers) < workers:
+            process = ctx.Process(
+                target=_worker_main,
+                args=(db_path, spool_dir, workers, os.getpid(), _shutdown),
+                name=f"ingest-worker-{len(_workers)}",
+            )
+            process.start()
+            _workers.append(process)
+        return len(_workers)
@@ -1,33 +1,33 @@
-# reference_summaries.py
-
-EVAL_QUESTIONS = {
-    "What is machine learning?":
-        "Machine learning is the field of study that enables computers to learn patterns from data and make predictions or decisions without being explicitly programmed.",
-
-    "Difference between supervised and unsupervised learning":
-        "Supervised learning uses labeled data to train models for prediction, while unsupervised learning discovers patterns in unlabeled data.",
-
-    "What is linear regression?":
-        "Linear regression models the relationship between input variables and a continuous output by fitting a straight line that minimizes prediction error.",
-
-    "What is overfitting and underfitting?":
-        "Underfitting occurs when a model is too simple to capture patterns, while overfitting occurs when a model memorizes training data and fails to generalize.",
-
-    "What is the perceptron algorithm?":
-        "The perceptron is a binary classification algorithm that learns a linear decision boundary by adjusting weights based on misclassified points.",
-
-    "What is logistic regression?":
-        "Logistic regression is a classification algorithm that models probabilities using the logistic function and outputs class labels.",
-
-    "How do we evaluate classification models?":
-        "Classification models are evaluated using metrics such as accuracy, precision, recall, F1-score, and ROC curves.",
-
-    "What is Naive Bayes?":
-        "Naive Bayes is a probabilistic classifier based on Bayes’ theorem with an assumption of feature independence.",
-
-    "What are decision trees?":
-        "Decision trees split data using a sequence of questions to reach decisions, making them interpretable and versatile models.",
-
-    "What is ensemble learning?":
-        "Ensemble learning combines multiple models to improve prediction accuracy and robustness."
-}
+# reference_summaries.py
+
+EVAL_QUESTIONS = {
+    "What is machine learning?":
+        "Machine learning is the field of study that enables computers to learn patterns from data and make predictions or decisions without being explicitly programmed.",
+
+    "Difference between supervised and unsupervised learning":
+        "Supervised learning uses labeled data to train models for prediction, while unsupervised learning discovers patterns in unlabeled data.",
+
+    "What is linear regression?":
+        "Linear regression models the relationship between input variables and a continuous output by fitting a straight line that minimizes prediction error.",
+
+    "What is overfitting and underfitting?":
+        "Underfitting occurs when a model is too simple to capture patterns, while overfitting occurs when a model memorizes training data and fails to generalize.",
+
+    "What is the perceptron algorithm?":
+        "The perceptron is a binary classification algorithm that learns a linear decision boundary by adjusting weights based on misclassified points.",
+
+    "What is logistic regression?":
+        "Logistic regression is a classification algorithm that models probabilities using the logistic function and outputs class labels.",
+
+    "How do we evaluate classification models?":
+        "Classification models are evaluated using metrics such as accuracy, precision, recall, F1-score, and ROC curves.",
+
+    "What is Naive Bayes?":
+        "Naive Bayes is a probabilistic classifier based on Bayes’ theorem with an assumption of feature independence.",
+
+    "What are decision trees?":
+        "Decision trees split data using a sequence of questions to reach decisions, making them interpretable and versatile models.",
+
+    "What is ensemble learning?":
+        "Ensemble learning combines multiple models to improve prediction accuracy and robustness."
+}
@@ -0,0 +1,44 @@
+# tests/test_bm25_store.py
+"""
+On-disk BM25 index shared by several processes (one store per process)
+
+    python -m pytest -q tests
+"""
+from vectorstore.bm25_store import BM25Store
+
+
+def chunks(doc: str, words: list[str]) -> list[dict]:
+    return [{"id": f"{doc}_{i}", "text": f"{word} appears in {doc}"} for i, word in enumerate(words)]
+
+
+def ids(hits) -> set:
+    return {chunk["id"] for chunk in hits}
+
+
+def test_writers_pick_up_each_others_log_records(tmp_path):
+    first = BM25Store(path=str(tmp_path))
+    second = BM25Store(path=str(tmp_path))
+
+    first.add_chunks(chunks("a", ["apple"]), doc_id="a")
+    second.add_chunks(chunks("b", ["banana"]), doc_id="b")   # after "a" in the log
+    first.add_chunks(chunks("c", ["cherry"]), doc_id="c")    # after "b" in the log
+
+    # Neither writer skipped the other's records when it appended
+    for store in (first, second, BM25Store(path=str(tmp_path))):
+        assert ids(store.search("banana")) == {"b_0"}
+        assert ids(store.search("apple cherry")) == {"a_0", "c_0"}
+        assert store.chunks == first.chunks
+
+
+def test_edited_document_stays_searchable(tmp_path):
+    store = BM25Store(path=str(tmp_path))
+    store.add_chunks(chunks("other", ["apple"]), doc_id="other")
+
+    # Two edits: each version replaces the previous one's chunks
+    for version in ("v1", "v2", "v3"):
+        store.remove_document("doc")
+        store.add_chunks(chunks(f"doc{version}", ["zebra"]), doc_id="doc")
+
+    # Tombstoned chunks no longer count towards the term's document frequency
+    assert ids(store.search("zebra")) == {"docv3_0"}
+    assert ids(BM25Store(path=str(tmp_path)).search("zebra")) == {"docv3_0"}
@@ -0,0 +1,29 @@
+# tests/test_chunker.py
+"""
+Token-budgeted chunking with overlap (utils.chunker)
+
+    python -m pytest -q tests
+"""
+from utils.chunker import chunk_blocks
+from utils.tokens import count_tokens
+
+
+def prose(paragraphs: int, sentences: int) -> str:
+    return "\n\n".join(
+        " ".join(f"Paragraph {p} sentence {s} describes the learning method in some detail."
+                 for s in range(sentences))
+        for p in range(paragraphs)
+    )
+
+
+def test_consecutive_prose_chunks_share_text():
+    # Every paragraph alone is larger than the overlap budget
+    text = prose(paragraphs=12, sentences=10)
+    chunks = list(chunk_blocks([{"text": text}], "doc", max_tokens=256, overlap_tokens=64))
+
+    assert len(chunks) > 2
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk["text"] == text[chunk["start"]:chunk["end"]]
+        shared = text[chunk["start"]:previous["end"]]
+        assert chunk["start"] < previous["end"] and previous["text"].endswith(shared)
+        assert 0 < count_tokens(shared) <= 64
@@ -0,0 +1,85 @@
+# tests/test_indexer.py
+"""
+Each chunk is embedded exactly once per ingestion (fake inference client)
+
+    python -m pytest -q tests
+"""
+import os
+import tempfile
+
+# Stores must point at a scratch directory before the app modules are imported
+_workdir = tempfile.mkdtemp(prefix="test-indexer-")
+os.environ["EMBED_CACHE"] = "0"   # count API calls, not cache hits
+os.environ["DOC_REGISTRY_DB"] = os.path.join(_workdir, "documents.sqlite")
+os.environ["CHUNK_STORE_PATH"] = os.path.join(_workdir, "chunks.sqlite")
+os.environ["MANIFEST_DIR"] = os.path.join(_workdir, "manifests")
+
+import pytest
+
+from benchmarks.fakes import FakeChatModel, FakeIndex, FakeInference, FakePinecone, fake_vector, install_fakes
+
+
+@pytest.fixture
+def inference():
+    fake = FakeInference(latency=0.0, requests_per_sec=1_000_000)
+    install_fakes(FakePinecone(inference=fake, index=FakeIndex()), FakeChatModel(latency=0.0))
+    return fake
+
+
+def make_chunks(doc: str, n: int) -> list[dict]:
+    return [{"text": f"{doc} paragraph {i} about topic {i * 7919}"} for i in range(n)]
+
+
+def test_upsert_chunks_embeds_each_chunk_once(inference):
+    from vectorstore.indexer import upsert_chunks
+
+    chunks = make_chunks("alpha", 75)
+    indexed, skipped = upsert_chunks(chunks, doc_id="alpha", doc_name="alpha.txt")
+
+    assert (indexed, skipped) == (75, 0)
+    assert inference.embedded_texts == len(chunks)
+
+    # Re-indexing the same document embeds nothing
+    upsert_chunks(make_chunks("alpha", 75), doc_id="alpha", doc_name="alpha.txt")
+    assert inference.embedded_texts == len(chunks)
+
+
+def test_upsert_chunks_reuses_precomputed_vectors(inference):
+    from vectorstore.indexer import upsert_chunks
+
+    chunks = make_chunks("beta", 40)
+    vectors = [fake_vector(chunk["text"]) for chunk in chunks[:30]]
+    for chunk, vector in zip(chunks[:30], vectors):
+        chunk["vector"] = vector
+
+    upsert_chunks(chunks, doc_id="beta", doc_name="beta.txt")
+
+    # Only the 10 chunks without a vector reach the embedding API
+    assert inference.embedded_texts == 10
+
+
+def test_index_chunk_stream_embeds_each_chunk_once(inference):
+    from vectorstore.indexer import index_chunk_stream
+
+    chunks = make_chunks("gamma", 150)
+    index_chunk_stream(iter(chunks), doc_id="gamma", doc_name="gamma.txt", content_hash="v1")
+    assert inference.embedded_texts == len(chunks)
+
+    # New version with one changed chunk: only that chunk is embedded
+    edited = make_chunks("gamma", 150)
+    edited[10]["text"] = "gamma paragraph 10 rewritten"
+    index_chunk_stream(iter(edited), doc_id="gamma", doc_name="gamma.txt", content_hash="v2")
+    assert inference.embedded_texts == len(chunks) + 1
+
+
+def test_upsert_chunks_uses_stream_ids_and_keeps_caller_chunks(inference):
+    from vectorstore.indexer import chunk_id, upsert_chunks
+    from vectorstore.manifest import load_manifest
+
+    chunks = make_chunks("delta", 20)
+    chunks[0]["vector"] = fake_vector(chunks[0]["text"])
+    originals = [dict(chunk) for chunk in chunks]
+    upsert_chunks(chunks, doc_id="delta", doc_name="delta.txt")
+
+    assert chunks == originals
+    assert load_manifest("delta")["chunks"] == [chunk_id("delta", c["text"]) for c in chunks]
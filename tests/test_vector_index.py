@@ -0,0 +1,35 @@
+# tests/test_vector_index.py
+"""
+On-disk local vector index shared by several processes (one index per process)
+
+    python -m pytest -q tests
+"""
+import numpy as np
+
+import vectorstore.vector_index as vector_index
+from vectorstore.vector_index import LocalVectorIndex
+
+
+def vectors(doc: str, n: int, dim: int = 8) -> list[dict]:
+    rng = np.random.default_rng(len(doc) * 1000 + n)
+    return [
+        {"id": f"{doc}_{i}", "values": rng.normal(size=dim).tolist(), "metadata": {"doc_id": doc}}
+        for i in range(n)
+    ]
+
+
+def test_writers_pick_up_each_others_log_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, "COMPACT_MIN_VECTORS", 4)
+    first = LocalVectorIndex(path=str(tmp_path))
+    second = LocalVectorIndex(path=str(tmp_path))
+
+    first.upsert(vectors("a", 3))
+    second.upsert(vectors("bb", 3))      # after "a" in the log
+    first.delete(ids=["bb_0"])
+    second.upsert(vectors("ccc", 3))     # compacts: the next writer starts a new log
+    first.upsert(vectors("dddd", 3))
+
+    written = {f"{doc}_{i}" for doc in ("a", "bb", "ccc", "dddd") for i in range(3)}
+    for index in (first, second, LocalVectorIndex(path=str(tmp_path))):
+        index.refresh()
+        assert set(index.fetch(ids=sorted(written)).vectors) == written - {"bb_0"}
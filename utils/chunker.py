@@ -0,0 +1,190 @@
+# utils/chunker.py
+import os
+import re
+
+from utils.tokens import count_tokens
+
+# 🔑 Chunk budget in embedding tokens (was 400 words ≈ 520 tokens)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+EMBED_MAX_TOKENS = 2048   # llama-text-embed-v2 input limit
+
+# Blocks without an explicit "start" follow the previous one after this
+BLOCK_SEPARATOR = "\n"
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t\r\f\v]*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+_WHITESPACE = re.compile(r"\s+")
+
+def _trimmed(text: str, start: int, end: int):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        yield start, end
+
+
+def _spans(text: str, separator, start: int = 0, end: int = None):
+    """
+    (start, end) offsets of the non-blank pieces of text[start:end]
+    between `separator` matches
+    """
+    end = len(text) if end is None else end
+    pos = start
+    for match in separator.finditer(text, start, end):
+        yield from _trimmed(text, pos, match.start())
+        pos = match.end()
+    yield from _trimmed(text, pos, end)
+
+
+def _units(text: str, max_tokens: int):
+    """
+    Smallest pieces a chunk is built from, as (start, end, tokens):
+    paragraphs, split into sentences and then word windows only when a
+    piece alone exceeds `max_tokens`
+    """
+    for start, end in _spans(text, _PARAGRAPH_BREAK):
+        tokens = count_tokens(text[start:end])
+        if tokens <= max_tokens:
+            yield start, end, tokens
+            continue
+        for s_start, s_end in _spans(text, _SENTENCE_BREAK, start, end):
+            tokens = count_tokens(text[s_start:s_end])
+            if tokens <= max_tokens:
+                yield s_start, s_end, tokens
+            else:
+                yield from _word_windows(text, s_start, s_end, max_tokens)
+
+
+def _word_windows(text: str, start: int, end: int, max_tokens: int):
+    window_start = window_end = None
+    tokens = 0
+    for w_start, w_end in _spans(text, _WHITESPACE, start, end):
+        word_tokens = count_tokens(text[w_start:w_end])
+        if window_start is not None and tokens + word_tokens > max_tokens:
+            yield window_start, window_end, tokens
+            window_start, tokens = None, 0
+        if window_start is None:
+            window_start = w_start
+        window_end = w_end
+        tokens += word_tokens
+    if window_start is not None:
+        yield window_start, window_end, tokens
+
+
+def _overlap_tail(units: list, overlap_tokens: int, text: str = "", base: int = 0) -> list:
+    """
+    Trailing whole units within `overlap_tokens`; when the last unit alone
+    is larger (e.g. a long paragraph), its trailing sentences, else its
+    trailing words, within the same budget. `text` holds the document
+    from offset `base` on.
+    """
+    tail, tokens = [], 0
+    for unit in reversed(units):
+        if tokens + unit[2] > overlap_tokens:
+            break
+        tail.insert(0, unit)
+        tokens += unit[2]
+    if tail or not units or overlap_tokens <= 0 or not text:
+        return tail
+
+    start, end = units[-1][0] - base, units[-1][1] - base
+    for separator in (_SENTENCE_BREAK, _WHITESPACE):
+        for p_start, p_end in reversed(list(_spans(text, separator, start, end))):
+            p_tokens = count_tokens(text[p_start:p_end])
+            if tokens + p_tokens > overlap_tokens:
+                break
+            tail.insert(0, (base + p_start, base + p_end, p_tokens))
+            tokens += p_tokens
+        if tail:
+            break
+    return tail
+
+
+def chunk_blocks(blocks, name: str, max_tokens: int = CHUNK_MAX_TOKENS,
+                 overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+    """
+    Packs a stream of text blocks into token-budgeted chunks
+
+    Blocks are dicts: {"text", "start"?, "page"?, "heading"?}. "start" is
+    the block's char offset in the document; when missing, the block
+    follows the previous one after BLOCK_SEPARATOR. Chunks are
+    {"id", "text", "start", "end", "page"} where text == document[start:end]
+    and page is the page holding `start` (None for unpaged formats).
+
+    - whole paragraphs / sentences are packed up to `max_tokens`
+    - a heading always starts a new chunk
+    - consecutive chunks share up to `overlap_tokens` of whole units, or of
+      the last unit's trailing sentences / words when it alone is larger
+      (no overlap across a heading)
+    Only the text from the current chunk's start on is kept in memory.
+    """
+    max_tokens = min(max_tokens, EMBED_MAX_TOKENS)
+    buffer, base = "", 0       # document text from offset `base` on
+    pages = []                 # (start, page) of buffered blocks
+    current, tokens = [], 0    # units of the chunk being built
+    fresh = body = False       # current has unemitted units / non-heading units
+    cursor = None
+    chunk_num = 1
+
+    def page_at(offset):
+        page = None
+        for block_start, block_page in pages:
+            if block_start > offset:
+                break
+            page = block_page
+        return page
+
+    def make_chunk():
+        start, end = current[0][0], current[-1][1]
+        return {
+            "id": f"{name}_chunk_{chunk_num}",
+            "text": buffer[start - base:end - base],
+            "start": start,
+            "end": end,
+            "page": page_at(start),
+        }
+
+    for block in blocks:
+        text = block["text"]
+        start = block.get("start")
+        if start is None:
+            start = 0 if cursor is None else cursor + len(BLOCK_SEPARATOR)
+        cursor = start + len(text)
+
+        if buffer:
+            buffer += "\n" * (start - base - len(buffer))   # separator / blank lines
+        else:
+            base = start
+        buffer += text
+        pages.append((start, block.get("page")))
+        heading = bool(block.get("heading"))
+
+        for u_start, u_end, u_tokens in _units(text, max_tokens):
+            unit = (start + u_start, start + u_end, u_tokens)
+
+            if fresh and ((heading and body) or tokens + u_tokens > max_tokens):
+                yield make_chunk()
+                chunk_num += 1
+                current = [] if heading else _overlap_tail(current, overlap_tokens, buffer, base)
+                tokens = sum(u[2] for u in current)
+                fresh = body = False
+
+                # ---- Drop text no longer needed ----
+                keep = current[0][0] if current else unit[0]
+                buffer = buffer[keep - base:]
+                base = keep
+                while len(pages) > 1 and pages[1][0] <= keep:
+                    pages.pop(0)
+
+            while current and tokens + u_tokens > max_tokens:
+                tokens -= current.pop(0)[2]
+            current.append(unit)
+            tokens += u_tokens
+            fresh = True
+            body = body or not heading
+            heading = False   # the heading block's first unit starts the section
+
+    if fresh:
+        yield make_chunk()
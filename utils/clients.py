@@ -0,0 +1,82 @@
+# utils/clients.py
+import os
+import threading
+
+# 🔑 One lazily built client per service, shared by every module and session
+POOL_THREADS = int(os.getenv("PINECONE_POOL_THREADS", "8"))
+LLM_MODEL = "gpt-4.1-mini"
+
+_lock = threading.RLock()
+_instances = {}
+
+
+def _default_pinecone():
+    from pinecone import Pinecone  # lazy: keeps import time near zero
+
+    api_key = os.getenv("PINECONE_API_KEY")
+    if not api_key:
+        raise ValueError("PINECONE_API_KEY not set")
+    return Pinecone(api_key=api_key, pool_threads=POOL_THREADS)
+
+
+def _default_index():
+    # VECTOR_BACKEND: Pinecone index or the in-process one (vectorstore.vector_index)
+    from vectorstore.vector_index import build_index
+
+    return build_index()
+
+
+def _default_llm():
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=LLM_MODEL,
+        temperature=0.0  # 🔒 reduce hallucination
+    )
+
+
+_factories = {
+    "pinecone": _default_pinecone,
+    "index": _default_index,
+    "llm": _default_llm,
+}
+
+# Clients built from another one; rebuilt when it is overridden
+_DEPENDENTS = {"pinecone": ["index"]}
+
+
+def get_client(name: str):
+    client = _instances.get(name)
+    if client is None:
+        with _lock:
+            client = _instances.get(name)
+            if client is None:
+                client = _instances[name] = _factories[name]()
+    return client
+
+
+def get_pinecone():
+    return get_client("pinecone")
+
+
+def get_index():
+    return get_client("index")
+
+
+def get_llm():
+    return get_client("llm")
+
+
+def set_factory(name: str, factory):
+    """
+    Overrides how a client is built (tests, benchmarks, other backends)
+    """
+    with _lock:
+        _factories[name] = factory
+        for key in [name] + _DEPENDENTS.get(name, []):
+            _instances.pop(key, None)
+
+
+def reset():
+    with _lock:
+        _instances.clear()
@@ -0,0 +1,128 @@
+# utils/extraction.py
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# 🔑 CPU-bound text extraction (pypdf / python-docx) in worker processes
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PAGES_PER_TASK = int(os.getenv("EXTRACT_PAGES_PER_TASK", "20"))
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def get_executor(workers: int = EXTRACT_WORKERS):
+    """
+    Process pool shared by every session, created on first use
+    "spawn": forking the multi-threaded Streamlit server is unsafe
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _executor_workers = workers
+        return _executor
+
+
+# ---------------- Block extraction (in-process or in the pool) ----------------
+def pdf_blocks(pdf, start: int, end: int) -> list[dict]:
+    return [
+        {"text": pdf.pages[i].extract_text() or "", "page": i + 1}
+        for i in range(start, end)
+    ]
+
+
+def docx_blocks(source) -> list[dict]:
+    """
+    Non-empty paragraphs; "Heading *" / "Title" styles are flagged so the
+    chunker starts a new chunk there
+    """
+    from docx import Document
+    blocks = []
+    for para in Document(source).paragraphs:
+        if para.text.strip():
+            style = para.style.name if para.style is not None else ""
+            blocks.append({
+                "text": para.text,
+                "heading": style.startswith("Heading") or style == "Title",
+            })
+    return blocks
+
+
+def extract_pdf_pages(path: str, start: int, end: int) -> list[dict]:
+    from pypdf import PdfReader
+    return pdf_blocks(PdfReader(path), start, end)
+
+
+def extract_docx_paragraphs(path: str) -> list[dict]:
+    return docx_blocks(path)
+
+
+class ExtractionJob:
+    """
+    One file being extracted in the pool, split into ordered tasks
+    blocks() yields page / paragraph blocks in document order as tasks finish
+    """
+
+    def __init__(self, futures, path: str):
+        self.futures = futures
+        self.path = path
+
+    def blocks(self, on_progress=None):
+        try:
+            for i, future in enumerate(self.futures):
+                for block in future.result():
+                    if block["text"]:
+                        yield block
+                if on_progress:
+                    on_progress((i + 1) / len(self.futures))
+        finally:
+            self.close()
+
+    def close(self):
+        for future in self.futures:
+            future.cancel()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+def _spool(data: bytes, suffix: str) -> str:
+    # Workers read a temp file instead of receiving the bytes per task
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="extract-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+def submit_file(name: str, data: bytes, workers: int = EXTRACT_WORKERS,
+                pages_per_task: int = PAGES_PER_TASK):
+    """
+    Starts extracting a PDF (split into page ranges) or DOCX file
+    Returns an ExtractionJob, or None for types extracted in-process
+    """
+    if name.endswith(".pdf"):
+        from pypdf import PdfReader
+        path = _spool(data, ".pdf")
+        n_pages = len(PdfReader(path).pages)
+        pool = get_executor(workers)
+        futures = [
+            pool.submit(extract_pdf_pages, path, start, min(start + pages_per_task, n_pages))
+            for start in range(0, n_pages, pages_per_task)
+        ]
+        return ExtractionJob(futures, path)
+    if name.endswith(".docx"):
+        path = _spool(data, ".docx")
+        return ExtractionJob([get_executor(workers).submit(extract_docx_paragraphs, path)], path)
+    return None
+
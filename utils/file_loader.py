@@ -1,43 +1,102 @@
-from pypdf import PdfReader
-from io import BytesIO
-import streamlit as st
-import pandas as pd
-
-def load_file(uploaded_file, chunk_size=300, overlap=50):
-    text = ""
-
-    if uploaded_file.name.endswith(".pdf"):
-        pdf = PdfReader(BytesIO(uploaded_file.read()))
-        pages_text = [page.extract_text() for page in pdf.pages]
-        text = "\n".join([p for p in pages_text if p])
-    elif uploaded_file.name.endswith(".txt"):
-        text = uploaded_file.read().decode("utf-8")
-    elif uploaded_file.name.endswith(".csv"):
-        df = pd.read_csv(uploaded_file)
-        rows = df.astype(str).apply(lambda row: " | ".join(row), axis=1).tolist()
-        text = "\n".join(rows)
-    elif uploaded_file.name.endswith(".docx"):
-        from docx import Document
-        doc = Document(uploaded_file)
-        text = "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
-    else:
-        st.warning(f"Unsupported file type: {uploaded_file.name}")
-        return []
-
-    words = text.split()
-    chunks = []
-    progress_bar = st.progress(0)
-    total_chunks = max(1, len(words) // chunk_size + (1 if len(words) % chunk_size else 0))
-
-    start, chunk_num = 0, 1
-    while start < len(words):
-        end = start + chunk_size
-        chunk_text = " ".join(words[start:end])
-        chunks.append({"id": f"{uploaded_file.name}_chunk_{chunk_num}", "text": chunk_text})
-        start += chunk_size - overlap
-        chunk_num += 1
-        progress_bar.progress(min(chunk_num / total_chunks, 1.0))
-
-    progress_bar.empty()
-    return chunks
-
+from pypdf import PdfReader
+from io import BytesIO
+import time
+import streamlit as st
+import pandas as pd
+
+from utils.chunker import chunk_blocks, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from utils.extraction import pdf_blocks, docx_blocks
+
+CSV_ROWS_PER_BLOCK = 1000
+TXT_MAX_BLOCK_CHARS = 100_000
+PROGRESS_INTERVAL = 0.25   # seconds between progress bar redraws
+
+
+def iter_text_blocks(uploaded_file, on_progress=None):
+    """
+    Yields the document one page / paragraph / CSV row block at a time,
+    as chunker blocks ({"text", "start"?, "page"?, "heading"?}), so
+    chunking can start before extraction finishes
+    on_progress(fraction) is called as the file is read
+    """
+    name = uploaded_file.name
+
+    if name.endswith(".pdf"):
+        pdf = PdfReader(BytesIO(uploaded_file.read()))
+        total = max(1, len(pdf.pages))
+        for i in range(len(pdf.pages)):
+            block = pdf_blocks(pdf, i, i + 1)[0]
+            if block["text"]:
+                yield block
+            if on_progress:
+                on_progress((i + 1) / total)
+    elif name.endswith(".txt"):
+        # Paragraphs (runs of non-blank lines) at their char offset in the file
+        size = getattr(uploaded_file, "size", None) or len(uploaded_file.getvalue())
+        lines, para_start, para_chars, offset = [], 0, 0, 0
+        for raw in uploaded_file:   # "\n" never occurs inside a UTF-8 sequence
+            line = raw.decode("utf-8")
+            if line.strip():
+                if not lines:
+                    para_start, para_chars = offset, 0
+                lines.append(line)
+                para_chars += len(line)
+            if lines and (not line.strip() or para_chars > TXT_MAX_BLOCK_CHARS):
+                yield {"text": "".join(lines), "start": para_start}
+                lines = []
+            offset += len(line)
+            if on_progress:
+                on_progress(uploaded_file.tell() / size)
+        if lines:
+            yield {"text": "".join(lines), "start": para_start}
+    elif name.endswith(".csv"):
+        for df in pd.read_csv(uploaded_file, chunksize=CSV_ROWS_PER_BLOCK):
+            rows = df.astype(str).apply(lambda row: " | ".join(row), axis=1).tolist()
+            yield {"text": "\n".join(rows)}
+    elif name.endswith(".docx"):
+        blocks = docx_blocks(uploaded_file)
+        for i, block in enumerate(blocks):
+            yield block
+            if on_progress:
+                on_progress((i + 1) / len(blocks))
+    else:
+        st.warning(f"Unsupported file type: {name}")
+
+
+def iter_file_chunks(uploaded_file, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS,
+                     on_progress=None, blocks=None):
+    """
+    Yields token-budgeted chunks (utils.chunker.chunk_blocks) while the
+    file is being read, each with its (start, end, page) in the document.
+    `blocks` replaces in-process reading with already extracted blocks
+    (e.g. utils.extraction.ExtractionJob.blocks()).
+    """
+    if blocks is None:
+        blocks = iter_text_blocks(uploaded_file, on_progress)
+    yield from chunk_blocks(blocks, uploaded_file.name, max_tokens, overlap_tokens)
+
+
+def progress_reporter(progress_bar, interval: float = PROGRESS_INTERVAL):
+    """
+    on_progress callback that redraws at most every `interval` seconds
+    (each redraw is a websocket message), and always at 100%
+    """
+    last = {"percent": -1, "time": 0.0}
+
+    def report(fraction):
+        percent = min(int(fraction * 100), 100)
+        now = time.monotonic()
+        if percent != last["percent"] and (percent == 100 or now - last["time"] >= interval):
+            last.update(percent=percent, time=now)
+            progress_bar.progress(percent / 100)
+
+    return report
+
+
+def load_file(uploaded_file, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    progress_bar = st.progress(0)
+    chunks = list(iter_file_chunks(
+        uploaded_file, max_tokens, overlap_tokens, on_progress=progress_reporter(progress_bar)
+    ))
+    progress_bar.empty()
+    return chunks
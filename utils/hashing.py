@@ -1,7 +1,13 @@
-import hashlib
-
-def content_hash(file_bytes: bytes) -> str:
-    """
-    Stable document ID based on actual file content
-    """
-    return hashlib.sha256(file_bytes).hexdigest()
+import hashlib
+
+def content_hash(file_bytes: bytes) -> str:
+    """
+    Stable document ID based on actual file content
+    """
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def chunk_hash(text: str) -> str:
+    """
+    Chunk identity: whitespace-insensitive hash of the chunk text
+    """
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
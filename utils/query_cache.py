@@ -0,0 +1,140 @@
+# utils/query_cache.py
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# 🔑 Answer cache for Search & Summarize
+CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+SEMANTIC_THRESHOLD = float(os.getenv("QUERY_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_query(query: str) -> str:
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip(" ?!.")
+
+
+class QueryCache:
+    """
+    Two-level answer cache
+
+    1. Exact: normalized (query, doc_id, summary_length)
+    2. Semantic: same doc_id and summary_length, query embedding within
+       `threshold` cosine similarity of a cached one
+
+    Entries expire after `ttl` seconds and are evicted LRU beyond
+    `max_entries`. Indexing a document invalidates every entry scoped to
+    that document and every "All Documents" entry.
+    """
+
+    def __init__(self, embed_fn=None, max_entries: int = CACHE_MAX_ENTRIES,
+                 ttl: float = CACHE_TTL_SECONDS, threshold: float = SEMANTIC_THRESHOLD):
+        self.embed_fn = embed_fn
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = {"exact": 0, "semantic": 0}
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, query: str, doc_id, summary_length):
+        return (normalize_query(query), doc_id, summary_length)
+
+    def _embed(self, query: str):
+        if self.embed_fn is None:
+            return None
+        try:
+            # Raw query, as embedded by the retriever: one embedding-cache entry
+            vector = np.asarray(self.embed_fn(query), dtype=np.float32)
+        except Exception:
+            return None   # semantic level is best effort
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return now - entry["created"] > self.ttl
+
+    def get(self, query: str, doc_id=None, summary_length=None):
+        """
+        Returns (result, "exact" | "semantic") or None
+        """
+        key = self._key(query, doc_id, summary_length)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._expired(entry, now):
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits["exact"] += 1
+                    return entry["result"], "exact"
+
+            scoped = [
+                (k, e) for k, e in self._entries.items()
+                if k[1] == doc_id and k[2] == summary_length
+                and e["embedding"] is not None and not self._expired(e, now)
+            ]
+
+        if scoped:
+            vector = self._embed(query)
+            if vector is not None:
+                matrix = np.stack([e["embedding"] for _, e in scoped])
+                sims = matrix @ vector
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    best_key, best_entry = scoped[best]
+                    with self._lock:
+                        if best_key in self._entries:
+                            self._entries.move_to_end(best_key)
+                        self.hits["semantic"] += 1
+                    return best_entry["result"], "semantic"
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, query: str, doc_id, summary_length, result):
+        key = self._key(query, doc_id, summary_length)
+        entry = {"result": result, "created": time.time(), "embedding": self._embed(query)}
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, doc_id=None):
+        """
+        Drops entries a newly indexed document could change
+        (doc_id=None clears everything)
+        """
+        with self._lock:
+            if doc_id is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[1] is None or k[1] == doc_id]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": dict(self.hits), "misses": self.misses}
+
+
+def _embed_query(query: str):
+    from vectorstore.embeddings import embed_texts  # lazy: avoid import cycle
+    return embed_texts([query], input_type="query")[0]
+
+
+# Process-wide: shared by every Streamlit session
+query_cache = QueryCache(embed_fn=_embed_query)
+
+
+def invalidate_documents(doc_id=None):
+    query_cache.invalidate(doc_id)
@@ -0,0 +1,35 @@
+# utils/tokens.py
+import threading
+
+# 🔑 One lazy tiktoken loader for chunking, rate limiting and context packing
+EMBED_ENCODING = "cl100k_base"
+
+_encodings = {}   # encoding name / model -> tiktoken encoding, or False
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(name: str = EMBED_ENCODING, model: str = None):
+    """
+    tiktoken encoding for `model` (else `name`), or False if tiktoken is
+    unavailable (callers fall back to ≈4 chars/token)
+    """
+    key = model or name
+    with _encodings_lock:
+        if key not in _encodings:
+            try:
+                import tiktoken
+                try:
+                    encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(name)
+                except KeyError:
+                    encoding = tiktoken.get_encoding(name)
+            except Exception:
+                encoding = False
+            _encodings[key] = encoding
+        return _encodings[key]
+
+
+def count_tokens(text: str, name: str = EMBED_ENCODING, model: str = None) -> int:
+    encoding = get_encoding(name, model)
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
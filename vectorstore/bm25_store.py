@@ -1,34 +1,458 @@
-from rank_bm25 import BM25Okapi
-import re
-
-class BM25Store:
-    def __init__(self):
-        self.corpus = []
-        self.chunks = []
-        self.bm25 = None
-
-    def _tokenize(self, text: str):
-        return re.findall(r"\w+", text.lower())
-
-    def add_chunks(self, chunks):
-        for chunk in chunks:
-            tokens = self._tokenize(chunk["text"])
-            self.corpus.append(tokens)
-            self.chunks.append(chunk)
-
-        self.bm25 = BM25Okapi(self.corpus)
-
-    def search(self, query: str, top_k: int = 5):
-        if not self.bm25:
-            return []
-
-        query_tokens = self._tokenize(query)
-        scores = self.bm25.get_scores(query_tokens)
-
-        ranked = sorted(
-            zip(scores, self.chunks),
-            key=lambda x: x[0],
-            reverse=True
-        )
-
-        return [chunk for score, chunk in ranked[:top_k] if score > 0]
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+
+from vectorstore.log_file import append_records, log_lock
+
+# 🔑 Shared on-disk index (survives restarts, reused by every session)
+BM25_DIR = os.getenv("BM25_INDEX_DIR", os.path.join(".cache", "bm25"))
+
+K1 = 1.5
+B = 0.75
+COMPACT_RATIO = 0.25   # rewrite the segment once the delta reaches 25% of it
+COMPACT_MIN_DOCS = 1000
+
+CHUNK_LOG = "chunks.jsonl"
+SEGMENT_META = "segment.json"
+
+
+class BM25Store:
+    """
+    Incremental inverted-index BM25
+
+    On disk:
+    - chunks.jsonl    append-only log of every chunk (id, text, doc_id)
+    - segment.json    vocabulary + number of chunks covered by the segment
+    - seg_<gen>_*.npy postings (offsets / chunk indices / term freqs) and
+                      chunk lengths, loaded with mmap
+
+    Chunks added after the last segment write live in an in-memory delta
+    and are replayed from the log tail on load. Adding chunks only touches
+    their own terms; the segment is rewritten once the delta grows past
+    COMPACT_RATIO of it.
+
+    Each chunk remembers its doc_id. A document's chunks are added
+    together, so they occupy a few contiguous index ranges; because
+    postings are sorted by chunk index, a doc-scoped search binary-searches
+    into those ranges and never reads other documents' postings.
+
+    remove_document() tombstones a document's chunks (logged, replayed on
+    load): they are filtered out of results at once and their postings
+    are dropped at the next segment write; until then they are counted
+    per term and left out of document frequencies. Re-adding the document
+    appends its new chunks.
+
+    Writers in several processes take a lock on the directory and replay
+    the log tail before appending, so chunk indices follow log order in
+    every process; readers pick up new chunks via refresh().
+
+    IDF uses the non-negative form log(1 + (N - df + 0.5) / (df + 0.5)),
+    so scores stay stable while the corpus grows.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.chunks = []
+        self._doc_len = array("I")
+        self._alive = array("B")   # 0 = removed
+        self._removed = 0
+        self._dead_df = Counter()   # term -> postings of removed chunks not yet compacted
+        self._total_len = 0
+        self._doc_ranges = {}   # doc_id -> [[start, end), ...] chunk index ranges
+
+        # ---- Base segment (mmap, read-only) ----
+        self._gen = 0
+        self._seg_n = 0
+        self._seg_terms = {}
+        self._seg_offsets = None
+        self._seg_docs = None
+        self._seg_tfs = None
+
+        # ---- Delta (in memory) ----
+        self._delta = {}   # term -> (array chunk indices, array term freqs)
+
+        self._log_offset = 0
+        self._lock = threading.RLock()
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    def _tokenize(self, text: str):
+        return re.findall(r"\w+", text.lower())
+
+    # ============================================================
+    # Indexing
+    # ============================================================
+    def add_chunks(self, chunks, doc_id: str = None):
+        records = [
+            {"id": chunk["id"], "text": chunk["text"], "doc_id": chunk.get("doc_id", doc_id)}
+            for chunk in chunks
+        ]
+        if not records:
+            return
+
+        with self._writing():
+            for record in records:
+                self._index_record(record)
+            if self.path:
+                self._append_log(records)
+        if self.path and self._should_compact():
+            self.save()
+
+    def remove_document(self, doc_id: str) -> int:
+        """
+        Removes every chunk of a document; returns how many were removed
+        """
+        with self._writing():
+            removed = self._remove(doc_id)
+            if self.path and removed:
+                self._append_log([{"op": "remove", "doc_id": doc_id}])
+            return removed
+
+    def document_ids(self, doc_id: str) -> set:
+        """
+        Ids of a document's chunks currently in the index
+        """
+        self.refresh()
+        with self._lock:
+            return {
+                self.chunks[idx]["id"]
+                for lo, hi in self._doc_ranges.get(doc_id, [])
+                for idx in range(lo, hi)
+            }
+
+    def _remove(self, doc_id: str) -> int:
+        removed = 0
+        for lo, hi in self._doc_ranges.pop(doc_id, []):
+            for idx in range(lo, hi):
+                if self._alive[idx]:
+                    if self._doc_len[idx]:
+                        # Still in the postings (a segment write drops them)
+                        self._dead_df.update(set(self._tokenize(self.chunks[idx]["text"])))
+                    self._alive[idx] = 0
+                    self._total_len -= self._doc_len[idx]
+                    self._doc_len[idx] = 0
+                    self.chunks[idx] = None
+                    removed += 1
+        self._removed += removed
+        return removed
+
+    def _index_record(self, record: dict):
+        idx = len(self.chunks)
+        tokens = self._tokenize(record["text"])
+
+        for term, tf in Counter(tokens).items():
+            postings = self._delta.get(term)
+            if postings is None:
+                postings = self._delta[term] = (array("I"), array("I"))
+            postings[0].append(idx)
+            postings[1].append(tf)
+
+        self._append_chunk(record, len(tokens))
+
+    def _append_chunk(self, record: dict, length: int = None):
+        idx = len(self.chunks)
+        self.chunks.append(record)
+        self._alive.append(1)
+        if length is not None:
+            self._doc_len.append(length)
+            self._total_len += length
+
+        doc_id = record.get("doc_id")
+        if doc_id is not None:
+            ranges = self._doc_ranges.setdefault(doc_id, [])
+            if ranges and ranges[-1][1] == idx:
+                ranges[-1][1] = idx + 1
+            else:
+                ranges.append([idx, idx + 1])
+
+    @contextmanager
+    def _writing(self):
+        """
+        Holds the store for a write: chunks other processes appended are
+        indexed first, so ours get the same indices as in the log
+        """
+        with self._lock:
+            if not self.path:
+                yield
+                return
+            with log_lock(self.path):
+                self._read_log(from_offset=self._log_offset)
+                yield
+
+    def _append_log(self, records: list[dict]):
+        # Only under _writing(): the offset then skips nobody else's records
+        self._log_offset = append_records(os.path.join(self.path, CHUNK_LOG), records)
+
+    def _should_compact(self) -> bool:
+        delta_docs = len(self.chunks) - self._seg_n
+        return delta_docs >= max(COMPACT_MIN_DOCS, COMPACT_RATIO * self._seg_n)
+
+    # ============================================================
+    # Search
+    # ============================================================
+    def _df(self, term: str) -> int:
+        df = 0
+        row = self._seg_terms.get(term)
+        if row is not None:
+            df += int(self._seg_offsets[row + 1] - self._seg_offsets[row])
+        delta = self._delta.get(term)
+        if delta is not None:
+            df += len(delta[0])
+        return df - self._dead_df.get(term, 0)
+
+    def _postings(self, term: str, ranges=None):
+        """
+        (chunk indices, term freqs) for a term: segment slice + delta
+        Restricted to the given chunk index ranges when provided
+        """
+        parts = []
+
+        row = self._seg_terms.get(term)
+        if row is not None:
+            start, end = self._seg_offsets[row], self._seg_offsets[row + 1]
+            parts.extend(self._restrict(self._seg_docs[start:end], self._seg_tfs[start:end], ranges))
+
+        delta = self._delta.get(term)
+        if delta is not None:
+            docs = np.frombuffer(delta[0], dtype=np.uint32)
+            tfs = np.frombuffer(delta[1], dtype=np.uint32)
+            # copy so the delta arrays stay appendable
+            parts.extend((d.copy(), t.copy()) for d, t in self._restrict(docs, tfs, ranges))
+            del docs, tfs
+
+        parts = [p for p in parts if len(p[0])]
+
+        if not parts:
+            return np.zeros(0, np.uint32), np.zeros(0, np.uint32)
+        if len(parts) == 1:
+            return parts[0]
+        return (
+            np.concatenate([p[0] for p in parts]),
+            np.concatenate([p[1].astype(np.uint32) for p in parts]),
+        )
+
+    @staticmethod
+    def _restrict(docs, tfs, ranges):
+        if ranges is None:
+            return [(docs, tfs)]
+        parts = []
+        for lo, hi in ranges:
+            a = np.searchsorted(docs, lo, side="left")
+            b = np.searchsorted(docs, hi, side="left")
+            if b > a:
+                parts.append((docs[a:b], tfs[a:b]))
+        return parts
+
+    def search(self, query: str, top_k: int = 5, doc_id: str = None, return_scores: bool = False):
+        """
+        Top-k chunks for a query, optionally limited to one document
+        With return_scores=True, returns (chunk, score) pairs
+
+        Only chunks in the postings of the query terms are scored
+        (vectorized with NumPy); the top-k is picked with argpartition
+        instead of sorting every candidate.
+        """
+        self.refresh()
+
+        with self._lock:
+            ranges = None
+            if doc_id is not None:
+                ranges = self._doc_ranges.get(doc_id)
+                if not ranges:
+                    return []
+
+            scored = self._score(self._tokenize(query), ranges)
+            if scored is None:
+                return []
+
+            docs, scores = scored
+            if self._removed:
+                alive = np.frombuffer(self._alive, dtype=np.uint8)
+                keep = alive[docs] > 0
+                del alive
+                docs, scores = docs[keep], scores[keep]
+            if len(docs) > top_k:
+                keep = np.argpartition(-scores, top_k - 1)[:top_k]
+                docs, scores = docs[keep], scores[keep]
+
+            order = np.argsort(-scores, kind="stable")
+            hits = [(self.chunks[int(docs[i])], float(scores[i])) for i in order if scores[i] > 0]
+            if return_scores:
+                return hits
+            return [chunk for chunk, score in hits]
+
+    def _score(self, tokens: list[str], ranges=None):
+        """
+        Returns (candidate chunk indices, BM25 scores) or None
+        """
+        n = len(self.chunks) - self._removed
+        if n <= 0 or not tokens:
+            return None
+
+        avgdl = self._total_len / n
+        doc_len = np.frombuffer(self._doc_len, dtype=np.uint32)
+        try:
+            doc_parts, score_parts = [], []
+            for term in tokens:
+                docs, tfs = self._postings(term, ranges)
+                if not len(docs):
+                    continue
+
+                # IDF always uses corpus-wide document frequency (live chunks)
+                df = self._df(term)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                tf = tfs.astype(np.float32)
+                norm = K1 * (1 - B + B * doc_len[docs] / avgdl)
+                doc_parts.append(docs)
+                score_parts.append(idf * tf * (K1 + 1) / (tf + norm))
+        finally:
+            # Release the buffer view so the length array can grow again
+            del doc_len
+
+        if not doc_parts:
+            return None
+
+        if len(doc_parts) == 1:
+            return doc_parts[0].astype(np.int64), score_parts[0]
+
+        # Sum per chunk over the concatenated postings only
+        all_docs = np.concatenate(doc_parts)
+        all_scores = np.concatenate(score_parts)
+        docs, inverse = np.unique(all_docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=all_scores, minlength=len(docs))
+        return docs.astype(np.int64), scores
+
+    # ============================================================
+    # Persistence
+    # ============================================================
+    def _seg_file(self, gen: int, name: str) -> str:
+        return os.path.join(self.path, f"seg_{gen}_{name}.npy")
+
+    def _disk_gen(self) -> int:
+        meta_path = os.path.join(self.path, SEGMENT_META)
+        if not os.path.exists(meta_path):
+            return 0
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)["gen"]
+
+    def _load(self):
+        meta_path = os.path.join(self.path, SEGMENT_META)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+
+            self._gen = meta["gen"]
+            self._seg_n = meta["n_docs"]
+            self._seg_terms = {t: i for i, t in enumerate(meta["terms"])}
+            self._seg_offsets = np.load(self._seg_file(self._gen, "offsets"), mmap_mode="r")
+            self._seg_docs = np.load(self._seg_file(self._gen, "docs"), mmap_mode="r")
+            self._seg_tfs = np.load(self._seg_file(self._gen, "tfs"), mmap_mode="r")
+
+            seg_len = np.load(self._seg_file(self._gen, "doclen"), mmap_mode="r")
+            self._doc_len = array("I")
+            self._doc_len.frombytes(seg_len.astype(np.uint32).tobytes())
+            self._total_len = int(seg_len.sum())
+
+        self._read_log(from_offset=0)
+
+    def _read_log(self, from_offset: int):
+        log_path = os.path.join(self.path, CHUNK_LOG)
+        if not os.path.exists(log_path):
+            return
+
+        with open(log_path, "rb") as f:
+            f.seek(from_offset)
+            offset = from_offset
+            while True:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break   # end of log or half-written last line
+                offset += len(line)
+                record = json.loads(line)
+                if record.get("op") == "remove":
+                    self._remove(record["doc_id"])
+                elif len(self.chunks) < self._seg_n:
+                    # Covered by the segment: keep the text only
+                    self._append_chunk(record)
+                else:
+                    self._index_record(record)
+            self._log_offset = offset
+
+    def refresh(self):
+        """
+        Picks up chunks appended to the log by another process
+        """
+        if not self.path:
+            return
+        log_path = os.path.join(self.path, CHUNK_LOG)
+        if not os.path.exists(log_path):
+            return
+        with self._lock:
+            if os.path.getsize(log_path) > self._log_offset:
+                self._read_log(from_offset=self._log_offset)
+
+    def save(self):
+        """
+        Merges segment + delta into a new mmap-able segment
+        """
+        if not self.path:
+            return
+
+        with self._writing():
+            terms = list(self._seg_terms) + [t for t in self._delta if t not in self._seg_terms]
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            doc_parts, tf_parts = [], []
+            alive = np.frombuffer(self._alive, dtype=np.uint8).copy()
+
+            for i, term in enumerate(terms):
+                docs, tfs = self._postings(term)
+                if self._removed:
+                    # Removed chunks' postings are dropped here
+                    keep = alive[docs] > 0
+                    docs, tfs = docs[keep], tfs[keep]
+                doc_parts.append(np.asarray(docs, dtype=np.uint32))
+                tf_parts.append(np.minimum(tfs, 65535).astype(np.uint16))
+                offsets[i + 1] = offsets[i] + len(docs)
+
+            # Past any segment another process wrote: its files are not overwritten
+            disk_gen = self._disk_gen()
+            gen = max(self._gen, disk_gen) + 1
+            np.save(self._seg_file(gen, "offsets"), offsets)
+            np.save(self._seg_file(gen, "docs"),
+                    np.concatenate(doc_parts) if doc_parts else np.zeros(0, np.uint32))
+            np.save(self._seg_file(gen, "tfs"),
+                    np.concatenate(tf_parts) if tf_parts else np.zeros(0, np.uint16))
+            np.save(self._seg_file(gen, "doclen"), np.asarray(self._doc_len, dtype=np.uint32))
+
+            # segment.json is the commit point
+            meta_path = os.path.join(self.path, SEGMENT_META)
+            tmp_path = meta_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"gen": gen, "n_docs": len(self.chunks), "terms": terms}, f)
+            os.replace(tmp_path, meta_path)
+
+            old_gens = {self._gen, disk_gen}
+            self._gen = gen
+            self._seg_n = len(self.chunks)
+            self._seg_terms = {t: i for i, t in enumerate(terms)}
+            self._seg_offsets = np.load(self._seg_file(gen, "offsets"), mmap_mode="r")
+            self._seg_docs = np.load(self._seg_file(gen, "docs"), mmap_mode="r")
+            self._seg_tfs = np.load(self._seg_file(gen, "tfs"), mmap_mode="r")
+            self._delta = {}
+            self._dead_df = Counter()
+
+            for old_gen in old_gens:
+                for name in ("offsets", "docs", "tfs", "doclen"):
+                    try:
+                        os.remove(self._seg_file(old_gen, name))
+                    except OSError:
+                        pass
@@ -0,0 +1,91 @@
+# vectorstore/chunk_store.py
+import os
+import sqlite3
+import threading
+
+# 🔑 Local chunk text, keyed by vector id (Pinecone only keeps ids + small metadata)
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", os.path.join(".cache", "chunks.sqlite"))
+MAX_PARAMS = 500   # SQLite limits the number of bound parameters per statement
+
+
+class ChunkStore:
+    """
+    vector id -> (doc_id, text) in SQLite (WAL)
+
+    - written next to every upsert, read back in one batched multi-get for
+      the few candidates that survive fusion / reranking
+    - WAL lets retrieval read while another session indexes
+    """
+
+    def __init__(self, path: str = CHUNK_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id TEXT PRIMARY KEY,"
+            " doc_id TEXT,"
+            " text TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_doc ON chunks(doc_id)")
+        self._conn.commit()
+
+    def put_many(self, chunks, doc_id: str = None):
+        """
+        Stores chunks with "id" and "text" (one transaction)
+        """
+        rows = [(chunk["id"], doc_id, chunk["text"]) for chunk in chunks]
+        if not rows:
+            return
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (id, doc_id, text) VALUES (?, ?, ?)",
+                    rows,
+                )
+
+    def get_many(self, ids: list[str]) -> dict:
+        """
+        Returns {id: text} for the ids that are stored
+        """
+        found = {}
+        unique = list(dict.fromkeys(ids))
+        with self._lock:
+            for i in range(0, len(unique), MAX_PARAMS):
+                batch = unique[i:i + MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self._conn.execute(
+                    f"SELECT id, text FROM chunks WHERE id IN ({placeholders})",
+                    batch,
+                ).fetchall())
+        return found
+
+    def delete_many(self, ids: list[str]):
+        with self._lock:
+            with self._conn:
+                for i in range(0, len(ids), MAX_PARAMS):
+                    batch = ids[i:i + MAX_PARAMS]
+                    placeholders = ",".join("?" * len(batch))
+                    self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()
+        return {"chunks": count}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_chunk_store() -> ChunkStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ChunkStore()
+        return _store
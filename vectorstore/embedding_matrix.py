@@ -0,0 +1,175 @@
+# vectorstore/embedding_matrix.py
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 🔑 Recently upserted embeddings, one bounded matrix per ingestion process
+EMBED_MATRIX_DTYPE = os.getenv("EMBED_MATRIX_DTYPE", "float32")   # float32 | float16
+EMBED_MATRIX_PATH = os.getenv("EMBED_MATRIX_PATH", "")   # set: memory-mapped scratch file
+EMBED_MATRIX_MAX_ROWS = int(os.getenv("EMBED_MATRIX_MAX_ROWS", "20000"))   # ~80 MB at 1024 float32
+INITIAL_ROWS = 1024
+
+
+class EmbeddingMatrix:
+    """
+    vector id -> row of one contiguous (rows, dim) NumPy array
+
+    - 4 (float32) or 2 (float16) bytes per dimension, instead of a Python
+      float object plus a list slot (~32 bytes) per dimension
+    - capacity doubles when full, up to `max_rows`; past that the least
+      recently used vector is evicted (callers fall back to the index)
+    - rows of removed or evicted ids are reused
+    - with `path`, the array lives in a memory-mapped scratch file
+      (recreated on start, not a persistent store), so the OS can page
+      cold vectors out instead of keeping them in process memory
+    """
+
+    def __init__(self, dtype: str = EMBED_MATRIX_DTYPE, path: str = None,
+                 max_rows: int = EMBED_MATRIX_MAX_ROWS):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unknown embedding matrix dtype: {dtype}")
+        self.dtype = np.dtype(dtype)
+        self.path = path
+        self.max_rows = max(1, max_rows)
+        self.dim = None
+        self._matrix = None
+        self._rows = OrderedDict()   # id -> row, least recently used first
+        self.evicted = 0
+        self._free = []     # rows of removed ids
+        self._used = 0      # high-water mark
+        self._lock = threading.Lock()
+
+    def _grow(self, needed: int):
+        capacity = 0 if self._matrix is None else len(self._matrix)
+        if needed <= capacity:
+            return
+        new_capacity = max(INITIAL_ROWS, capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+        new_capacity = min(new_capacity, max(needed, self.max_rows))
+
+        if self.path:
+            # Extending the file keeps the rows already written
+            if self._matrix is None:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                open(self.path, "wb").close()
+            else:
+                self._matrix.flush()
+            with open(self.path, "r+b") as f:
+                f.truncate(new_capacity * self.dim * self.dtype.itemsize)
+            self._matrix = np.memmap(self.path, dtype=self.dtype, mode="r+",
+                                     shape=(new_capacity, self.dim))
+        else:
+            matrix = np.zeros((new_capacity, self.dim), dtype=self.dtype)
+            if self._matrix is not None:
+                matrix[:self._used] = self._matrix[:self._used]
+            self._matrix = matrix
+
+    def add(self, ids: list[str], vectors):
+        """
+        Stores (or overwrites) one vector per id
+        """
+        if not ids:
+            return
+        values = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = values.shape[1]
+            elif values.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {values.shape[1]} does not match {self.dim}")
+
+            # Beyond max_rows only the last max_rows vectors would survive
+            ids, values = list(ids)[-self.max_rows:], values[-self.max_rows:]
+            rows = []
+            for vector_id in ids:
+                row = self._rows.get(vector_id)
+                if row is not None:
+                    self._rows.move_to_end(vector_id)
+                else:
+                    row = self._new_row()
+                    self._rows[vector_id] = row
+                rows.append(row)
+            self._matrix[rows] = values
+
+    def _new_row(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._used < self.max_rows:
+            return self._next_row()
+        _, row = self._rows.popitem(last=False)
+        self.evicted += 1
+        return row
+
+    def _next_row(self) -> int:
+        self._grow(self._used + 1)
+        self._used += 1
+        return self._used - 1
+
+    def get(self, vector_id: str):
+        """
+        float32 copy of one vector, or None
+        """
+        with self._lock:
+            row = self._rows.get(vector_id)
+            if row is None:
+                return None
+            self._rows.move_to_end(vector_id)
+            return self._matrix[row].astype(np.float32)
+
+    def get_many(self, ids: list[str]) -> dict:
+        """
+        {id: float32 vector} for the ids that are stored
+        """
+        with self._lock:
+            found = [(vector_id, self._rows[vector_id]) for vector_id in ids if vector_id in self._rows]
+            if not found:
+                return {}
+            for vector_id, _ in found:
+                self._rows.move_to_end(vector_id)
+            values = self._matrix[[row for _, row in found]].astype(np.float32)
+        return {vector_id: values[i] for i, (vector_id, _) in enumerate(found)}
+
+    def remove(self, ids: list[str]) -> int:
+        removed = 0
+        with self._lock:
+            for vector_id in ids:
+                row = self._rows.pop(vector_id, None)
+                if row is not None:
+                    self._free.append(row)
+                    removed += 1
+        return removed
+
+    def __contains__(self, vector_id: str) -> bool:
+        return vector_id in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            capacity = 0 if self._matrix is None else len(self._matrix)
+            return {
+                "vectors": len(self._rows),
+                "dimension": self.dim,
+                "dtype": self.dtype.name,
+                "capacity": capacity,
+                "max_rows": self.max_rows,
+                "evicted": self.evicted,
+                "bytes": capacity * (self.dim or 0) * self.dtype.itemsize,
+                "mmap": bool(self.path),
+            }
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def get_embedding_matrix() -> EmbeddingMatrix:
+    global _matrix
+    with _matrix_lock:
+        if _matrix is None:
+            _matrix = EmbeddingMatrix(path=EMBED_MATRIX_PATH or None)
+        return _matrix
@@ -1,57 +1,130 @@
-# vectorstore/embeddings.py
-import os
-import time
-from pinecone import Pinecone
-from pinecone.exceptions import PineconeApiException
-
-MODEL_NAME = "llama-text-embed-v2"
-
-# 🔑 SAFE VALUES FOR FREE / STARTER PLAN
-BATCH_SIZE = 20        # was 50 → too aggressive
-SLEEP_SECONDS = 1.2    # throttle between batches
-MAX_RETRIES = 3
-
-_pc = None
-
-
-def get_pinecone_client():
-    global _pc
-    if _pc is None:
-        api_key = os.getenv("PINECONE_API_KEY")
-        if not api_key:
-            raise ValueError("PINECONE_API_KEY not set")
-        _pc = Pinecone(api_key=api_key)
-    return _pc
-
-
-def embed_texts(texts: list[str], input_type: str = "passage") -> list[list[float]]:
-    """
-    Rate-limit safe batch embedding
-    """
-    pc = get_pinecone_client()
-    embeddings = []
-
-    for i in range(0, len(texts), BATCH_SIZE):
-        batch = texts[i : i + BATCH_SIZE]
-
-        for attempt in range(MAX_RETRIES):
-            try:
-                response = pc.inference.embed(
-                    model=MODEL_NAME,
-                    inputs=batch,
-                    parameters={"input_type": input_type}
-                )
-
-                embeddings.extend([d.values for d in response.data])
-                break
-
-            except PineconeApiException as e:
-                if e.status == 429 and attempt < MAX_RETRIES - 1:
-                    time.sleep(3)  # backoff
-                else:
-                    raise
-
-        # 🔒 Throttle to respect TPM
-        time.sleep(SLEEP_SECONDS)
-
-    return embeddings
+# vectorstore/embeddings.py
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.clients import get_pinecone
+from vectorstore.embedding_cache import EmbeddingCache, cache_key
+from vectorstore.rate_limiter import RateLimiter, estimate_tokens
+
+MODEL_NAME = "llama-text-embed-v2"
+
+# 🔑 SAFE VALUES FOR FREE / STARTER PLAN
+BATCH_SIZE = 20        # was 50 → too aggressive
+MAX_RETRIES = 6
+
+# 🔒 Quota-driven throttling (replaces the fixed sleep between batches)
+REQUESTS_PER_MIN = float(os.getenv("EMBED_REQUESTS_PER_MIN", "500"))
+TOKENS_PER_MIN = float(os.getenv("EMBED_TOKENS_PER_MIN", "250000"))
+CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+BACKOFF_BASE = 0.5     # seconds, doubled per retry
+BACKOFF_MAX = 30.0
+
+USE_CACHE = os.getenv("EMBED_CACHE", "1") != "0"
+
+_cache = None
+_limiter = RateLimiter(REQUESTS_PER_MIN, TOKENS_PER_MIN)
+
+
+def share_rate_limit(n_processes: int):
+    """
+    Splits the per-minute quota between processes that embed at the same
+    time (e.g. ingestion workers), since each has its own limiter
+    """
+    global _limiter
+    _limiter = RateLimiter(REQUESTS_PER_MIN / n_processes, TOKENS_PER_MIN / n_processes)
+
+
+def get_pinecone_client():
+    return get_pinecone()
+
+
+def get_embedding_cache():
+    global _cache
+    if _cache is None and USE_CACHE:
+        _cache = EmbeddingCache()
+    return _cache
+
+
+def embed_texts(texts: list[str], input_type: str = "passage") -> list[list[float]]:
+    """
+    Rate-limit safe batch embedding
+    Cached vectors are reused; only cache misses are sent to the API
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        return _embed_uncached(texts, input_type)
+
+    keys = [cache_key(MODEL_NAME, input_type, text) for text in texts]
+    cached = cache.get_many(keys)
+
+    # ---- Embed each distinct missing text once ----
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in missing:
+            missing[key] = text
+
+    if missing:
+        vectors = _embed_uncached(list(missing.values()), input_type)
+        fresh = dict(zip(missing.keys(), vectors))
+        cache.put_many(fresh)
+        cached.update(fresh)
+
+    # ---- Restore original order ----
+    return [cached[key] for key in keys]
+
+
+def _embed_uncached(texts: list[str], input_type: str) -> list[list[float]]:
+    """
+    Embeds batches concurrently under the shared rate limiter
+    """
+    pc = get_pinecone_client()
+    batches = [texts[i : i + BATCH_SIZE] for i in range(0, len(texts), BATCH_SIZE)]
+
+    if len(batches) <= 1 or CONCURRENCY <= 1:
+        results = [_embed_batch(pc, batch, input_type) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(CONCURRENCY, len(batches))) as pool:
+            results = list(pool.map(lambda b: _embed_batch(pc, b, input_type), batches))
+
+    # pool.map keeps batch order
+    return [vector for batch_vectors in results for vector in batch_vectors]
+
+
+def _embed_batch(pc, batch: list[str], input_type: str) -> list[list[float]]:
+    from pinecone.exceptions import PineconeApiException  # lazy: heavy import
+
+    tokens = estimate_tokens(batch)
+
+    for attempt in range(MAX_RETRIES):
+        _limiter.acquire(tokens)
+        try:
+            response = pc.inference.embed(
+                model=MODEL_NAME,
+                inputs=batch,
+                parameters={"input_type": input_type}
+            )
+            return [d.values for d in response.data]
+
+        except PineconeApiException as e:
+            if e.status != 429 or attempt == MAX_RETRIES - 1:
+                raise
+
+            # Exponential backoff with full jitter, never shorter than Retry-After
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            retry_after = _retry_after_seconds(e)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+                _limiter.pause(retry_after)
+            time.sleep(delay)
+
+
+def _retry_after_seconds(error) -> float | None:
+    headers = getattr(error, "headers", None) or {}
+    for name, value in dict(headers).items():
+        if name.lower() == "retry-after":
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+    return None
@@ -0,0 +1,90 @@
+# vectorstore/fusion.py
+import os
+
+# 🔑 Fusion defaults (overridable per call)
+FUSION_METHOD = os.getenv("FUSION_METHOD", "rrf")          # "rrf" | "weighted"
+RRF_K = int(os.getenv("RRF_K", "60"))
+FUSION_WEIGHTS = {
+    "vector": float(os.getenv("FUSION_WEIGHT_VECTOR", "1.0")),
+    "bm25": float(os.getenv("FUSION_WEIGHT_BM25", "1.0")),
+}
+
+
+def reciprocal_rank_fusion(results: dict, weights: dict = None, k: int = RRF_K) -> list[dict]:
+    """
+    RRF: score = Σ weight / (k + rank) over every list a candidate appears in
+    `results` maps a source name to a ranked list of {"id", "text", "score"}
+    """
+    weights = weights or FUSION_WEIGHTS
+    fused = {}
+
+    for source, items in results.items():
+        weight = weights.get(source, 1.0)
+        for rank, item in enumerate(items, start=1):
+            entry = _entry(fused, item)
+            entry["score"] += weight / (k + rank)
+            entry["sources"][source] = {"rank": rank, "score": item.get("score")}
+
+    return sorted(fused.values(), key=lambda x: x["score"], reverse=True)
+
+
+def weighted_fusion(results: dict, weights: dict = None) -> list[dict]:
+    """
+    Weighted sum of min-max normalised scores per source
+    """
+    weights = weights or FUSION_WEIGHTS
+    fused = {}
+
+    for source, items in results.items():
+        if not items:
+            continue
+        weight = weights.get(source, 1.0)
+        scores = [item.get("score") or 0.0 for item in items]
+        low, high = min(scores), max(scores)
+        span = high - low
+
+        for rank, (item, score) in enumerate(zip(items, scores), start=1):
+            normalised = (score - low) / span if span > 0 else 1.0
+            entry = _entry(fused, item)
+            entry["score"] += weight * normalised
+            entry["sources"][source] = {"rank": rank, "score": item.get("score")}
+
+    return sorted(fused.values(), key=lambda x: x["score"], reverse=True)
+
+
+def fuse(results: dict, method: str = None, weights: dict = None) -> list[dict]:
+    method = method or FUSION_METHOD
+    if method == "rrf":
+        return reciprocal_rank_fusion(results, weights)
+    if method == "weighted":
+        return weighted_fusion(results, weights)
+    raise ValueError(f"Unknown fusion method: {method}")
+
+
+def is_decisive(fused: list[dict], top_n: int, margin: float) -> bool:
+    """
+    True when the top_n fused candidates are clearly ahead of the rest:
+    the gap between the weakest kept and the best dropped score is at
+    least `margin` × the top score (scale-free, works for RRF and weighted)
+    """
+    if margin is None or len(fused) <= top_n:
+        return False
+    top = fused[0]["score"]
+    if top <= 0:
+        return False
+    gap = fused[top_n - 1]["score"] - fused[top_n]["score"]
+    return gap >= margin * top
+
+
+def _entry(fused: dict, item: dict) -> dict:
+    entry = fused.get(item["id"])
+    if entry is None:
+        entry = fused[item["id"]] = {
+            "id": item["id"],
+            "text": item.get("text"),   # None: vector hit, text is fetched later
+            "score": 0.0,
+            "sources": {},
+        }
+    elif entry["text"] is None:
+        entry["text"] = item.get("text")
+    return entry
@@ -1,70 +1,280 @@
-import os
-from pinecone import Pinecone
-from vectorstore.embeddings import embed_texts
-from docs_loader import save_documents
-
-EMBED_BATCH = 32
-UPSERT_BATCH = 100
-
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index = pc.Index(os.getenv("PINECONE_INDEX"))
-
-
-def document_exists(doc_id: str) -> bool:
-    """
-    True full-document deduplication
-    """
-    try:
-        res = index.fetch(ids=[f"{doc_id}_0"])
-        return bool(res.vectors)
-    except Exception:
-        return False
-
-
-def upsert_chunks(chunks, doc_id: str, doc_name: str):
-    """
-    Upserts document chunks into Pinecone
-    Persists doc registry for cross-session dropdown
-    """
-    indexed = 0
-    skipped = 0
-
-    # ✅ Full-document deduplication
-    if document_exists(doc_id):
-        skipped = len(chunks)
-        return indexed, skipped
-
-    texts = [c["text"] for c in chunks]
-
-    # ---- Embed in batches ----
-    embeddings = []
-    for i in range(0, len(texts), EMBED_BATCH):
-        embeddings.extend(embed_texts(texts[i:i + EMBED_BATCH]))
-
-    # ---- Prepare vectors ----
-    vectors = []
-    for i, (chunk, vector) in enumerate(zip(chunks, embeddings)):
-        vectors.append({
-            "id": f"{doc_id}_{i}",
-            "values": vector,
-            "metadata": {
-                "doc_id": doc_id,
-                "doc_name": doc_name,   # ✅ filename
-                "chunk_index": i,
-                "text": chunk["text"]
-            }
-        })
-
-    # ---- Safe batched upsert ----
-    for i in range(0, len(vectors), UPSERT_BATCH):
-        batch = vectors[i:i + UPSERT_BATCH]
-        index.upsert(vectors=batch)
-        indexed += len(batch)
-
-    # ---- Persist document registry ----
-    save_documents(
-        doc_name=doc_name,
-        doc_id=doc_id
-    )
-
-    return indexed, skipped
+import os
+from concurrent.futures import ThreadPoolExecutor
+from utils.clients import get_index
+from utils.hashing import chunk_hash
+from vectorstore.chunk_store import get_chunk_store
+from vectorstore.embedding_matrix import get_embedding_matrix
+from vectorstore.embeddings import embed_texts
+from vectorstore.manifest import load_manifest, save_manifest
+from vectorstore.pinecone_client import fingerprint, remember_fingerprints, reuse_duplicate_vectors
+from docs_loader import save_documents
+from utils.query_cache import invalidate_documents
+
+EMBED_BATCH = 32
+UPSERT_BATCH = 100
+DELETE_BATCH = 1000    # Pinecone's max ids per delete
+STREAM_BATCH = 64      # chunks per embed + upsert step while streaming
+CHUNK_ID_CHARS = 16    # hex chars of the chunk hash in vector ids
+# An upload under a known name is an edit of that document only if this
+# share of its chunks is already indexed there; otherwise it is a new one
+EDIT_MIN_SHARED = float(os.getenv("DOC_EDIT_MIN_SHARED", "0.25"))
+
+
+def document_exists(doc_id: str, content_hash: str = None) -> bool:
+    """
+    True full-document deduplication
+    With a manifest, also checks it records this exact file version
+    """
+    manifest = load_manifest(doc_id)
+    if manifest is not None:
+        return content_hash is None or manifest["content_hash"] == content_hash
+
+    # Documents indexed before manifests: positional ids, doc_id = file hash
+    if content_hash is not None and content_hash != doc_id:
+        return False
+    try:
+        res = get_index().fetch(ids=[f"{doc_id}_0"])
+        return bool(res.vectors)
+    except Exception:
+        return False
+
+
+def chunk_id(doc_id: str, text: str) -> str:
+    return f"{doc_id}_{chunk_hash(text)[:CHUNK_ID_CHARS]}"
+
+
+def match_document(candidates: list[str], chunks, content_hash: str) -> str:
+    """
+    doc_id for a file uploaded under an already registered name: the
+    candidate (doc_id registered under that name) whose manifest holds the
+    largest share of the file's chunks, if at least EDIT_MIN_SHARED, else
+    content_hash (a new document: index_chunk_stream would otherwise delete
+    the unrelated document's vectors as orphans)
+    """
+    hashes = {chunk_hash(chunk["text"])[:CHUNK_ID_CHARS] for chunk in chunks}
+    best, best_share = content_hash, 0.0
+    if not hashes:
+        return best
+    for doc_id in candidates:
+        manifest = load_manifest(doc_id)
+        if manifest is None:
+            continue   # nothing to compare with: never treated as an edit
+        stored = set(manifest["chunks"])
+        share = sum(f"{doc_id}_{h}" in stored for h in hashes) / len(hashes)
+        if share >= EDIT_MIN_SHARED and share > best_share:
+            best, best_share = doc_id, share
+    return best
+
+
+def upsert_chunks(chunks, doc_id: str, doc_name: str, vectors=None):
+    """
+    Upserts document chunks into Pinecone
+    Persists doc registry for cross-session dropdown
+
+    Indexed like a stream (index_chunk_stream): content-hash chunk ids and
+    a manifest, so both entry points agree on a document's vector ids.
+    Precomputed embeddings are reused instead of re-embedding:
+    - `vectors` (same order as `chunks`), or
+    - `chunk["vector"]` already set by the caller
+    Only chunks without a vector are sent to the embedding API.
+    The caller's chunk dicts are left untouched (copies are indexed).
+    """
+    # ✅ Full-document deduplication
+    if document_exists(doc_id):
+        return 0, len(chunks)
+
+    if vectors is not None and len(vectors) != len(chunks):
+        raise ValueError("vectors must have the same length as chunks")
+
+    copies = [dict(chunk) for chunk in chunks]
+    if vectors is not None:
+        for chunk, vector in zip(copies, vectors):
+            chunk["vector"] = vector
+
+    indexed, skipped, _ = index_chunk_stream(copies, doc_id, doc_name)
+    return indexed, skipped
+
+
+def index_chunk_stream(chunks, doc_id: str, doc_name: str, content_hash: str = None,
+                       batch_size: int = STREAM_BATCH, on_batch=None, stats: dict = None,
+                       n_bytes: int = None, upserted_ids=None, on_upserted=None):
+    """
+    Incrementally (re-)indexes a document from a chunk generator while it
+    is still producing chunks (e.g. utils.file_loader.iter_file_chunks)
+
+    - chunk ids are content hashes (f"{doc_id}_{hash}"), set on each chunk;
+      chunks already in the document's manifest are neither embedded nor
+      upserted again, so editing a page only re-embeds the chunks it changed
+    - vectors of chunks no longer in the document are deleted in batches
+      (with their text in the local chunk store)
+    - a new chunk near-identical to one of another document reuses that
+      stored vector instead of being embedded (pinecone_client)
+    - once upserted, a chunk's vector moves to the process's bounded
+      embedding matrix (chunk["vector"] is removed), where later
+      near-duplicates read it without a fetch
+    - on_batch(batch) runs on the caller's thread with every chunk
+    - embed + upsert of one batch runs on a worker thread while the next
+      batch is extracted; at most one batch is in flight
+    - the manifest is written last. An interrupted run resumes when given
+      the ids it had upserted (`upserted_ids`, e.g. checkpointed by
+      on_upserted(batch), which runs on the worker thread after each
+      upsert): they are not embedded again, and deleted if the document
+      no longer has them
+
+    Returns (indexed, skipped, deleted); skipped = chunks left unchanged
+    `stats` (optional dict) receives "reused_vectors" and "resumed"; `n_bytes`
+    (file size) is recorded in the document registry with the chunk count
+    """
+    if document_exists(doc_id, content_hash):
+        return 0, 0, 0
+
+    previous = _indexed_chunk_ids(doc_id)
+    resumed = dict.fromkeys(upserted_ids or [])
+    chunk_ids = {}   # ordered set of the new version's ids -> fingerprint
+    indexed = skipped = reused = n_resumed = 0
+    pending = None
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest") as pool:
+        for batch in _batched(chunks, batch_size):
+            changed = []
+            for chunk in batch:
+                chunk["id"] = chunk_id(doc_id, chunk["text"])
+                chunk["chunk_index"] = len(chunk_ids)
+                chunk["fingerprint"] = fingerprint(chunk["text"])
+                if chunk["id"] in chunk_ids:
+                    skipped += 1
+                elif chunk["id"] in resumed:
+                    n_resumed += 1
+                elif chunk["id"] in previous:
+                    skipped += 1
+                else:
+                    changed.append(chunk)
+                chunk_ids.setdefault(chunk["id"], chunk["fingerprint"])
+            if on_batch:
+                on_batch(batch)
+
+            if pending is not None:
+                indexed, reused = _add(pending.result(), indexed, reused)
+                pending = None
+            if changed:
+                pending = pool.submit(_embed_and_upsert, changed, doc_id, doc_name, on_upserted)
+        if pending is not None:
+            indexed, reused = _add(pending.result(), indexed, reused)
+
+    # ---- Orphans of the previous version ----
+    removed = [i for i in {**previous, **resumed} if i not in chunk_ids]
+    for i in range(0, len(removed), DELETE_BATCH):
+        get_index().delete(ids=removed[i:i + DELETE_BATCH])
+    if removed:
+        get_chunk_store().delete_many(removed)
+        get_embedding_matrix().remove(removed)
+
+    save_manifest(doc_id, doc_name, content_hash, list(chunk_ids), list(chunk_ids.values()))
+    remember_fingerprints(list(chunk_ids), list(chunk_ids.values()))
+    if stats is not None:
+        stats["reused_vectors"] = reused
+        stats["resumed"] = n_resumed
+
+    # ---- Cached answers may now be stale ----
+    if indexed or removed:
+        invalidate_documents(doc_id)
+
+    save_documents(doc_name=doc_name, doc_id=doc_id, chunks=len(chunk_ids), n_bytes=n_bytes)
+    return indexed, skipped, len(removed)
+
+
+def _indexed_chunk_ids(doc_id: str) -> dict:
+    """
+    Vector ids currently stored for a document, as an ordered set
+    """
+    manifest = load_manifest(doc_id)
+    if manifest is not None:
+        return dict.fromkeys(manifest["chunks"])
+
+    # No manifest (indexed before manifests): list ids by prefix
+    try:
+        ids = {}
+        for page in get_index().list(prefix=f"{doc_id}_"):
+            ids.update(dict.fromkeys(page))
+        return ids
+    except Exception:
+        return {}   # e.g. pod indexes without list(); orphans stay as before
+
+
+def _batched(chunks, size: int):
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _add(result, indexed: int, reused: int):
+    return indexed + result[0], reused + result[1]
+
+
+def _embed_and_upsert(chunks, doc_id: str, doc_name: str, on_upserted=None):
+    """
+    Returns (upserted, vectors reused from near-duplicates)
+    """
+    reused = reuse_duplicate_vectors(chunks, doc_id)
+    records = _prepare_batch(chunks, doc_id, doc_name)
+    # Text first: a vector is never searchable without its text
+    get_chunk_store().put_many(chunks, doc_id)
+    upserted = _upsert_batch(records)
+    _share_vectors(chunks)
+    if on_upserted:
+        on_upserted(chunks)
+    return upserted, reused
+
+
+def _prepare_batch(chunks, doc_id: str, doc_name: str):
+    """
+    Pinecone records for chunks (with "id" and "chunk_index" set),
+    embedding only chunks without a "vector" (which is then set on the chunk)
+    """
+    missing = [chunk for chunk in chunks if chunk.get("vector") is None]
+    for i in range(0, len(missing), EMBED_BATCH):
+        batch = missing[i:i + EMBED_BATCH]
+        for chunk, vector in zip(batch, embed_texts([c["text"] for c in batch])):
+            chunk["vector"] = vector
+
+    return [
+        {
+            "id": chunk["id"],
+            "values": chunk["vector"],
+            "metadata": _metadata(chunk, doc_id, doc_name)
+        }
+        for chunk in chunks
+    ]
+
+
+def _metadata(chunk, doc_id: str, doc_name: str) -> dict:
+    # Text lives in the local chunk store (vectorstore.chunk_store), not here
+    metadata = {
+        "doc_id": doc_id,
+        "doc_name": doc_name,   # ✅ filename
+        "chunk_index": chunk["chunk_index"],
+    }
+    # Char offsets / page from the chunker (Pinecone rejects null values)
+    for key in ("start", "end", "page"):
+        if chunk.get(key) is not None:
+            metadata[key] = chunk[key]
+    return metadata
+
+
+def _upsert_batch(records) -> int:
+    # ---- Safe batched upsert ----
+    for i in range(0, len(records), UPSERT_BATCH):
+        get_index().upsert(vectors=records[i:i + UPSERT_BATCH])
+    return len(records)
+
+
+def _share_vectors(chunks):
+    """
+    Moves chunk["vector"] lists into the process's embedding matrix (LRU-capped)
+    """
+    get_embedding_matrix().add([c["id"] for c in chunks], [c.pop("vector") for c in chunks])
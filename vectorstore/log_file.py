@@ -0,0 +1,53 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+# 🔒 Append-only JSON-lines logs shared by processes (BM25Store, LocalVectorIndex)
+LOCK_FILE = "log.lock"
+
+
+@contextmanager
+def log_lock(directory: str):
+    """
+    Exclusive lock on a store directory, held across processes while one
+    of them replays the log tail and appends to it
+    """
+    with open(os.path.join(directory, LOCK_FILE), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:   # LK_LOCK gives up after ~10 s
+                    time.sleep(0.1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def append_records(log_path: str, records: list[dict]) -> int:
+    """
+    Appends records as JSON lines; returns the log size right after them
+
+    Call under log_lock, once the tail written by other processes has been
+    replayed: the returned offset then covers exactly what this process read
+    """
+    with open(log_path, "ab") as f:
+        for record in records:
+            f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        return f.tell()
@@ -0,0 +1,66 @@
+# vectorstore/manifest.py
+import json
+import os
+
+# 🔑 Per-document chunk manifest: what is in Pinecone for each doc_id
+MANIFEST_DIR = os.getenv("MANIFEST_DIR", os.path.join(".cache", "manifests"))
+
+
+def _manifest_path(doc_id: str) -> str:
+    return os.path.join(MANIFEST_DIR, f"{doc_id}.json")
+
+
+def load_manifest(doc_id: str):
+    """
+    {"doc_id", "doc_name", "content_hash", "chunks": [chunk ids],
+     "fingerprints": [...]} or None
+    """
+    try:
+        with open(_manifest_path(doc_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def iter_manifests():
+    if not os.path.isdir(MANIFEST_DIR):
+        return
+    for name in sorted(os.listdir(MANIFEST_DIR)):
+        if name.endswith(".json"):
+            manifest = load_manifest(name[:-len(".json")])
+            if manifest is not None:
+                yield manifest
+
+
+def manifest_state() -> dict:
+    """
+    {file name: (mtime_ns, size)}: cheap change detection for caches
+    built from every manifest
+    """
+    if not os.path.isdir(MANIFEST_DIR):
+        return {}
+    return {
+        entry.name: (entry.stat().st_mtime_ns, entry.stat().st_size)
+        for entry in os.scandir(MANIFEST_DIR)
+        if entry.name.endswith(".json")
+    }
+
+
+def save_manifest(doc_id: str, doc_name: str, content_hash: str, chunk_ids: list[str],
+                  fingerprints: list[str] = None):
+    """
+    Written once a document version is fully indexed (the commit point)
+    `fingerprints` are aligned with `chunk_ids` (near-duplicate lookup)
+    """
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    path = _manifest_path(doc_id)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "doc_id": doc_id,
+            "doc_name": doc_name,
+            "content_hash": content_hash,
+            "chunks": chunk_ids,
+            "fingerprints": fingerprints or [],
+        }, f)
+    os.replace(tmp_path, path)
@@ -1,49 +1,142 @@
-from dotenv import load_dotenv
-load_dotenv()
-
-import os
-import hashlib
-from pinecone import Pinecone
-from vectorstore.embeddings import embed_text
-
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index = pc.Index(os.getenv("PINECONE_INDEX"))
-
-
-def _stable_id(text: str) -> str:
-    """Deterministic ID to avoid duplicates & overwrites"""
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()
-
-
-def upsert_chunks(chunks):
-    vectors = []
-
-    for chunk in chunks:
-        text = chunk["text"] if isinstance(chunk, dict) else chunk
-
-        vectors.append({
-            "id": _stable_id(text),
-            "values": embed_text(text, input_type="passage"),  # ✅ correct
-            "metadata": {"text": text}
-        })
-
-    index.upsert(vectors=vectors)
-    return len(vectors)
-
-
-def query_index(chunk, top_k: int = 1):
-    """
-    Used ONLY to check whether a similar chunk already exists
-    """
-
-    text = chunk["text"] if isinstance(chunk, dict) else chunk
-
-    vector = embed_text(text, input_type="query")  # ✅ correct
-
-    res = index.query(
-        vector=vector,
-        top_k=top_k,
-        include_metadata=False
-    )
-
-    return res.matches if res and hasattr(res, "matches") else []
+from dotenv import load_dotenv
+load_dotenv()
+
+import hashlib
+import os
+import re
+import threading
+import time
+from utils.clients import get_index
+from vectorstore.chunk_store import get_chunk_store
+from vectorstore.embedding_matrix import get_embedding_matrix
+from vectorstore.embeddings import embed_texts
+from vectorstore.manifest import iter_manifests, manifest_state
+
+# 🔑 Near-duplicate detection across documents
+NEAR_DUP_MIN_WORDS = int(os.getenv("NEAR_DUP_MIN_WORDS", "8"))   # shorter chunks never reuse a vector
+FINGERPRINT_REFRESH_SECONDS = 10.0   # how often other processes' manifests are picked up
+FINGERPRINT_VERSION = "v2"           # v1 (letters only) keys never match
+UPSERT_BATCH = 100
+FETCH_BATCH = 1000     # Pinecone's max ids per fetch
+
+_fingerprints = None   # fingerprint -> vector id, from every manifest
+_fingerprints_state = None   # manifest files the index was built from
+_fingerprints_checked = 0.0
+_fingerprints_lock = threading.Lock()
+
+
+def _stable_id(text: str) -> str:
+    """Deterministic ID to avoid duplicates & overwrites"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _text(chunk) -> str:
+    return chunk["text"] if isinstance(chunk, dict) else chunk
+
+
+def upsert_chunks(chunks):
+    """
+    Batched embedding + chunked upserts, content-addressed ids
+    Text goes to the local chunk store; Pinecone only gets ids + vectors
+    """
+    texts = [_text(chunk) for chunk in chunks]
+    vectors = embed_texts(texts, input_type="passage")
+    records = [
+        {"id": _stable_id(text), "values": vector}
+        for text, vector in zip(texts, vectors)
+    ]
+    get_chunk_store().put_many([{"id": r["id"], "text": t} for r, t in zip(records, texts)])
+    for i in range(0, len(records), UPSERT_BATCH):
+        get_index().upsert(vectors=records[i:i + UPSERT_BATCH])
+    return len(records)
+
+
+# ---------------- Pre-embedding stage (ingestion) ----------------
+def fingerprint(text: str) -> str:
+    """
+    Near-identity key: lower-cased words and numbers, so chunks differing
+    just in whitespace or punctuation collide. "" (never matched) for
+    chunks under NEAR_DUP_MIN_WORDS words, e.g. table rows or page numbers.
+    """
+    words = re.findall(r"[^\W_]+", text.lower())
+    if len(words) < NEAR_DUP_MIN_WORDS:
+        return ""
+    key = FINGERPRINT_VERSION + " " + " ".join(words)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def _fingerprint_index() -> dict:
+    """
+    Rebuilt from the manifests whenever they change on disk (checked at
+    most every FINGERPRINT_REFRESH_SECONDS), so documents indexed by other
+    processes are seen too
+    """
+    global _fingerprints, _fingerprints_state, _fingerprints_checked
+    with _fingerprints_lock:
+        now = time.monotonic()
+        if _fingerprints is None or now - _fingerprints_checked >= FINGERPRINT_REFRESH_SECONDS:
+            _fingerprints_checked = now
+            state = manifest_state()
+            if _fingerprints is None or state != _fingerprints_state:
+                _fingerprints = {}
+                for manifest in iter_manifests():
+                    _remember(manifest.get("chunks", []), manifest.get("fingerprints", []))
+                _fingerprints_state = state
+        return _fingerprints
+
+
+def _remember(chunk_ids, fingerprints):
+    for vector_id, fp in zip(chunk_ids, fingerprints):
+        if fp:
+            _fingerprints.setdefault(fp, vector_id)
+
+
+def remember_fingerprints(chunk_ids: list[str], fingerprints: list[str]):
+    """
+    Registers a newly indexed document version
+    """
+    _fingerprint_index()
+    with _fingerprints_lock:
+        _remember(chunk_ids, fingerprints)
+
+
+def reuse_duplicate_vectors(chunks, doc_id: str) -> int:
+    """
+    Copies the stored vector of a near-identical chunk from another
+    document onto chunk["vector"], so the chunk skips the embedding API
+    (chunks need "fingerprint"). Still upserted under its own id, so
+    doc-scoped search keeps finding it. Vectors still in this process's
+    embedding matrix (recently upserted) are read locally; the rest are
+    fetched from the index.
+    Returns how many were reused.
+    """
+    index = _fingerprint_index()
+    sources = {}
+    for chunk in chunks:
+        if chunk.get("vector") is not None:
+            continue
+        if not chunk["fingerprint"]:
+            continue
+        source = index.get(chunk["fingerprint"])
+        if source and not source.startswith(f"{doc_id}_"):
+            sources.setdefault(source, []).append(chunk)
+    if not sources:
+        return 0
+
+    reused = 0
+    for vector_id, vector in get_embedding_matrix().get_many(list(sources)).items():
+        for chunk in sources.pop(vector_id):
+            chunk["vector"] = vector.tolist()
+            reused += 1
+
+    ids = list(sources)
+    for i in range(0, len(ids), FETCH_BATCH):
+        try:
+            res = get_index().fetch(ids=ids[i:i + FETCH_BATCH])
+        except Exception:
+            continue   # best effort: these chunks are embedded instead
+        for vector_id, vector in (res.vectors or {}).items():
+            for chunk in sources.get(vector_id, []):
+                chunk["vector"] = list(vector.values)
+                reused += 1
+    return reused
@@ -0,0 +1,67 @@
+# vectorstore/rate_limiter.py
+import threading
+import time
+
+from utils.tokens import count_tokens
+
+
+def estimate_tokens(texts: list[str]) -> int:
+    """
+    Token estimate for a batch (tiktoken, falls back to ~4 chars/token)
+    """
+    return sum(count_tokens(t) for t in texts)
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for requests/min AND tokens/min
+
+    Both buckets refill continuously. `acquire` blocks until a request
+    and its estimated tokens fit, so callers run as fast as the quota
+    allows instead of sleeping a fixed delay. `pause` stops every caller
+    until a server-provided Retry-After has passed.
+    """
+
+    def __init__(self, requests_per_min: float, tokens_per_min: float, burst_seconds: float = 10.0):
+        self.request_rate = requests_per_min / 60.0
+        self.token_rate = tokens_per_min / 60.0
+        self.request_capacity = max(1.0, self.request_rate * burst_seconds)
+        self.token_capacity = max(1.0, self.token_rate * burst_seconds)
+
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_rate)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_rate)
+
+    def acquire(self, tokens: int = 0):
+        # A single batch larger than the bucket would otherwise wait forever
+        tokens = min(tokens, self.token_capacity)
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if self._requests >= 1 and self._tokens >= tokens:
+                        self._requests -= 1
+                        self._tokens -= tokens
+                        return
+                    wait = max(
+                        (1 - self._requests) / self.request_rate,
+                        (tokens - self._tokens) / self.token_rate,
+                    )
+
+            time.sleep(max(wait, 0.001))
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
@@ -0,0 +1,190 @@
+# vectorstore/rerankers.py
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.clients import get_pinecone
+
+# 🔑 Backend selection: "pinecone" (remote, local fallback) | "local"
+RERANKER_BACKEND = os.getenv("RERANKER", "pinecone")
+RERANK_MODEL = "bge-reranker-v2-m3"
+RERANK_BATCH = int(os.getenv("RERANK_BATCH", "32"))
+RERANK_TIMEOUT = float(os.getenv("RERANK_TIMEOUT", "5.0"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+
+
+class Reranker:
+    """
+    Base reranker: batching + (query, chunk id) score cache
+
+    Backends implement `_score(query, texts) -> list[float]`, one score
+    per text. Scores must not depend on the other texts in the batch, so
+    cached and freshly scored candidates can be ranked together.
+    """
+
+    name = "base"
+
+    def __init__(self, batch_size: int = RERANK_BATCH, cache_size: int = RERANK_CACHE_SIZE):
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _score(self, query: str, texts: list[str]) -> list[float]:
+        raise NotImplementedError
+
+    def rerank(self, query: str, candidates: list[dict], top_n: int) -> list[dict]:
+        """
+        Returns the top_n candidates (dicts with "id" and "text"),
+        best first, each with a "rerank_score"
+        """
+        scores = {}
+        missing = []
+
+        with self._lock:
+            for c in candidates:
+                key = (query, c["id"])
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[c["id"]] = self._cache[key]
+                else:
+                    missing.append(c)
+
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i:i + self.batch_size]
+            batch_scores = self._score(query, [c["text"] for c in batch])
+            with self._lock:
+                for c, score in zip(batch, batch_scores):
+                    scores[c["id"]] = score
+                    self._cache[(query, c["id"])] = score
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        ranked = sorted(candidates, key=lambda c: scores[c["id"]], reverse=True)
+        return [dict(c, rerank_score=scores[c["id"]]) for c in ranked[:top_n]]
+
+
+class PineconeReranker(Reranker):
+    """
+    Remote BGE cross-encoder via pc.inference.rerank
+    (pc=None uses the shared client, resolved on first use)
+    """
+
+    name = "pinecone"
+
+    def __init__(self, pc=None, model: str = RERANK_MODEL, **kwargs):
+        super().__init__(**kwargs)
+        self._pc = pc
+        self.model = model
+
+    @property
+    def pc(self):
+        return self._pc or get_pinecone()
+
+    def _score(self, query: str, texts: list[str]) -> list[float]:
+        response = self.pc.inference.rerank(
+            model=self.model,
+            query=query,
+            documents=texts,
+            top_n=len(texts),
+            return_documents=False,
+        )
+        if not response or not response.results:
+            raise RuntimeError("Reranker returned no results")
+
+        scores = [0.0] * len(texts)
+        for r in response.results:
+            scores[r.index] = r.score
+        return scores
+
+
+class LexicalReranker(Reranker):
+    """
+    Local CPU scorer from cheap lexical features:
+    - BM25-style term-frequency saturation over query content words
+    - query term coverage
+    - query bigrams found verbatim in the chunk
+    Each chunk is scored on its own (fixed average length, no corpus
+    IDF), so scores stay cacheable. No network, no model download.
+    """
+
+    name = "lexical"
+
+    K1 = 1.2
+    B = 0.75
+    AVG_DOC_LEN = 400   # words per chunk at ingestion
+    W_TF, W_COVERAGE, W_BIGRAM = 0.5, 0.3, 0.2
+    STOPWORDS = frozenset(
+        "a an and are as at be by do does for from how in is it of on or "
+        "the to was what when where which who why with".split()
+    )
+
+    def _tokenize(self, text: str):
+        return re.findall(r"\w+", text.lower())
+
+    def _score(self, query: str, texts: list[str]) -> list[float]:
+        q_all = self._tokenize(query)
+        q_terms = list(dict.fromkeys(t for t in q_all if t not in self.STOPWORDS)) or q_all
+        if not q_terms:
+            return [0.0] * len(texts)
+        q_bigrams = set(zip(q_all, q_all[1:]))
+
+        scores = []
+        for text in texts:
+            tokens = self._tokenize(text)
+            tf = Counter(tokens)
+            norm = self.K1 * (1 - self.B + self.B * len(tokens) / self.AVG_DOC_LEN)
+
+            saturation = sum(
+                tf[t] * (self.K1 + 1) / (tf[t] + norm) for t in q_terms if t in tf
+            ) / (len(q_terms) * (self.K1 + 1))
+            coverage = sum(1 for t in q_terms if t in tf) / len(q_terms)
+            bigram = 0.0
+            if q_bigrams:
+                bigram = len(q_bigrams & set(zip(tokens, tokens[1:]))) / len(q_bigrams)
+
+            scores.append(
+                self.W_TF * saturation
+                + self.W_COVERAGE * coverage
+                + self.W_BIGRAM * bigram
+            )
+        return scores
+
+
+class FallbackReranker:
+    """
+    Uses `primary` within `timeout`; on error or timeout uses `fallback`
+    `last_backend` tells which one produced this thread's latest ranking.
+    """
+
+    def __init__(self, primary: Reranker, fallback: Reranker, timeout: float = RERANK_TIMEOUT):
+        self.primary = primary
+        self.fallback = fallback
+        self.timeout = timeout
+        self.name = f"{primary.name}+{fallback.name}"
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rerank")
+        self._local = threading.local()
+
+    @property
+    def last_backend(self):
+        return getattr(self._local, "backend", None)
+
+    def rerank(self, query: str, candidates: list[dict], top_n: int) -> list[dict]:
+        future = self._executor.submit(self.primary.rerank, query, candidates, top_n)
+        try:
+            ranked = future.result(timeout=self.timeout)
+            self._local.backend = self.primary.name
+            return ranked
+        except Exception:
+            self._local.backend = self.fallback.name
+            return self.fallback.rerank(query, candidates, top_n)
+
+
+def build_reranker(pc=None, backend: str = RERANKER_BACKEND):
+    if backend == "local":
+        return LexicalReranker()
+    if backend == "pinecone":
+        return FallbackReranker(PineconeReranker(pc), LexicalReranker())
+    raise ValueError(f"Unknown reranker backend: {backend}")
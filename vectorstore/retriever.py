@@ -1,91 +1,260 @@
-# vectorstore/retriever.py
-
-import os
-from pinecone import Pinecone
-from vectorstore.embeddings import embed_texts
-
-# ---------------- Pinecone Init ----------------
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index = pc.Index(os.getenv("PINECONE_INDEX"))
-
-
-def retrieve_chunks(
-    query: str,
-    doc_id: str = None,
-    top_k: int = 10,
-    bm25_store=None,
-    rerank_top_k: int = 5,
-):
-    """
-    Hybrid Retrieval:
-    - Vector search (Pinecone)
-    - BM25 keyword search (optional)
-    - BGE reranker (Pinecone)
-    """
-
-    # ---------------- Vector Search ----------------
-    query_vector = embed_texts([query], input_type="query")[0]
-
-    filter_ = {"doc_id": doc_id} if doc_id else None
-
-    response = index.query(
-        vector=query_vector,
-        top_k=30,  # fetch more for reranking
-        include_metadata=True,
-        filter=filter_,
-    )
-
-    vector_results = []
-    if response and response.matches:
-        for m in response.matches:
-            if m.metadata and "text" in m.metadata:
-                vector_results.append(
-                    {
-                        "id": m.id,
-                        "text": m.metadata["text"],
-                    }
-                )
-
-    # ---------------- BM25 Search ----------------
-    bm25_results = []
-    if bm25_store:
-        bm25_hits = bm25_store.search(query, top_k=20)
-        for c in bm25_hits:
-            bm25_results.append(
-                {
-                    "id": c["id"],
-                    "text": c["text"],
-                }
-            )
-
-    # ---------------- Merge & Deduplicate ----------------
-    merged = {}
-    for item in vector_results + bm25_results:
-        merged[item["id"]] = item["text"]
-
-    candidates = list(merged.values())
-
-    # 🚨 No candidates → return empty
-    if not candidates:
-        return []
-
-    # ---------------- BGE Reranker ----------------
-    rerank_response = pc.inference.rerank(
-        model="bge-reranker-v2-m3",
-        query=query,
-        documents=candidates,
-        top_n=rerank_top_k,
-    )
-
-    # 🚨 Reranker failed or returned nothing → fallback
-    if not rerank_response or not rerank_response.results:
-        return candidates[:top_k]
-
-    # ---------------- Final Ranked Chunks ----------------
-    reranked_chunks = [
-        r.document["text"]
-        for r in rerank_response.results
-        if r.document and "text" in r.document
-    ]
-
-    return reranked_chunks[:top_k]
+# vectorstore/retriever.py
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from utils.clients import get_index
+from vectorstore.chunk_store import get_chunk_store
+from vectorstore.embeddings import embed_texts
+from vectorstore.fusion import fuse, is_decisive
+from vectorstore.rerankers import build_reranker
+
+# ---------------- Reranker ----------------
+# Pinecone client is resolved lazily on the first remote rerank
+default_reranker = build_reranker()
+
+# ---------------- Concurrency & Timeouts ----------------
+VECTOR_TIMEOUT = float(os.getenv("RETRIEVAL_VECTOR_TIMEOUT", "8.0"))   # embed + query
+BM25_TIMEOUT = float(os.getenv("RETRIEVAL_BM25_TIMEOUT", "2.0"))
+STATS_WINDOW = 500   # recent samples kept per stage
+
+# ---------------- Fusion & Rerank Pruning ----------------
+RERANK_MAX_CANDIDATES = int(os.getenv("RERANK_MAX_CANDIDATES", "20"))
+# Skip the reranker when fused scores already separate the top results
+_skip_margin = os.getenv("RERANK_SKIP_MARGIN", "0.3")
+RERANK_SKIP_MARGIN = float(_skip_margin) if _skip_margin else None
+FETCH_BATCH = 1000   # Pinecone's max ids per fetch (legacy text fallback)
+
+# Shared by every session; branches are I/O bound or release the GIL in NumPy
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+
+_stage_samples = {}
+_stats_lock = threading.Lock()
+
+
+def _record(timings: dict, stage: str, started: float):
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    timings[stage] = elapsed_ms
+    record_latency(stage, elapsed_ms)
+
+
+def record_latency(stage: str, elapsed_ms: float):
+    """
+    Adds a sample to the rolling window behind stage_percentiles()
+    """
+    with _stats_lock:
+        _stage_samples.setdefault(stage, deque(maxlen=STATS_WINDOW)).append(elapsed_ms)
+
+
+def stage_percentiles(percentiles=(50, 95, 99)) -> dict:
+    """
+    Recent per-stage latency percentiles in ms, e.g. {"rerank": {"p95": ...}}
+    """
+    with _stats_lock:
+        snapshot = {stage: sorted(samples) for stage, samples in _stage_samples.items()}
+
+    report = {}
+    for stage, samples in snapshot.items():
+        if not samples:
+            continue
+        report[stage] = {"count": len(samples)}
+        for p in percentiles:
+            idx = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+            report[stage][f"p{p}"] = samples[idx]
+    return report
+
+
+def _vector_search(query: str, doc_id: str, timings: dict, deadline: float = None):
+    started = time.perf_counter()
+    query_vector = embed_texts([query], input_type="query")[0]
+    _record(timings, "embed", started)
+
+    filter_ = {"doc_id": doc_id} if doc_id else None
+
+    started = time.perf_counter()
+    kwargs = {}
+    if deadline is not None:
+        # The HTTP call gives up with the branch instead of holding a pool thread
+        kwargs["_request_timeout"] = max(deadline - started, 0.1)
+    # Ids + scores only: text is read locally for the surviving candidates
+    response = get_index().query(
+        vector=query_vector,
+        top_k=30,  # fetch more for reranking
+        include_metadata=False,
+        filter=filter_,
+        **kwargs,
+    )
+    _record(timings, "vector_query", started)
+
+    if not response or not response.matches:
+        return []
+    return [{"id": m.id, "score": m.score} for m in response.matches]
+
+
+def _hydrate(candidates: list[dict], timings: dict) -> list[dict]:
+    """
+    Fills in "text" for vector-only candidates with one multi-get on the
+    chunk store. Vectors upserted before the store existed still carry
+    their text in Pinecone metadata: fetched once, then kept locally.
+    Candidates whose text cannot be found are dropped.
+    """
+    missing = [c["id"] for c in candidates if c.get("text") is None]
+    if not missing:
+        return candidates
+
+    started = time.perf_counter()
+    store = get_chunk_store()
+    texts = store.get_many(missing)
+
+    legacy = [i for i in missing if i not in texts]
+    for i in range(0, len(legacy), FETCH_BATCH):
+        try:
+            res = get_index().fetch(ids=legacy[i:i + FETCH_BATCH])
+        except Exception as e:
+            timings.setdefault("degraded", []).append(f"text fetch: {e}")
+            break
+        found = [
+            {"id": vector_id, "text": vector.metadata["text"]}
+            for vector_id, vector in (res.vectors or {}).items()
+            if vector.metadata and "text" in vector.metadata
+        ]
+        store.put_many(found)
+        texts.update((c["id"], c["text"]) for c in found)
+    _record(timings, "hydrate", started)
+
+    for c in candidates:
+        if c.get("text") is None:
+            c["text"] = texts.get(c["id"])
+    return [c for c in candidates if c["text"] is not None]
+
+
+def _bm25_search(bm25_store, query: str, doc_id: str, timings: dict):
+    started = time.perf_counter()
+    bm25_results = []
+    bm25_hits = bm25_store.search(query, top_k=20, doc_id=doc_id, return_scores=True)
+    for c, score in bm25_hits:
+        bm25_results.append(
+            {
+                "id": c["id"],
+                "text": c["text"],
+                "score": score,
+            }
+        )
+    _record(timings, "bm25", started)
+    return bm25_results
+
+
+def _collect(future, timeout: float, branch: str, branch_timings: dict, timings: dict):
+    """
+    Branch result, or [] if it timed out / failed (the other branch is used)
+
+    A branch records its stages in its own dict, merged into `timings`
+    only once it has finished: a timed-out branch may still be running on
+    the shared executor and must not write into a finished query's timings
+    """
+    try:
+        results = future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()   # still queued behind other queries: never starts
+        timings.setdefault("degraded", []).append(f"{branch}: timeout")
+        return []
+    except Exception as e:
+        timings.update(branch_timings)
+        timings.setdefault("degraded", []).append(f"{branch}: {e}")
+        return []
+    timings.update(branch_timings)
+    return results
+
+
+def retrieve_chunks(
+    query: str,
+    doc_id: str = None,
+    top_k: int = 10,
+    bm25_store=None,
+    rerank_top_k: int = 5,
+    timings: dict = None,
+    fusion: str = None,
+    fusion_weights: dict = None,
+    max_rerank: int = RERANK_MAX_CANDIDATES,
+    skip_margin: float = RERANK_SKIP_MARGIN,
+    reranker=None,
+):
+    """
+    Hybrid Retrieval:
+    - Vector search (utils.clients index: Pinecone or the local backend,
+      see vectorstore.vector_index) and BM25 keyword search run concurrently
+    - A branch that times out or fails is dropped; the other one is used
+    - Score-aware fusion (RRF or weighted, see vectorstore.fusion)
+    - Vector hits carry no text; it is read from the local chunk store
+      (vectorstore.chunk_store) for the capped candidates only
+    - Reranker (see vectorstore.rerankers; default Pinecone BGE with a
+      local lexical fallback) on the top `max_rerank` fused candidates,
+      skipped when the fused top `rerank_top_k` is already decisive
+
+    Pass a dict as `timings` to receive per-stage latencies in ms.
+    """
+    if timings is None:
+        timings = {}
+    total_started = time.perf_counter()
+
+    # ---------------- Vector + BM25 in parallel ----------------
+    vector_timings, bm25_timings = {}, {}
+    vector_future = _executor.submit(_vector_search, query, doc_id, vector_timings,
+                                     total_started + VECTOR_TIMEOUT)
+    bm25_future = None
+    if bm25_store:
+        bm25_future = _executor.submit(_bm25_search, bm25_store, query, doc_id, bm25_timings)
+
+    # Timeouts are measured from submission, not from when we start waiting
+    bm25_results = []
+    if bm25_future is not None:
+        remaining = total_started + BM25_TIMEOUT - time.perf_counter()
+        bm25_results = _collect(bm25_future, max(remaining, 0), "bm25", bm25_timings, timings)
+    remaining = total_started + VECTOR_TIMEOUT - time.perf_counter()
+    vector_results = _collect(vector_future, max(remaining, 0), "vector", vector_timings, timings)
+
+    # ---------------- Fuse (keeps scores) ----------------
+    fused = fuse(
+        {"vector": vector_results, "bm25": bm25_results},
+        method=fusion,
+        weights=fusion_weights,
+    )
+
+    # 🚨 No candidates → return empty
+    if not fused:
+        _record(timings, "total", total_started)
+        return []
+
+    timings["candidates"] = len(fused)
+    candidates = fused[:max_rerank]
+
+    # ✅ Fused ranking is already decisive → no rerank call
+    if is_decisive(fused, rerank_top_k, skip_margin):
+        timings["rerank_skipped"] = True
+        kept = _hydrate(candidates[:min(top_k, rerank_top_k)], timings)
+        _record(timings, "total", total_started)
+        return [item["text"] for item in kept]
+
+    candidates = _hydrate(candidates, timings)
+    if not candidates:
+        _record(timings, "total", total_started)
+        return []
+
+    # ---------------- Rerank ----------------
+    reranker = reranker or default_reranker
+    timings["reranked"] = len(candidates)
+    started = time.perf_counter()
+    try:
+        ranked = reranker.rerank(query, candidates, top_n=rerank_top_k)
+        timings["reranker"] = getattr(reranker, "last_backend", None) or reranker.name
+    except Exception as e:
+        # 🚨 Reranker failed → keep fused order
+        timings.setdefault("degraded", []).append(f"rerank: {e}")
+        ranked = candidates[:rerank_top_k]
+    _record(timings, "rerank", started)
+    _record(timings, "total", total_started)
+
+    # ---------------- Final Ranked Chunks ----------------
+    return [item["text"] for item in ranked][:top_k]
@@ -0,0 +1,665 @@
+# vectorstore/vector_index.py
+import base64
+import json
+import os
+import threading
+from array import array
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+
+from utils.clients import POOL_THREADS, get_pinecone
+from vectorstore.log_file import append_records, log_lock
+
+# 🔑 Backend selection: "pinecone" (remote) | "local" (in-process NumPy)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(".cache", "vector_index"))
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "int8")   # float32 | float16 | int8
+
+# ---- Local search: exact below IVF_MIN_VECTORS, IVF (k-means lists) above ----
+IVF_MIN_VECTORS = int(os.getenv("IVF_MIN_VECTORS", "50000"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 32
+SCORE_BLOCK = 8192      # rows per matmul (bounds the float32 copy of quantized rows)
+COMPACT_RATIO = 0.25    # rewrite the segment once the delta reaches 25% of it
+COMPACT_MIN_VECTORS = 1000
+
+SEGMENT_META = "segment.json"
+DTYPES = ("float32", "float16", "int8")
+
+
+class VectorIndex:
+    """
+    What the indexer and retriever use, in Pinecone's Index API shape:
+
+    - upsert(vectors=[{"id", "values", "metadata"}])
+    - query(vector, top_k, filter, include_metadata) -> .matches (id, score, metadata)
+    - fetch(ids) -> .vectors {id: (id, values, metadata)}
+    - delete(ids)
+    - list(prefix) -> pages of ids
+
+    Scores are cosine similarities.
+    """
+
+    name = "base"
+
+    def upsert(self, vectors, **kwargs):
+        raise NotImplementedError
+
+    def query(self, vector, top_k: int = 10, filter: dict = None,
+              include_metadata: bool = False, include_values: bool = False, **kwargs):
+        raise NotImplementedError
+
+    def fetch(self, ids, **kwargs):
+        raise NotImplementedError
+
+    def delete(self, ids=None, **kwargs):
+        raise NotImplementedError
+
+    def list(self, prefix: str = "", limit: int = 100, **kwargs):
+        raise NotImplementedError
+
+
+class PineconeVectorIndex(VectorIndex):
+    """
+    Remote Pinecone index (PINECONE_INDEX), calls passed through
+    """
+
+    name = "pinecone"
+
+    def __init__(self, index=None, index_name: str = None):
+        if index is None:
+            index_name = index_name or os.getenv("PINECONE_INDEX")
+            if not index_name:
+                raise ValueError("PINECONE_INDEX not set")
+            index = get_pinecone().Index(index_name, pool_threads=POOL_THREADS)
+        self.index = index
+
+    def upsert(self, vectors, **kwargs):
+        return self.index.upsert(vectors=vectors, **kwargs)
+
+    def query(self, vector, top_k: int = 10, filter: dict = None,
+              include_metadata: bool = False, include_values: bool = False, **kwargs):
+        return self.index.query(vector=vector, top_k=top_k, filter=filter,
+                                include_metadata=include_metadata,
+                                include_values=include_values, **kwargs)
+
+    def fetch(self, ids, **kwargs):
+        return self.index.fetch(ids=ids, **kwargs)
+
+    def delete(self, ids=None, **kwargs):
+        return self.index.delete(ids=ids, **kwargs)
+
+    def list(self, prefix: str = "", limit: int = 100, **kwargs):
+        return self.index.list(prefix=prefix, limit=limit, **kwargs)
+
+
+# ============================================================
+# Quantization
+# ============================================================
+def _quantize(values, dtype: str):
+    """
+    Unit-normalises rows and stores them as `dtype`
+    int8 keeps one float32 scale per row (symmetric, max |x| -> 127)
+    """
+    values = np.asarray(values, dtype=np.float32)
+    values = values / np.maximum(np.linalg.norm(values, axis=1, keepdims=True), 1e-12)
+    if dtype == "int8":
+        scales = np.abs(values).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        return np.round(values / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return values.astype(dtype), None
+
+
+def _dequantize(vectors, scales):
+    values = np.asarray(vectors).astype(np.float32)
+    if scales is not None:
+        values *= np.asarray(scales)[:, None]
+    return values
+
+
+def _scores(matrix, scales, q, rows=None):
+    """
+    Cosine scores of `rows` (all rows if None) against unit query `q`,
+    in blocks so a quantized matrix is never upcast in one piece
+    """
+    n = len(matrix) if rows is None else len(rows)
+    out = np.empty(n, dtype=np.float32)
+    for i in range(0, n, SCORE_BLOCK):
+        if rows is None:
+            block, block_scales = matrix[i:i + SCORE_BLOCK], scales[i:i + SCORE_BLOCK] if scales is not None else None
+        else:
+            picked = rows[i:i + SCORE_BLOCK]
+            block, block_scales = matrix[picked], scales[picked] if scales is not None else None
+        part = np.asarray(block).astype(np.float32, copy=False) @ q
+        if block_scales is not None:
+            part *= block_scales
+        out[i:i + len(part)] = part
+    return out
+
+
+def _nearest_centroid(vectors, scales, centroids):
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for i in range(0, len(vectors), SCORE_BLOCK):
+        block = _dequantize(vectors[i:i + SCORE_BLOCK],
+                            scales[i:i + SCORE_BLOCK] if scales is not None else None)
+        assign[i:i + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+def _train_ivf(vectors, scales, n_lists: int, seed: int = 0):
+    """
+    Spherical k-means on a sample; returns unit centroids (n_lists, dim)
+    """
+    rng = np.random.default_rng(seed)
+    n_sample = min(len(vectors), n_lists * KMEANS_SAMPLE_PER_LIST)
+    rows = np.sort(rng.choice(len(vectors), n_sample, replace=False))
+    sample = _dequantize(vectors[rows], scales[rows] if scales is not None else None)
+    centroids = sample[rng.choice(n_sample, n_lists, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assign = _nearest_centroid(sample, None, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=n_lists)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0   # empty lists keep their centroid
+        sums = np.add.reduceat(sample[order], starts[filled], axis=0)
+        centroids[filled] = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+class LocalVectorIndex(VectorIndex):
+    """
+    In-process vector index, same layout as the BM25 store
+
+    On disk (path):
+    - segment.json       generation, dimension, dtype (the commit point)
+    - seg_<gen>_*.npy    quantized vectors (+ int8 scales) and IVF lists,
+                         loaded with mmap
+    - seg_<gen>_rows.json  ids + metadata of the segment rows
+    - log_<gen>.jsonl    upserts / deletes since that segment, replayed on load
+
+    Vectors are unit-normalised and stored as float32, float16 or int8
+    (per-row scale): 4, 2 or 1 byte per dimension. Upserts go to an
+    in-memory delta (always scanned exactly); deletes and overwrites are
+    tombstones. Once the delta reaches COMPACT_RATIO of the segment, live
+    rows are rewritten into a new segment. With at least `ivf_min_vectors`
+    rows the segment gets IVF lists (k-means, sqrt(n) lists) and queries
+    scan only the `nprobe` closest lists; below that, search is an exact
+    blocked matmul.
+
+    Filters: {"doc_id": x}, {"doc_id": {"$eq" | "$ne" | "$in" | "$nin": ...}}.
+    A filter that keeps at most `ivf_min_vectors` rows is searched exactly.
+
+    Writers in several processes take a lock on the directory and catch
+    up with the log (or a newer segment) before appending; readers pick
+    up changes via refresh().
+    """
+
+    name = "local"
+
+    def __init__(self, path: str = None, dtype: str = LOCAL_INDEX_DTYPE,
+                 nprobe: int = IVF_NPROBE, ivf_min_vectors: int = IVF_MIN_VECTORS):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype: {dtype}")
+        self.path = path
+        self.dtype = dtype
+        self.nprobe = nprobe
+        self.ivf_min_vectors = ivf_min_vectors
+        self._lock = threading.RLock()
+        self._reset()
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    def _reset(self):
+        self.dim = None
+        self.ids = []          # row -> id
+        self.metadata = []     # row -> metadata dict
+        self._rows = {}        # id -> live row
+        self._alive = array("B")
+        self._codes = array("i")   # row -> doc_id code (-1: none)
+        self._doc_codes = {}
+        self._removed = 0
+
+        # ---- Base segment (mmap, read-only) ----
+        self._gen = 0
+        self._seg_n = 0
+        self._seg_vectors = None
+        self._seg_scales = None
+        self._centroids = None
+        self._trained_n = 0      # segment size the centroids were trained on
+        self._list_offsets = None
+        self._list_rows = None
+
+        # ---- Delta (in memory) ----
+        self._delta_parts = []   # [(vectors, scales)]
+        self._delta = None       # consolidated parts
+
+        self._log_offset = 0
+
+    # ============================================================
+    # Writes
+    # ============================================================
+    def upsert(self, vectors, **kwargs):
+        if not vectors:
+            return SimpleNamespace(upserted_count=0)
+
+        values, scales = _quantize([v["values"] for v in vectors], self.dtype)
+        records = [{"id": v["id"], "metadata": v.get("metadata") or {}} for v in vectors]
+        with self._writing():
+            if self.dim is None:
+                self.dim = values.shape[1]
+                if self.path:
+                    self._write_meta()
+            elif values.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {values.shape[1]} does not match index dimension {self.dim}")
+
+            self._append(records, values, scales)
+            if self.path:
+                self._append_log([
+                    {
+                        "op": "upsert",
+                        "id": record["id"],
+                        "m": record["metadata"],
+                        "v": base64.b64encode(values[i].tobytes()).decode("ascii"),
+                        "s": float(scales[i]) if scales is not None else None,
+                    }
+                    for i, record in enumerate(records)
+                ])
+        if self.path and self._should_compact():
+            self.save()
+        return SimpleNamespace(upserted_count=len(vectors))
+
+    def delete(self, ids=None, **kwargs):
+        with self._writing():
+            gone = [vector_id for vector_id in ids or [] if self._delete(vector_id)]
+            if self.path and gone:
+                self._append_log([{"op": "delete", "ids": gone}])
+
+    def _append(self, records, values, scales):
+        for record in records:
+            self._delete(record["id"])
+            self._rows[record["id"]] = len(self.ids)
+            self.ids.append(record["id"])
+            self.metadata.append(record["metadata"])
+            self._alive.append(1)
+            self._codes.append(self._doc_code(record["metadata"].get("doc_id")))
+        self._delta_parts.append((values, scales))
+        self._delta = None
+
+    def _delete(self, vector_id: str) -> bool:
+        row = self._rows.pop(vector_id, None)
+        if row is None:
+            return False
+        self._alive[row] = 0
+        self._removed += 1
+        return True
+
+    def _doc_code(self, doc_id) -> int:
+        if doc_id is None:
+            return -1
+        return self._doc_codes.setdefault(doc_id, len(self._doc_codes))
+
+    def _should_compact(self) -> bool:
+        delta = len(self.ids) - self._seg_n
+        return delta >= max(COMPACT_MIN_VECTORS, COMPACT_RATIO * self._seg_n)
+
+    # ============================================================
+    # Reads
+    # ============================================================
+    def fetch(self, ids, **kwargs):
+        with self._lock:
+            rows = [(vector_id, self._rows[vector_id]) for vector_id in ids if vector_id in self._rows]
+            found = {
+                vector_id: SimpleNamespace(id=vector_id, values=self._values(row).tolist(),
+                                           metadata=self.metadata[row])
+                for vector_id, row in rows
+            }
+        return SimpleNamespace(vectors=found)
+
+    def list(self, prefix: str = "", limit: int = 100, **kwargs):
+        """
+        Pages of ids starting with `prefix`, like the serverless list()
+        """
+        with self._lock:
+            ids = sorted(vector_id for vector_id in self._rows if vector_id.startswith(prefix))
+        return (ids[i:i + limit] for i in range(0, len(ids), limit))
+
+    def query(self, vector, top_k: int = 10, filter: dict = None,
+              include_metadata: bool = False, include_values: bool = False, **kwargs):
+        q = np.asarray(vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+
+        # ---- Consistent snapshot; scoring runs outside the lock ----
+        with self._lock:
+            if not self._rows:
+                return SimpleNamespace(matches=[])
+            allowed = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+            if filter:
+                allowed &= self._filter_mask(filter)
+            ids, metadata = self.ids, self.metadata
+            seg_n, seg_vectors, seg_scales = self._seg_n, self._seg_vectors, self._seg_scales
+            centroids, list_offsets, list_rows = self._centroids, self._list_offsets, self._list_rows
+            delta_vectors, delta_scales = self._consolidated_delta()
+
+        n_allowed = int(np.count_nonzero(allowed))
+        if n_allowed == 0:
+            return SimpleNamespace(matches=[])
+
+        if centroids is not None and n_allowed > self.ivf_min_vectors:
+            # ---- IVF: closest lists of the segment + the whole delta ----
+            nprobe = min(self.nprobe, len(centroids))
+            probe = np.argpartition(-(centroids @ q), nprobe - 1)[:nprobe]
+            base_rows = np.concatenate([list_rows[list_offsets[c]:list_offsets[c + 1]] for c in probe])
+            base_rows = np.sort(base_rows[allowed[base_rows]])
+            delta_rows = seg_n + np.flatnonzero(allowed[seg_n:])
+        else:
+            base_rows = np.flatnonzero(allowed[:seg_n])
+            delta_rows = seg_n + np.flatnonzero(allowed[seg_n:])
+
+        rows = np.concatenate([base_rows, delta_rows])
+        scores = np.concatenate([
+            self._score_part(seg_vectors, seg_scales, q, base_rows, 0),
+            self._score_part(delta_vectors, delta_scales, q, delta_rows, seg_n),
+        ])
+        if not len(rows):
+            return SimpleNamespace(matches=[])
+
+        k = min(top_k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        matches = []
+        for i in top:
+            row = int(rows[i])
+            matches.append(SimpleNamespace(
+                id=ids[row],
+                score=float(scores[i]),
+                metadata=metadata[row] if include_metadata else None,
+                values=self._values(row).tolist() if include_values else None,
+            ))
+        return SimpleNamespace(matches=matches)
+
+    @staticmethod
+    def _score_part(matrix, scales, q, rows, offset: int):
+        if matrix is None or not len(rows):
+            return np.zeros(0, dtype=np.float32)
+        if len(rows) == len(matrix):
+            return _scores(matrix, scales, q)   # every row: contiguous blocks
+        return _scores(matrix, scales, q, rows - offset)
+
+    def _filter_mask(self, filter: dict):
+        if set(filter) != {"doc_id"}:
+            raise ValueError(f"Unsupported filter: {filter}")
+        condition = filter["doc_id"]
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        if len(condition) != 1:
+            raise ValueError(f"Unsupported filter: {filter}")
+
+        (op, value), = condition.items()
+        values = value if op in ("$in", "$nin") else [value]
+        codes = [self._doc_codes[v] for v in values if v in self._doc_codes]
+        mask = np.isin(np.frombuffer(self._codes, dtype=np.int32), codes)
+        if op in ("$eq", "$in"):
+            return mask
+        if op in ("$ne", "$nin"):
+            return ~mask
+        raise ValueError(f"Unsupported filter operator: {op}")
+
+    def _consolidated_delta(self):
+        if self._delta is None and self._delta_parts:
+            vectors = np.concatenate([part[0] for part in self._delta_parts])
+            scales = (np.concatenate([part[1] for part in self._delta_parts])
+                      if self.dtype == "int8" else None)
+            self._delta_parts = [(vectors, scales)]
+            self._delta = (vectors, scales)
+        return self._delta or (None, None)
+
+    def _values(self, row: int):
+        if row < self._seg_n:
+            matrix, scales, i = self._seg_vectors, self._seg_scales, row
+        else:
+            (matrix, scales), i = self._consolidated_delta(), row - self._seg_n
+        return _dequantize(matrix[i:i + 1], scales[i:i + 1] if scales is not None else None)[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            itemsize = np.dtype(self.dtype).itemsize
+            return {
+                "vectors": len(self._rows),
+                "dimension": self.dim,
+                "dtype": self.dtype,
+                "segment": self._seg_n,
+                "delta": len(self.ids) - self._seg_n,
+                "ivf_lists": len(self._centroids) if self._centroids is not None else 0,
+                "vector_bytes": len(self.ids) * (self.dim or 0) * itemsize,
+            }
+
+    # ============================================================
+    # Persistence
+    # ============================================================
+    def _seg_file(self, gen: int, name: str) -> str:
+        return os.path.join(self.path, f"seg_{gen}_{name}")
+
+    def _log_path(self, gen: int = None) -> str:
+        return os.path.join(self.path, f"log_{self._gen if gen is None else gen}.jsonl")
+
+    def _write_meta(self):
+        meta_path = os.path.join(self.path, SEGMENT_META)
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "gen": self._gen,
+                "n_vectors": self._seg_n,
+                "dim": self.dim,
+                "dtype": self.dtype,
+                "ivf": self._centroids is not None,
+                "ivf_trained": self._trained_n,
+            }, f)
+        os.replace(tmp_path, meta_path)
+
+    def _load(self):
+        meta_path = os.path.join(self.path, SEGMENT_META)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+
+            # The stored layout wins over the constructor's dtype
+            self._gen = meta["gen"]
+            self.dim = meta["dim"]
+            self.dtype = meta["dtype"]
+            self._seg_n = meta["n_vectors"]
+            if self._seg_n:
+                self._seg_vectors = np.load(self._seg_file(self._gen, "vectors.npy"), mmap_mode="r")
+                if self.dtype == "int8":
+                    self._seg_scales = np.load(self._seg_file(self._gen, "scales.npy"), mmap_mode="r")
+                if meta.get("ivf"):
+                    self._trained_n = meta.get("ivf_trained", self._seg_n)
+                    self._centroids = np.load(self._seg_file(self._gen, "centroids.npy"))
+                    self._list_offsets = np.load(self._seg_file(self._gen, "offsets.npy"))
+                    self._list_rows = np.load(self._seg_file(self._gen, "lists.npy"), mmap_mode="r")
+                with open(self._seg_file(self._gen, "rows.json"), "r", encoding="utf-8") as f:
+                    rows = json.load(f)
+                self.ids = rows["ids"]
+                self.metadata = rows["metadata"]
+                self._rows = {vector_id: i for i, vector_id in enumerate(self.ids)}
+                self._alive = array("B", bytes([1]) * self._seg_n)
+                self._codes = array("i", [self._doc_code(m.get("doc_id")) for m in self.metadata])
+
+        self._read_log(from_offset=0)
+
+    @contextmanager
+    def _writing(self):
+        """
+        Holds the index for a write: upserts / deletes / compactions of
+        other processes are applied first, so this process appends to the
+        current log with every earlier record already read
+        """
+        with self._lock:
+            if not self.path:
+                yield
+                return
+            with log_lock(self.path):
+                self.refresh()
+                yield
+
+    def _append_log(self, records):
+        # Only under _writing(): the offset then skips nobody else's records
+        self._log_offset = append_records(self._log_path(), records)
+
+    def _read_log(self, from_offset: int):
+        log_path = self._log_path()
+        if not os.path.exists(log_path):
+            return
+
+        pending = []
+        with open(log_path, "rb") as f:
+            f.seek(from_offset)
+            offset = from_offset
+            while True:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break   # end of log or half-written last line
+                offset += len(line)
+                record = json.loads(line)
+                if record["op"] == "delete":
+                    self._replay_upserts(pending)
+                    pending = []
+                    for vector_id in record["ids"]:
+                        self._delete(vector_id)
+                else:
+                    pending.append(record)
+            self._replay_upserts(pending)
+            self._log_offset = offset
+
+    def _replay_upserts(self, records):
+        if not records:
+            return
+        dtype = np.dtype(self.dtype)
+        values = np.frombuffer(
+            b"".join(base64.b64decode(r["v"]) for r in records), dtype=dtype
+        ).reshape(len(records), -1).copy()
+        if self.dim is None:
+            self.dim = values.shape[1]   # first vectors, written by another process
+        scales = np.asarray([r["s"] for r in records], dtype=np.float32) if self.dtype == "int8" else None
+        self._append([{"id": r["id"], "metadata": r["m"]} for r in records], values, scales)
+
+    def refresh(self):
+        """
+        Picks up upserts / deletes / compactions by another process
+        """
+        if not self.path:
+            return
+        with self._lock:
+            meta_path = os.path.join(self.path, SEGMENT_META)
+            gen = self._gen
+            if os.path.exists(meta_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    gen = json.load(f)["gen"]
+            if gen != self._gen:
+                self._reset()
+                self._load()
+            elif os.path.exists(self._log_path()) and os.path.getsize(self._log_path()) > self._log_offset:
+                self._read_log(from_offset=self._log_offset)
+
+    def save(self):
+        """
+        Rewrites live rows into a new segment (IVF lists above
+        ivf_min_vectors) and starts an empty log. In memory without a path.
+        """
+        with self._writing():
+            if self.dim is None:
+                return
+            alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+            base_rows = np.flatnonzero(alive[:self._seg_n])
+            delta_rows = np.flatnonzero(alive[self._seg_n:])
+            delta_vectors, delta_scales = self._consolidated_delta()
+
+            parts = []
+            if self._seg_vectors is not None and len(base_rows):
+                parts.append((self._seg_vectors[base_rows],
+                              self._seg_scales[base_rows] if self._seg_scales is not None else None))
+            if delta_vectors is not None and len(delta_rows):
+                parts.append((delta_vectors[delta_rows],
+                              delta_scales[delta_rows] if delta_scales is not None else None))
+            if parts:
+                vectors = np.concatenate([p[0] for p in parts])
+                scales = np.concatenate([p[1] for p in parts]) if self.dtype == "int8" else None
+            else:
+                vectors = np.zeros((0, self.dim), dtype=self.dtype)
+                scales = np.zeros(0, dtype=np.float32) if self.dtype == "int8" else None
+            live = np.concatenate([base_rows, self._seg_n + delta_rows])
+            ids = [self.ids[row] for row in live]
+            metadata = [self.metadata[row] for row in live]
+
+            # ---- IVF lists (centroids reused until the corpus doubles) ----
+            centroids = None
+            if len(vectors) >= self.ivf_min_vectors:
+                centroids = self._centroids
+                if centroids is None or len(vectors) > 2 * self._trained_n:
+                    centroids = _train_ivf(vectors, scales, max(1, int(np.sqrt(len(vectors)))))
+                    self._trained_n = len(vectors)
+                assign = _nearest_centroid(vectors, scales, centroids)
+                list_rows = np.argsort(assign, kind="stable").astype(np.int64)
+                list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=len(centroids)))])
+
+            old_gen = self._gen
+            self._gen = gen = old_gen + 1
+            if self.path:
+                np.save(self._seg_file(gen, "vectors.npy"), vectors)
+                if scales is not None:
+                    np.save(self._seg_file(gen, "scales.npy"), scales)
+                if centroids is not None:
+                    np.save(self._seg_file(gen, "centroids.npy"), centroids)
+                    np.save(self._seg_file(gen, "offsets.npy"), list_offsets)
+                    np.save(self._seg_file(gen, "lists.npy"), list_rows)
+                with open(self._seg_file(gen, "rows.json"), "w", encoding="utf-8") as f:
+                    json.dump({"ids": ids, "metadata": metadata}, f, ensure_ascii=False)
+
+            self._seg_n = len(ids)
+            self._centroids = centroids
+            self._list_offsets = list_offsets if centroids is not None else None
+            self._list_rows = list_rows if centroids is not None else None
+            if self.path:
+                # segment.json is the commit point; the new log starts empty
+                self._write_meta()
+                vectors = np.load(self._seg_file(gen, "vectors.npy"), mmap_mode="r")
+                if scales is not None:
+                    scales = np.load(self._seg_file(gen, "scales.npy"), mmap_mode="r")
+            self._seg_vectors, self._seg_scales = vectors, scales
+
+            # New lists: snapshots taken by running queries stay valid
+            self.ids = ids
+            self.metadata = metadata
+            self._rows = {vector_id: i for i, vector_id in enumerate(ids)}
+            self._alive = array("B", bytes([1]) * len(ids))
+            self._codes = array("i", [self._doc_code(m.get("doc_id")) for m in metadata])
+            self._removed = 0
+            self._delta_parts = []
+            self._delta = None
+            self._log_offset = 0
+
+            if self.path:
+                for name in ("vectors.npy", "scales.npy", "centroids.npy", "offsets.npy",
+                             "lists.npy", "rows.json"):
+                    try:
+                        os.remove(self._seg_file(old_gen, name))
+                    except OSError:
+                        pass
+                try:
+                    os.remove(self._log_path(old_gen))
+                except OSError:
+                    pass
+
+
+def build_index(backend: str = VECTOR_BACKEND):
+    if backend == "pinecone":
+        return PineconeVectorIndex()
+    if backend == "local":
+        return LocalVectorIndex(path=LOCAL_INDEX_DIR)
+    raise ValueError(f"Unknown vector backend: {backend}")